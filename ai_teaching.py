@@ -1,38 +1,264 @@
 import streamlit as st
-from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
-from transformers import pipeline
+import asyncio
 import json
 import os
+import threading
+import time
+from collections import defaultdict, deque
 from dotenv import load_dotenv
-import torch
+from llm_cache import LLMCache
+from llm_client import get_client
+from metrics import metrics
+from singleflight import SingleFlight, LeaseStore, FlightAbandoned
+from model_registry import ModelRegistry
+from concurrency import run_sync, gather_bounded
+from summarization import MapReduceSummarizer, needs_map_reduce
+from quiz import build_quiz, abuild_quiz, quiz_prompt
+from grading import (
+    grade_locally, parse_llm_grade, ungraded, quiz_score, packed_grading_prompt, parse_packed_grades,
+    GradingReport, GRADING_MODE, GRADING_CONCURRENCY, GRADING_PACK_SIZE
+)
 
 # Load environment variables
 load_dotenv()
 
+# Methods whose responses are cached unless opted out; grading is never cached
+CACHED_METHODS = {
+    "generate_lesson",
+    "generate_quiz",
+    "generate_summary",
+    "analyze_content",
+    "generate_practice_exercises",
+    "summarize_chunk",
+    "collapse_summaries",
+}
+
+# Client task used by each method; unlisted methods use "teaching"
+METHOD_TASKS = {
+    "grade_answer": "grading",
+    "grade_answers": "grading",
+    "generate_summary": "summarization",
+    "summarize_chunk": "summarization",
+    "collapse_summaries": "summarization",
+}
+
+_usage_lock = threading.Lock()
+
+def _add_usage(usage, call_usage):
+    """Accumulate one call's token counts into a usage dict"""
+    if usage is None:
+        return
+    with _usage_lock:
+        usage["llm_calls"] = usage.get("llm_calls", 0) + 1
+        for name, count in call_usage.items():
+            usage[name] = usage.get(name, 0) + count
+
 class AITeachingAssistant:
-    def __init__(self):
-        self.llm = ChatOpenAI(
-            model_name="gpt-3.5-turbo",
-            temperature=0.7,
-            api_key=os.getenv("OPENAI_API_KEY"),
-            base_url=os.getenv("OPENAI_API_BASE")
-        )
-        # Initialize question generation pipeline
-        self.question_generator = pipeline(
-            "text2text-generation",
-            model="facebook/bart-large-cnn",
-            device=0 if torch.cuda.is_available() else -1
-        )
-        # Initialize answer grading pipeline
-        self.answer_grader = pipeline(
-            "text-classification",
-            model="distilbert-base-uncased-finetuned-sst-2-english",
-            device=0 if torch.cuda.is_available() else -1
-        )
+    def __init__(self, cache=None, cache_exclude=None, flights=None):
+        self.llm = get_client("teaching")
+        # Transformers pipelines are loaded on first use and unloaded when idle
+        self.models = ModelRegistry()
+        self.models.register("question_generator", "text2text-generation", "facebook/bart-large-cnn")
+        self.models.register("answer_grader", "text-classification", "distilbert-base-uncased-finetuned-sst-2-english")
+        # Response cache; EDUTUTOR_LLM_CACHE=0 disables it, and
+        # EDUTUTOR_LLM_CACHE_EXCLUDE opts individual methods out
+        if cache is None and os.getenv("EDUTUTOR_LLM_CACHE", "1") != "0":
+            cache = LLMCache()
+        self.cache = cache
+        if cache_exclude is None:
+            cache_exclude = [m for m in os.getenv("EDUTUTOR_LLM_CACHE_EXCLUDE", "").split(",") if m]
+        self.cache_exclude = set(cache_exclude)
+        # Identical concurrent calls share one upstream request, across threads
+        # and, through the lease store, across worker processes;
+        # EDUTUTOR_SINGLEFLIGHT=0 disables it, EDUTUTOR_SINGLEFLIGHT_LEASES=0
+        # keeps it within the process
+        if flights is None and os.getenv("EDUTUTOR_SINGLEFLIGHT", "1") != "0":
+            leases = LeaseStore() if os.getenv("EDUTUTOR_SINGLEFLIGHT_LEASES", "1") != "0" else None
+            flights = SingleFlight(leases)
+        self.flights = flights
+        # Time-to-first-token and total time of recent calls
+        self.call_timings = deque(maxlen=500)
+        # Structured quizzes generated and re-asks needed to get valid output
+        self.quiz_attempts = defaultdict(int)
+        # Large documents are summarized chunk by chunk; chunk summaries go
+        # through the response cache so they are reused at every length
+        self.summarizer = MapReduceSummarizer(self._acall)
 
-    def generate_lesson(self, topic, detail_level="Basic", difficulty="Intermediate", learning_style=["Visual"]):
-        """Generate a personalized lesson"""
+    def _client(self, method):
+        """Return the shared LLM client for a method's task"""
+        return get_client(METHOD_TASKS.get(method, "teaching"))
+
+    def _cache_key(self, method, prompt):
+        """Return the response cache key for a call, or None if it is not cached"""
+        if self.cache is None or method not in CACHED_METHODS or method in self.cache_exclude:
+            return None
+        client = self._client(method)
+        return LLMCache.make_key(prompt, client.model_name, client.temperature)
+
+    def _cached(self, key, method, recheck=False):
+        """Return the cached response for a cache key, or None"""
+        return self.cache.get(key, method, recheck) if key is not None else None
+
+    def _flight_key(self, method, prompt):
+        """Key under which identical in-flight calls are coalesced"""
+        client = self._client(method)
+        return f"{method}:{LLMCache.make_key(prompt, client.model_name, client.temperature)}"
+
+    def _call(self, method, prompt, usage=None, recheck=False):
+        """Invoke the LLM, serving repeated prompts from the response cache.
+
+        Concurrent identical calls are coalesced into one upstream request.
+        Token counts of calls that reach the model are added to usage, if given.
+        """
+        key = self._cache_key(method, prompt)
+        cached = self._cached(key, method, recheck)
+        if cached is not None:
+            return cached
+        if self.flights is None:
+            return self._call_upstream(method, prompt, key, usage)
+        return self.flights.do(self._flight_key(method, prompt),
+                               lambda: self._call_upstream(method, prompt, key, usage))
+
+    def _call_upstream(self, method, prompt, key, usage=None):
+        """Make the LLM request for a call this caller leads"""
+        # Another process may have filled the cache while this one waited for its lease
+        cached = self._cached(key, method, recheck=True)
+        if cached is not None:
+            return cached
+        start = time.perf_counter()
+        response, call_usage = self._client(method).invoke_with_usage(prompt, method)
+        elapsed = time.perf_counter() - start
+        self._record_timing(method, elapsed, elapsed, streamed=False)
+        _add_usage(usage, call_usage)
+        if key is not None:
+            self.cache.set(key, response, method)
+        return response
+
+    async def _acall(self, method, prompt, usage=None):
+        """Async counterpart of _call"""
+        key = self._cache_key(method, prompt)
+        cached = self._cached(key, method)
+        if cached is not None:
+            return cached
+        # The pooled client is blocking, so the call (or the wait for an
+        # identical one) runs in the default executor
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._call, method, prompt, usage, True)
+
+    def _invoke(self, method, prompt):
+        """Invoke the LLM, reporting failures in the returned text"""
+        try:
+            return self._call(method, prompt)
+        except Exception as e:
+            metrics.record_error(method, e)
+            return f"Error: {str(e)}"
+
+    async def _ainvoke(self, method, prompt):
+        """Async counterpart of _invoke"""
+        try:
+            return await self._acall(method, prompt)
+        except Exception as e:
+            metrics.record_error(method, e)
+            return f"Error: {str(e)}"
+
+    def _stream(self, method, prompt):
+        """Yield the LLM response token by token, caching the full text.
+
+        While an identical call is in flight, its full text is yielded once
+        it completes instead of making a second request.
+        """
+        key = self._cache_key(method, prompt)
+        cached = self._cached(key, method)
+        if cached is not None:
+            yield cached
+            return
+        flight = self.flights.begin(self._flight_key(method, prompt)) if self.flights is not None else None
+        while flight is not None and not flight.leader:
+            try:
+                yield flight.wait()
+                return
+            except FlightAbandoned:
+                flight = self.flights.begin(self._flight_key(method, prompt))
+            except Exception as e:
+                metrics.record_error(method, e)
+                yield f"Error: {str(e)}"
+                return
+        try:
+            yield from self._lead_stream(method, prompt, key, flight)
+        except GeneratorExit:
+            # The consumer stopped reading; don't leave waiters hanging
+            if flight is not None:
+                flight.abandon()
+            raise
+        except BaseException as e:
+            # Whatever went wrong (e.g. a locked cache database), waiters
+            # must not be left on a call that never completes
+            if flight is not None:
+                flight.fail(e)
+            raise
+
+    def _lead_stream(self, method, prompt, key, flight):
+        """Stream the LLM response for a call this caller leads, completing its flight"""
+        cached = self._cached(key, method, recheck=True)
+        if cached is not None:
+            if flight is not None:
+                flight.finish(cached)
+            yield cached
+            return
+        start = time.perf_counter()
+        first_token = None
+        parts = []
+        try:
+            for text in self._client(method).stream(prompt, method):
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                parts.append(text)
+                yield text
+        except Exception as e:
+            if flight is not None:
+                flight.fail(e)
+            metrics.record_error(method, e)
+            yield f"Error: {str(e)}"
+            return
+        total = time.perf_counter() - start
+        response = "".join(parts)
+        self._record_timing(method, first_token if first_token is not None else total, total, streamed=True)
+        if key is not None:
+            self.cache.set(key, response, method)
+        if flight is not None:
+            flight.finish(response)
+
+    def _record_timing(self, method, time_to_first_token, total_time, streamed):
+        """Remember the latency of a completed LLM call"""
+        self.call_timings.append({
+            "method": method,
+            "streamed": streamed,
+            "time_to_first_token": time_to_first_token,
+            "total_time": total_time,
+            "at": time.time(),
+        })
+
+    @property
+    def question_generator(self):
+        """Question generation pipeline, loaded on first access"""
+        return self.models.get("question_generator")
+
+    @property
+    def answer_grader(self):
+        """Answer grading pipeline, loaded on first access"""
+        return self.models.get("answer_grader")
+
+    def model_report(self):
+        """Return load time and resident size of each pipeline"""
+        return self.models.report()
+
+    def cache_stats(self):
+        """Return response cache hit/miss counters"""
+        return self.cache.stats() if self.cache is not None else None
+
+    def _lesson_prompt(self, topic, detail_level, difficulty, learning_style, context=None):
+        """Render the lesson prompt, optionally grounded in source material"""
         prompt_template = PromptTemplate(
             input_variables=["topic", "detail_level", "difficulty", "learning_style"],
             template="""Create a {detail_level} lesson about {topic} for a {difficulty} level student who prefers {learning_style} learning style. \nInclude:\n1. Learning Objectives\n2. Main content with examples\n3. Key takeaways\n4. Practice activities\nUse markdown for formatting with headings, bullet points, and bold text for emphasis."""
@@ -43,90 +269,280 @@ class AITeachingAssistant:
             difficulty=difficulty,
             learning_style=", ".join(learning_style)
         )
-        try:
-            response = self.llm.invoke(prompt)
-            return response.content
-        except Exception as e:
-            return f"Error: {str(e)}"
+        if context:
+            prompt += f"\n\nBase the lesson on the following source material:\n\n{context}"
+        return prompt
 
-    def generate_quiz(self, content, num_questions=5, question_type="multiple_choice"):
-        """Generate quiz questions from content"""
+    def _quiz_prompt(self, content, num_questions, question_type):
+        """Render the quiz prompt"""
         prompt_template = PromptTemplate(
             input_variables=["content", "num_questions", "question_type"],
             template="""Based on the following content, generate {num_questions} {question_type} questions:\n\n{content}\n\nFormat each question as:\nQuestion: [question text]\nOptions: [A-D]\nCorrect Answer: [letter]\nExplanation: [brief explanation]\n\nUse markdown formatting."""
         )
-        prompt = prompt_template.format(
+        return prompt_template.format(
             content=content,
             num_questions=num_questions,
             question_type=question_type
         )
-        try:
-            response = self.llm.invoke(prompt)
-            return response.content
-        except Exception as e:
-            return f"Error: {str(e)}"
 
-    def grade_answer(self, question, student_answer, correct_answer):
-        """Grade a student's answer"""
+    def _grading_prompt(self, question, student_answer, correct_answer):
+        """Render the grading prompt"""
         prompt_template = PromptTemplate(
             input_variables=["question", "student_answer", "correct_answer"],
             template="""Grade the following answer:\n\nQuestion: {question}\nStudent's Answer: {student_answer}\nCorrect Answer: {correct_answer}\n\nProvide:\n1. Score (0-100)\n2. Feedback\n3. Suggestions for improvement\n\nUse markdown formatting."""
         )
-        prompt = prompt_template.format(
+        return prompt_template.format(
             question=question,
             student_answer=student_answer,
             correct_answer=correct_answer
         )
-        try:
-            response = self.llm.invoke(prompt)
-            return response.content
-        except Exception as e:
-            return f"Error: {str(e)}"
 
-    def analyze_content(self, content):
-        """Analyze content for key concepts and difficulty level"""
+    def _analysis_prompt(self, content):
+        """Render the content analysis prompt"""
         prompt_template = PromptTemplate(
             input_variables=["content"],
             template="""Analyze the following content:\n\n{content}\n\nProvide:\n1. Key concepts\n2. Difficulty level\n3. Prerequisites\n4. Estimated study time\n5. Recommended learning path\n\nUse markdown formatting."""
         )
-        prompt = prompt_template.format(content=content)
-        try:
-            response = self.llm.invoke(prompt)
-            return response.content
-        except Exception as e:
-            return f"Error: {str(e)}"
+        return prompt_template.format(content=content)
 
-    def generate_summary(self, content, length="concise"):
-        """Generate a summary of the content"""
+    def _summary_prompt(self, content, length):
+        """Render the summary prompt"""
         prompt_template = PromptTemplate(
             input_variables=["content", "length"],
             template="""Create a {length} summary of the following content:\n\n{content}\n\nFocus on the main points and key takeaways.\nUse markdown formatting."""
         )
-        prompt = prompt_template.format(
+        return prompt_template.format(
             content=content,
             length=length
         )
-        try:
-            response = self.llm.invoke(prompt)
-            return response.content
-        except Exception as e:
-            return f"Error: {str(e)}"
 
-    def generate_practice_exercises(self, content, num_exercises=3):
-        """Generate practice exercises"""
+    def _exercises_prompt(self, content, num_exercises):
+        """Render the practice exercises prompt"""
         prompt_template = PromptTemplate(
             input_variables=["content", "num_exercises"],
             template="""Create {num_exercises} practice exercises based on this content:\n\n{content}\n\nFor each exercise, include:\n1. Problem statement\n2. Step-by-step solution\n3. Hints\n4. Common mistakes to avoid\n\nUse markdown formatting."""
         )
-        prompt = prompt_template.format(
+        return prompt_template.format(
             content=content,
             num_exercises=num_exercises
         )
+
+    def generate_lesson(self, topic, detail_level="Basic", difficulty="Intermediate", learning_style=["Visual"], context=None):
+        """Generate a personalized lesson"""
+        return self._invoke("generate_lesson", self._lesson_prompt(topic, detail_level, difficulty, learning_style, context))
+
+    def generate_quiz(self, content, num_questions=5, question_type="multiple_choice"):
+        """Generate quiz questions from content"""
+        return self._invoke("generate_quiz", self._quiz_prompt(content, num_questions, question_type))
+
+    def _quiz_call(self, prompt, attempt):
+        """First ask goes through the response cache; re-asks never do"""
+        return self._call("generate_quiz" if attempt == 0 else "reask_quiz", prompt)
+
+    async def _aquiz_call(self, prompt, attempt):
+        """Async counterpart of _quiz_call"""
+        return await self._acall("generate_quiz" if attempt == 0 else "reask_quiz", prompt)
+
+    def _record_quiz(self, prompt, quiz):
+        """Count the quiz and its re-asks, caching the repaired quiz in place of the bad reply"""
+        self.quiz_attempts["quizzes"] += 1
+        self.quiz_attempts["reasks"] += quiz.retries
+        key = self._cache_key("generate_quiz", prompt)
+        if quiz.retries and key is not None:
+            self.cache.set(key, quiz.model_dump_json(exclude={"retries"}), "generate_quiz")
+
+    def generate_structured_quiz(self, content, num_questions=5, question_type="multiple_choice"):
+        """Generate a validated Quiz, re-asking the model when its output can't be parsed"""
+        prompt = quiz_prompt(content, num_questions, question_type)
+        try:
+            quiz, _ = build_quiz(self._quiz_call, prompt, question_type)
+        except Exception as e:
+            metrics.record_error("generate_structured_quiz", e)
+            return f"Error: {str(e)}"
+        self._record_quiz(prompt, quiz)
+        return quiz
+
+    def stream_structured_quiz(self, content, num_questions=5, question_type="multiple_choice"):
+        """Stream the raw JSON of a quiz as it is generated; pass the text to parse_streamed_quiz"""
+        return self._stream("generate_quiz", quiz_prompt(content, num_questions, question_type))
+
+    def parse_streamed_quiz(self, text, content, num_questions=5, question_type="multiple_choice"):
+        """Parse the text of stream_structured_quiz into a Quiz, re-asking if it can't be parsed"""
+        if text.startswith("Error:"):
+            return text
+        prompt = quiz_prompt(content, num_questions, question_type)
+        call = lambda p, attempt: text if attempt == 0 else self._quiz_call(p, attempt)
+        try:
+            quiz, _ = build_quiz(call, prompt, question_type)
+        except Exception as e:
+            metrics.record_error("generate_structured_quiz", e)
+            return f"Error: {str(e)}"
+        self._record_quiz(prompt, quiz)
+        return quiz
+
+    def grade_answer(self, question, student_answer, correct_answer):
+        """Grade a student's answer"""
+        return self._invoke("grade_answer", self._grading_prompt(question, student_answer, correct_answer))
+
+    def grade_question(self, question, student_answer):
+        """Grade an answer to a QuizQuestion, locally unless it is a short answer"""
+        grade = grade_locally(question, student_answer)
+        if grade is not None:
+            return grade
+        return parse_llm_grade(self.grade_answer(question.question, student_answer, question.answer))
+
+    def grade_quiz(self, quiz, answers, mode=GRADING_MODE):
+        """Grade a submission (one answer per question); return the grades and percentage score.
+
+        Short answers, the only ones that need the LLM, are graded together
+        with grade_answers. Answers whose grading failed have method "error"
+        and no score, and are left out of the percentage.
+        """
+        grades = [grade_locally(q, a) for q, a in zip(quiz.questions, answers)]
+        pending = [i for i, grade in enumerate(grades) if grade is None]
+        if pending:
+            report = self.grade_answers(
+                [(quiz.questions[i].question, answers[i], quiz.questions[i].answer) for i in pending],
+                mode=mode
+            )
+            for i, grade in zip(pending, report.grades):
+                grades[i] = grade
+        return grades, quiz_score(grades)
+
+    def grade_answers(self, items, mode=GRADING_MODE, max_concurrency=GRADING_CONCURRENCY, pack_size=GRADING_PACK_SIZE):
+        """Grade a whole submission of (question, student_answer, correct_answer) items.
+
+        mode "sequential" grades one answer per call, one call at a time, like
+        grade_answer; "concurrent" makes the same calls at most max_concurrency
+        at a time; "packed" grades pack_size answers per call. Returns a
+        GradingReport with per-question grades, total latency and token use.
+        """
+        return run_sync(self.agrade_answers(items, mode, max_concurrency, pack_size))
+
+    async def agrade_answers(self, items, mode=GRADING_MODE, max_concurrency=GRADING_CONCURRENCY, pack_size=GRADING_PACK_SIZE):
+        """Async version of grade_answers"""
+        items = list(items)
+        usage = {}
+        start = time.perf_counter()
+        if mode == "packed":
+            grades = await self._grade_packed(items, max(1, pack_size), max_concurrency, usage)
+        else:
+            limit = 1 if mode == "sequential" else max_concurrency
+            grades = await gather_bounded(*(self._grade_one(item, usage) for item in items), max_concurrency=limit)
+        return GradingReport(grades=grades, mode=mode, latency=time.perf_counter() - start, **usage)
+
+    async def _grade_one(self, item, usage):
+        """Grade one answer with its own LLM call"""
+        try:
+            text = await self._acall("grade_answer", self._grading_prompt(*item), usage)
+        except Exception as e:
+            metrics.record_error("grade_answer", e)
+            return ungraded(str(e))
+        return parse_llm_grade(text)
+
+    async def _grade_pack(self, pack, usage):
+        """Grade several answers with one structured LLM call"""
+        try:
+            text = await self._acall("grade_answers", packed_grading_prompt(pack), usage)
+        except Exception as e:
+            metrics.record_error("grade_answers", e)
+            return [None] * len(pack)
+        return parse_packed_grades(text, len(pack))
+
+    async def _grade_packed(self, items, pack_size, max_concurrency, usage):
+        """Grade items in packs; answers a pack reply leaves out are graded one by one"""
+        packs = [items[i:i + pack_size] for i in range(0, len(items), pack_size)]
+        results = await gather_bounded(*(self._grade_pack(p, usage) for p in packs), max_concurrency=max_concurrency)
+        grades = [grade for result in results for grade in result]
+        missing = [i for i, grade in enumerate(grades) if grade is None]
+        retried = await gather_bounded(*(self._grade_one(items[i], usage) for i in missing), max_concurrency=max_concurrency)
+        for i, grade in zip(missing, retried):
+            grades[i] = grade
+        return grades
+
+    def analyze_content(self, content):
+        """Analyze content for key concepts and difficulty level"""
+        return self._invoke("analyze_content", self._analysis_prompt(content))
+
+    def generate_summary(self, content, length="concise"):
+        """Generate a summary of the content"""
+        if needs_map_reduce(content):
+            return run_sync(self.agenerate_summary(content, length))
+        return self._invoke("generate_summary", self._summary_prompt(content, length))
+
+    def generate_practice_exercises(self, content, num_exercises=3):
+        """Generate practice exercises"""
+        return self._invoke("generate_practice_exercises", self._exercises_prompt(content, num_exercises))
+
+    def stream_lesson(self, topic, detail_level="Basic", difficulty="Intermediate", learning_style=["Visual"], context=None):
+        """Stream a personalized lesson as it is generated"""
+        return self._stream("generate_lesson", self._lesson_prompt(topic, detail_level, difficulty, learning_style, context))
+
+    def stream_quiz(self, content, num_questions=5, question_type="multiple_choice"):
+        """Stream quiz questions as they are generated"""
+        return self._stream("generate_quiz", self._quiz_prompt(content, num_questions, question_type))
+
+    def stream_summary(self, content, length="concise"):
+        """Stream a summary of the content as it is generated"""
+        if needs_map_reduce(content):
+            return self._stream_map_reduce_summary(content, length)
+        return self._stream("generate_summary", self._summary_prompt(content, length))
+
+    def _stream_map_reduce_summary(self, content, length):
+        """Summarize chunks concurrently, then stream the combining step"""
         try:
-            response = self.llm.invoke(prompt)
-            return response.content
+            summaries = run_sync(self.summarizer.amap(content))
         except Exception as e:
+            metrics.record_error("summarize_chunk", e)
+            yield f"Error: {str(e)}"
+            return
+        yield from self._stream("generate_summary", MapReduceSummarizer.reduce_prompt(summaries, length))
+
+    def stream_practice_exercises(self, content, num_exercises=3):
+        """Stream practice exercises as they are generated"""
+        return self._stream("generate_practice_exercises", self._exercises_prompt(content, num_exercises))
+
+    async def agenerate_lesson(self, topic, detail_level="Basic", difficulty="Intermediate", learning_style=["Visual"], context=None):
+        """Async version of generate_lesson"""
+        return await self._ainvoke("generate_lesson", self._lesson_prompt(topic, detail_level, difficulty, learning_style, context))
+
+    async def agenerate_quiz(self, content, num_questions=5, question_type="multiple_choice"):
+        """Async version of generate_quiz"""
+        return await self._ainvoke("generate_quiz", self._quiz_prompt(content, num_questions, question_type))
+
+    async def agenerate_structured_quiz(self, content, num_questions=5, question_type="multiple_choice"):
+        """Async version of generate_structured_quiz"""
+        prompt = quiz_prompt(content, num_questions, question_type)
+        try:
+            quiz, _ = await abuild_quiz(self._aquiz_call, prompt, question_type)
+        except Exception as e:
+            metrics.record_error("generate_structured_quiz", e)
             return f"Error: {str(e)}"
+        self._record_quiz(prompt, quiz)
+        return quiz
+
+    async def agrade_answer(self, question, student_answer, correct_answer):
+        """Async version of grade_answer"""
+        return await self._ainvoke("grade_answer", self._grading_prompt(question, student_answer, correct_answer))
+
+    async def aanalyze_content(self, content):
+        """Async version of analyze_content"""
+        return await self._ainvoke("analyze_content", self._analysis_prompt(content))
+
+    async def agenerate_summary(self, content, length="concise"):
+        """Async version of generate_summary"""
+        if needs_map_reduce(content):
+            try:
+                summaries = await self.summarizer.amap(content)
+            except Exception as e:
+                metrics.record_error("summarize_chunk", e)
+                return f"Error: {str(e)}"
+            return await self._ainvoke("generate_summary", MapReduceSummarizer.reduce_prompt(summaries, length))
+        return await self._ainvoke("generate_summary", self._summary_prompt(content, length))
+
+    async def agenerate_practice_exercises(self, content, num_exercises=3):
+        """Async version of generate_practice_exercises"""
+        return await self._ainvoke("generate_practice_exercises", self._exercises_prompt(content, num_exercises))
 
 # Initialize AI teaching assistant
 ai_teaching = AITeachingAssistant()
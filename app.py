@@ -1,22 +1,20 @@
 import streamlit as st
 import os
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langchain.prompts import PromptTemplate
-import requests
 from streamlit_option_menu import option_menu
 import database as db
-import ai_teaching as ai
-import dashboard as dash
 import json
-from datetime import datetime
-import fitz  # PyMuPDF for PDF reading
-import docx  # python-docx for DOCX reading
+from datetime import datetime, timedelta, timezone
+from assets import asset_store
+from content_store import content_store
+import html
+import hmac
+
+# ai_teaching, content_gen, dashboard, ingestion and retrieval pull in LangChain,
+# plotly, pandas and NumPy, so each page imports what it needs when it renders
 
 # Load environment variables
 load_dotenv()
-API_KEY = os.getenv("OPENAI_API_KEY")
-API_BASE = os.getenv("OPENAI_API_BASE")
 
 # Initialize session state
 if 'user_id' not in st.session_state:
@@ -28,22 +26,8 @@ if 'user_role' not in st.session_state:
 if 'current_session' not in st.session_state:
     st.session_state.current_session = None
 
-# Initialize LLM using ChatOpenAI
-llm = ChatOpenAI(
-    model_name="gpt-3.5-turbo",
-    temperature=0.7,
-    api_key=API_KEY,
-    base_url=API_BASE
-)
-
-# Function to load lottie animation
-def load_lottieurl(url: str):
-    r = requests.get(url)
-    if r.status_code != 200:
-        return None
-    return r.json()
-
-lottie_ai = load_lottieurl("https://lottie.host/4d266ee4-2d6f-4c86-83a9-4fd050c61bc5/qwJ6zNUzBc.json")
+# Lottie animation, served from the asset cache (or its bundled fallback)
+lottie_ai = asset_store.get_json("lottie_ai")
 
 # ---------- UI Configuration ----------
 st.set_page_config(
@@ -268,13 +252,35 @@ html, body {
 """, unsafe_allow_html=True)
 
 # Main app UI
+PAGES = ["Home", "Learn", "Quiz", "Practice", "Video Recommendations", "Dashboard", "Settings"]  # Removed "Quiz Generator"
+PAGE_ICONS = ["house", "book", "question-square", "pencil-square", "youtube", "graph-up", "gear"]
+# Pages only operators see, after opening the app with ?admin_token=<token>;
+# with no EDUTUTOR_ADMIN_TOKEN set nobody sees them
+ADMIN_PAGES = ["Metrics"]
+ADMIN_PAGE_ICONS = ["activity"]
+ADMIN_TOKEN = os.getenv("EDUTUTOR_ADMIN_TOKEN", "")
+
+def is_admin():
+    # Every visitor shares the default user, so the role can't tell an
+    # operator apart; the token is remembered for the rest of the session
+    if not ADMIN_TOKEN:
+        return False
+    if not st.session_state.get("is_admin"):
+        token = st.query_params.get("admin_token", "")
+        st.session_state.is_admin = hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+    return st.session_state.is_admin
+
 def show_main_ui():
+    # ?page=<name> opens a page directly
+    requested_page = st.query_params.get("page")
+    pages = PAGES + ADMIN_PAGES if is_admin() else PAGES
+    icons = PAGE_ICONS + ADMIN_PAGE_ICONS if is_admin() else PAGE_ICONS
     with st.container():
         selected = option_menu(
             menu_title=None,
-            options=["Home", "Learn", "Quiz", "Practice", "Video Recommendations", "Dashboard", "Settings"],  # Removed "Quiz Generator"
-            icons=["house", "book", "question-square", "pencil-square", "youtube", "graph-up", "gear"],       # Removed corresponding icon
-            default_index=0,
+            options=pages,
+            icons=icons,
+            default_index=pages.index(requested_page) if requested_page in pages else 0,
             orientation="horizontal",
             styles={
                 "container": {
@@ -311,6 +317,8 @@ def show_main_ui():
         show_dashboard_page()
     elif selected == "Settings":
         show_settings_page()
+    elif selected == "Metrics" and is_admin():
+        show_metrics_page()
 
 def show_home_page():
     st.markdown(
@@ -382,11 +390,11 @@ def show_home_page():
     # Lottie animation (right side)
     if lottie_ai:
         st.components.v1.html(
-            """
+            f"""
             <div style="text-align: center; margin-top: 2rem;">
                 <script src="https://unpkg.com/@lottiefiles/lottie-player@latest/dist/lottie-player.js"></script>
                 <lottie-player
-                    src="https://lottie.host/4d266ee4-2d6f-4c86-83a9-4fd050c61bc5/qwJ6zNUzBc.json"
+                    src="{html.escape(json.dumps(lottie_ai, separators=(',', ':')))}"
                     background="transparent"
                     speed="1"
                     style="width: 100%; height: 300px;"
@@ -409,6 +417,9 @@ def show_home_page():
     )
 
 def show_learn_page():
+    import ai_teaching as ai
+    import ingestion
+    import retrieval
     st.markdown("""
         <div class="custom-container">
             <h1 style='color: #4B8BBE;'>📚 Learn with AI</h1>
@@ -420,18 +431,13 @@ def show_learn_page():
     # --- File Upload Section ---
     st.markdown("#### 📂 Upload a File (PDF or DOCX)")
     uploaded_file = st.file_uploader("Upload your study material (optional)", type=["pdf", "docx"], help="You can upload a PDF or Word document to generate a lesson or summary from your own content.")
-    file_content = None
+    document = None
     file_text = None
     if uploaded_file is not None:
-        file_type = uploaded_file.type
-        if file_type == "application/pdf":
-            pdf = fitz.open(stream=uploaded_file.read(), filetype="pdf")
-            file_text = "\n".join(page.get_text() for page in pdf)
-        elif file_type in ["application/vnd.openxmlformats-officedocument.wordprocessingml.document", "application/msword"]:
-            import docx
-            uploaded_file.seek(0)
-            doc = docx.Document(uploaded_file)
-            file_text = "\n".join([para.text for para in doc.paragraphs])
+        # Extraction runs once per distinct file; reruns, sessions and users
+        # uploading the same bytes reuse the stored text
+        document = ingestion.document_store.ingest(uploaded_file.getvalue(), uploaded_file.name, uploaded_file.type)
+        file_text = document["text"]
         st.success("File uploaded successfully!")
         st.markdown("**Preview:**")
         st.text_area("File Content Preview", file_text[:2000] + ("..." if len(file_text) > 2000 else ""), height=150)
@@ -449,34 +455,45 @@ def show_learn_page():
     # --- Lesson Generation ---
     if submitted or (uploaded_file and st.session_state.get('generate_from_file')):
         if topic or file_text:
-            with st.spinner("Creating your personalized lesson..."):
-                session_id = db.start_study_session(st.session_state.user_id, topic or "(from file)", "lesson")
-                st.session_state.current_session = session_id
-                # If file uploaded, use its content for lesson
-                if file_text:
-                    lesson = ai.ai_teaching.generate_lesson(file_text, detail_level, difficulty, learning_style)
+            session_id = db.start_study_session(st.session_state.user_id, topic or "(from file)", "lesson")
+            st.session_state.current_session = session_id
+            st.markdown("---")
+            st.markdown("### Your Custom Lesson")
+            # Render the lesson progressively as tokens arrive
+            # If file uploaded, ground the lesson in the chunks most relevant
+            # to the topic so the prompt stays bounded for any document size
+            if file_text:
+                context = retrieval.index_store.relevant_context(document, topic)
+                lesson = st.write_stream(ai.ai_teaching.stream_lesson(topic or uploaded_file.name, detail_level, difficulty, learning_style, context=context))
+            else:
+                # Lessons pre-generated by pregenerate.py are served without a model call
+                lesson = content_store.get("lesson", topic, detail_level=detail_level, difficulty=difficulty,
+                                           learning_style=learning_style)
+                if lesson is not None:
+                    st.markdown(lesson)
                 else:
-                    lesson = ai.ai_teaching.generate_lesson(topic, detail_level, difficulty, learning_style)
-                st.markdown("---")
-                st.markdown("### Your Custom Lesson")
-                st.markdown(lesson, unsafe_allow_html=True)
-                st.download_button(
-                    label="Download Lesson",
-                    data=lesson,
-                    file_name=f"{topic or 'uploaded_file'}_lesson.md",
-                    mime="text/markdown"
-                )
+                    lesson = st.write_stream(ai.ai_teaching.stream_lesson(topic, detail_level, difficulty, learning_style))
+            st.download_button(
+                label="Download Lesson",
+                data=lesson,
+                file_name=f"{topic or 'uploaded_file'}_lesson.md",
+                mime="text/markdown"
+            )
         else:
             st.warning("Please enter a topic or upload a file to generate a lesson.")
 
     # --- File Summary/Analysis ---
     if uploaded_file and file_text:
         if st.button("Summarize/Analyze Uploaded File"):
-            with st.spinner("Analyzing your file..."):
-                summary = ai.ai_teaching.generate_summary(file_text, length="concise")
-                st.markdown("---")
-                st.markdown("### File Summary/Analysis")
-                st.markdown(summary, unsafe_allow_html=True)
+            summary = ingestion.document_store.get_artifact(document["doc_id"], "summary", "concise")
+            if summary is None:
+                with st.spinner("Analyzing your file..."):
+                    summary = ai.ai_teaching.generate_summary(file_text, length="concise")
+                if not summary.startswith("Error:"):
+                    ingestion.document_store.put_artifact(document["doc_id"], "summary", summary, "concise")
+            st.markdown("---")
+            st.markdown("### File Summary/Analysis")
+            st.markdown(summary, unsafe_allow_html=True)
 
     # --- Lesson History Section ---
     st.markdown("<div class='custom-divider'></div>", unsafe_allow_html=True)
@@ -491,6 +508,8 @@ def show_learn_page():
         st.markdown(f"{i+1}. {hist}")
 
 def show_quiz_page():
+    import ai_teaching as ai
+    from quiz import OPTION_LETTERS, Quiz, normalize_question_type
     st.markdown("""
         <div class="custom-container">
             <h1 style='color: #4B8BBE;'>📝 Quiz Time</h1>
@@ -503,36 +522,116 @@ def show_quiz_page():
         topic = st.text_input("Quiz Topic", placeholder="Enter a topic")
         num_questions = st.slider("Number of Questions", 3, 10, 5)
         question_type = st.selectbox("Question Type", 
-                                   ["Multiple Choice", "Fill in the Blank", "Short Answer"])
+                                   ["Multiple Choice", "Fill in the Blank", "Numeric", "Short Answer"])
         
         submitted = st.form_submit_button("Generate Quiz", type="primary")
     
     if submitted:
         if topic:
-            with st.spinner("Creating your quiz..."):
-                # Start study session
-                session_id = db.start_study_session(st.session_state.user_id, topic, "quiz")
-                st.session_state.current_session = session_id
-                
-                # Generate quiz
-                quiz = ai.ai_teaching.generate_quiz(topic, num_questions, question_type.lower())
-                
-                # Display quiz
-                st.markdown("---")
-                st.markdown("### Your Quiz")
-                st.markdown(quiz, unsafe_allow_html=True)
-                
-                # Add download button
-                st.download_button(
-                    label="Download Quiz",
-                    data=quiz,
-                    file_name=f"{topic}_quiz.md",
-                    mime="text/markdown"
-                )
+            # Start study session
+            session_id = db.start_study_session(st.session_state.user_id, topic, "quiz")
+            st.session_state.current_session = session_id
+            
+            stored = content_store.get("quiz", topic, num_questions=num_questions,
+                                       question_type=normalize_question_type(question_type))
+            if stored is not None:
+                quiz = Quiz.model_validate_json(stored)
+            else:
+                # The streamed JSON holds the answers, so only the number of
+                # questions received so far is shown while it comes in
+                progress = st.progress(0.0, text="Generating your quiz...")
+                text = ""
+                for chunk in ai.ai_teaching.stream_structured_quiz(topic, num_questions, question_type.lower()):
+                    text += chunk
+                    received = min(text.count('"question"'), num_questions)
+                    progress.progress(received / num_questions,
+                                      text=f"Generating your quiz... {received}/{num_questions} questions")
+                quiz = ai.ai_teaching.parse_streamed_quiz(text, topic, num_questions, question_type.lower())
+                progress.empty()
+            if isinstance(quiz, str):
+                st.error(quiz)
+                return
+            st.session_state.quiz = quiz
+            st.session_state.quiz_topic = topic
+            # Answer widgets are keyed per quiz so a new quiz starts with empty answers
+            st.session_state.quiz_id = st.session_state.get("quiz_id", 0) + 1
+            st.session_state.quiz_grades = None
         else:
             st.warning("Please enter a topic to generate a quiz.")
+    
+    quiz = st.session_state.get("quiz")
+    if quiz is None:
+        return
+    topic = st.session_state.quiz_topic
+    
+    # Answer the quiz
+    st.markdown("---")
+    st.markdown("### Your Quiz")
+    with st.form("quiz_answers"):
+        answers = []
+        quiz_id = st.session_state.get("quiz_id", 0)
+        for i, question in enumerate(quiz.questions):
+            st.markdown(question.to_markdown(i + 1).split("\n")[0])
+            if question.type == "multiple_choice":
+                choice = st.radio(
+                    "Your answer",
+                    [f"{letter}) {option}" for letter, option in zip(OPTION_LETTERS, question.options)],
+                    index=None,
+                    key=f"quiz_answer_{quiz_id}_{i}"
+                )
+                answers.append(choice[0] if choice else "")
+            elif question.type == "short_answer":
+                answers.append(st.text_area("Your answer", key=f"quiz_answer_{quiz_id}_{i}"))
+            else:
+                answers.append(st.text_input("Your answer", key=f"quiz_answer_{quiz_id}_{i}"))
+        check = st.form_submit_button("Submit Answers", type="primary")
+    
+    if check:
+        # Choice, blank and numeric answers are graded locally; only short answers go to the LLM
+        with st.spinner("Grading your answers..."):
+            grades, score = ai.ai_teaching.grade_quiz(quiz, answers)
+        failed = sum(grade.method == "error" for grade in grades)
+        if failed:
+            # A partly graded attempt would be saved with the wrong score
+            st.warning(f"{failed} answer(s) could not be graded, so this attempt was not saved. Please submit again.")
+        else:
+            db.record_quiz_result(st.session_state.user_id, topic, score, len(quiz.questions))
+        st.session_state.quiz_grades = (grades, score)
+    
+    if st.session_state.get("quiz_grades"):
+        grades, score = st.session_state.quiz_grades
+        st.metric("Score", f"{score:.0f}%")
+        for i, grade in enumerate(grades):
+            if grade.score is None:
+                title = f"⚠️ Question {i + 1} — not graded"
+            else:
+                title = f"{'✅' if grade.correct else '❌'} Question {i + 1} — {grade.score:.0f}/100"
+            with st.expander(title):
+                st.markdown(grade.feedback)
+        with st.expander("Answer key"):
+            st.markdown(quiz.answer_key())
+    
+    # Add download buttons
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            label="Download Quiz",
+            data=quiz.to_markdown(),
+            file_name=f"{topic}_quiz.md",
+            mime="text/markdown"
+        )
+    with col2:
+        st.download_button(
+            label="Download as JSON",
+            data=quiz.model_dump_json(indent=2, exclude={"retries"}),
+            file_name=f"{topic}_quiz.json",
+            mime="application/json"
+        )
 
 def show_practice_page():
+    import ai_teaching as ai
+    import content_gen as cg
+    from concurrency import run_concurrently
     st.markdown("""
         <div class="custom-container">
             <h1 style='color: #4B8BBE;'>✏️ Practice Exercises</h1>
@@ -549,38 +648,50 @@ def show_practice_page():
     
     if submitted:
         if topic:
-            with st.spinner("Creating practice exercises..."):
-                # Start study session
-                session_id = db.start_study_session(st.session_state.user_id, topic, "practice")
-                st.session_state.current_session = session_id
-                
-                # Generate exercises
-                exercises = ai.ai_teaching.generate_practice_exercises(topic, num_exercises)
-                
-                # Display exercises
+            # Start study session
+            session_id = db.start_study_session(st.session_state.user_id, topic, "practice")
+            st.session_state.current_session = session_id
+            
+            exercises = content_store.get("exercises", topic, num_exercises=num_exercises)
+            flashcards = content_store.get("flashcards", topic, count=5) if generate_flashcards else None
+            if generate_flashcards and flashcards is None:
+                with st.spinner("Creating practice exercises and flashcards..."):
+                    if exercises is None:
+                        # Exercises and flashcards are requested together, so the page
+                        # waits for the slower of the two rather than their sum
+                        exercises, flashcards = run_concurrently(
+                            ai.ai_teaching.agenerate_practice_exercises(topic, num_exercises),
+                            cg.agenerate_flashcards(topic, 5)
+                        )
+                    else:
+                        flashcards = cg.generate_flashcards(topic, 5)
+            if exercises is not None:
                 st.markdown("---")
                 st.markdown("### Practice Exercises")
                 st.markdown(exercises, unsafe_allow_html=True)
-                
-                # Add download button
-                st.download_button(
-                    label="Download Exercises",
-                    data=exercises,
-                    file_name=f"{topic}_exercises.md",
-                    mime="text/markdown"
-                )
-                
-                # Flashcard generation
-                if generate_flashcards and hasattr(ai.ai_teaching, 'generate_flashcards'):
-                    with st.spinner("Generating flashcards..."):
-                        flashcards = ai.ai_teaching.generate_flashcards(topic, 5)
-                        st.markdown("---")
-                        st.markdown("### Flashcards for Practice Topic")
-                        st.markdown(flashcards, unsafe_allow_html=True)
+            else:
+                # Generate and display exercises progressively
+                st.markdown("---")
+                st.markdown("### Practice Exercises")
+                exercises = st.write_stream(ai.ai_teaching.stream_practice_exercises(topic, num_exercises))
+            
+            # Add download button
+            st.download_button(
+                label="Download Exercises",
+                data=exercises,
+                file_name=f"{topic}_exercises.md",
+                mime="text/markdown"
+            )
+            
+            if generate_flashcards:
+                st.markdown("---")
+                st.markdown("### Flashcards for Practice Topic")
+                st.markdown(flashcards, unsafe_allow_html=True)
         else:
             st.warning("Please enter a topic to generate exercises.")
 
 def show_dashboard_page():
+    import dashboard as dash
     st.markdown("""
         <div class="custom-container">
             <h1 style='color: #4B8BBE;'>📊 Learning Dashboard</h1>
@@ -589,25 +700,76 @@ def show_dashboard_page():
         </div>
     """, unsafe_allow_html=True)
     
+    # Only quiz results and study days inside the selected window are fetched;
+    # activity is stored with UTC timestamps, so the window is in UTC days
+    today = datetime.now(timezone.utc).date()
+    date_range = st.date_input("Date range", value=(today - timedelta(days=90), today), max_value=today)
+    if isinstance(date_range, (tuple, list)):
+        # While the range is being picked only its first date is set
+        start_date = date_range[0] if date_range else today
+        end_date = date_range[1] if len(date_range) > 1 else start_date
+    else:
+        start_date = end_date = date_range
+    
+    # Everything the dashboard shows comes from one cached read
+    snapshot = db.get_dashboard_snapshot(st.session_state.user_id, start_date, end_date + timedelta(days=1))
+    
     # Show learning progress
     st.markdown("### 📈 Learning Progress")
-    dash.dashboard.show_learning_progress(st.session_state.user_id)
+    dash.dashboard.show_learning_progress(st.session_state.user_id, snapshot["progress"])
     
     # Show quiz performance
     st.markdown("### 📝 Quiz Performance")
-    dash.dashboard.show_quiz_performance(st.session_state.user_id)
+    dash.dashboard.show_quiz_performance(st.session_state.user_id, snapshot["quiz_history"])
     
     # Show study analytics
     st.markdown("### ⏱️ Study Analytics")
-    dash.dashboard.show_study_analytics(st.session_state.user_id)
+    dash.dashboard.show_study_analytics(st.session_state.user_id, snapshot["study_stats"], snapshot["daily_activity"])
     
     # Show achievements
     st.markdown("### 🏆 Achievements")
-    dash.dashboard.show_achievements(st.session_state.user_id)
+    dash.dashboard.show_achievements(st.session_state.user_id, snapshot["achievements"])
     
     # Show learning path
     st.markdown("### 🗺️ Learning Path")
-    dash.dashboard.show_learning_path(st.session_state.user_id)
+    dash.dashboard.show_learning_path(st.session_state.user_id, snapshot["progress"])
+
+def show_metrics_page():
+    import dashboard as dash
+    from metrics import metrics, exporters
+    st.markdown("""
+        <div class="custom-container">
+            <h1 style='color: #4B8BBE;'>📡 LLM Metrics</h1>
+            <p style="color: #555;">Latency, errors, retries and cache behaviour of this server process.</p>
+            <div class="custom-divider"></div>
+        </div>
+    """, unsafe_allow_html=True)
+    
+    if exporters["endpoint"]:
+        st.caption(f"Prometheus endpoint: {exporters['endpoint']}")
+    if exporters["file"]:
+        st.caption(f"Written to {exporters['file']}")
+    if exporters["error"]:
+        st.warning(exporters["error"])
+    
+    dash.dashboard.show_llm_metrics(metrics.snapshot())
+    
+    text = metrics.render()
+    with st.expander("Prometheus text format"):
+        st.code(text, language="text")
+    st.download_button("Download metrics", data=text, file_name="edututor_metrics.prom", mime="text/plain")
+    
+    # Token usage is logged by every process, so it covers the whole app
+    st.markdown("### 🤖 AI Usage")
+    today = datetime.now(timezone.utc).date()
+    date_range = st.date_input("Usage date range", value=(today - timedelta(days=30), today), max_value=today)
+    if isinstance(date_range, (tuple, list)):
+        start_date = date_range[0] if date_range else today
+        end_date = date_range[1] if len(date_range) > 1 else start_date
+    else:
+        start_date = end_date = date_range
+    window = (start_date, end_date + timedelta(days=1))
+    dash.dashboard.show_llm_usage(db.get_llm_usage_by_feature(*window), db.get_llm_usage_daily(*window))
 
 def show_settings_page():
     st.markdown("""
@@ -669,6 +831,7 @@ def show_settings_page():
 
 # --- Quiz Generator Page ---
 def show_quiz_generator_page():
+    import ai_teaching as ai
     st.markdown("""
         <div class="custom-container">
             <h1 style='color: #f96332;'>💡 Quiz Generator</h1>
@@ -0,0 +1,173 @@
+import json
+import os
+import threading
+import time
+
+import requests
+
+from llm_cache import CACHE_DIR
+
+ASSET_DIR = os.path.join(CACHE_DIR, "assets")
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+# Remote assets are fetched with a strict timeout so a slow host never stalls a page
+FETCH_TIMEOUT = float(os.getenv("EDUTUTOR_ASSET_TIMEOUT", "3"))
+# Cached copies older than this are refreshed in the background
+ASSET_MAX_AGE = int(os.getenv("EDUTUTOR_ASSET_MAX_AGE", str(7 * 24 * 3600)))
+# Minimum delay before retrying an asset whose fetch failed
+RETRY_INTERVAL = int(os.getenv("EDUTUTOR_ASSET_RETRY_INTERVAL", "300"))
+
+# Remote assets used by the UI, with the bundled file served when they can't be
+# reached; assets without a fallback are simply not shown until fetched
+ASSETS = {
+    "lottie_ai": {
+        "url": "https://lottie.host/4d266ee4-2d6f-4c86-83a9-4fd050c61bc5/qwJ6zNUzBc.json",
+        "fallback": os.path.join(STATIC_DIR, "lottie_ai.json"),
+        "content_type": "application/json",
+    },
+    "home_banner": {
+        "url": "https://sl.bing.net/gLOis0wPOYS",
+        "fallback": None,
+        "content_type": "image/",
+    },
+}
+
+
+class AssetStore:
+    """Serves remote static assets from memory and disk, never from the network inline.
+
+    Each asset is downloaded at most once per refresh period by a background
+    thread and kept in an on-disk cache shared by all processes. Until a copy
+    exists, or while the host is unreachable, the bundled fallback is served.
+    """
+
+    def __init__(self, assets=ASSETS, directory=ASSET_DIR, timeout=FETCH_TIMEOUT,
+                 max_age=ASSET_MAX_AGE, retry_interval=RETRY_INTERVAL):
+        self.assets = dict(assets)
+        self.directory = directory
+        self.timeout = timeout
+        self.max_age = max_age
+        self.retry_interval = retry_interval
+        self._memory = {}
+        self._json = {}
+        self._fallbacks = {}
+        self._failed_at = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _read_disk(self, name):
+        """Return (data, age in seconds) of the cached copy, or (None, None)"""
+        path = self._path(name)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            return data, time.time() - os.path.getmtime(path)
+        except OSError:
+            return None, None
+
+    def _read_fallback(self, name):
+        """Return the bundled copy of an asset, or None"""
+        if name in self._fallbacks:
+            return self._fallbacks[name]
+        path = self.assets[name].get("fallback")
+        data = None
+        if path:
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except OSError:
+                pass
+        self._fallbacks[name] = data
+        return data
+
+    def fetch(self, name):
+        """Download an asset into the disk and memory caches; return True on success"""
+        asset = self.assets[name]
+        try:
+            response = requests.get(asset["url"], timeout=self.timeout)
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "")
+            if asset.get("content_type") and not content_type.startswith(asset["content_type"]):
+                raise ValueError(f"unexpected content type {content_type!r}")
+            data = response.content
+            if not data:
+                raise ValueError("empty response")
+        except Exception:
+            with self._lock:
+                self._failed_at[name] = time.time()
+            return False
+        tmp_path = f"{self._path(name)}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(name))
+        with self._lock:
+            self._memory[name] = data
+            self._json.pop(name, None)
+            self._failed_at.pop(name, None)
+        return True
+
+    def _schedule_fetch(self, name):
+        """Fetch an asset on a background thread unless one is running or it failed recently"""
+        with self._lock:
+            if name in self._pending:
+                return
+            failed_at = self._failed_at.get(name)
+            if failed_at is not None and time.time() - failed_at < self.retry_interval:
+                return
+            self._pending.add(name)
+
+        def run():
+            try:
+                self.fetch(name)
+            finally:
+                with self._lock:
+                    self._pending.discard(name)
+
+        threading.Thread(target=run, name=f"asset-fetch-{name}", daemon=True).start()
+
+    def get_bytes(self, name):
+        """Return the best available copy of an asset without touching the network"""
+        with self._lock:
+            data = self._memory.get(name)
+        if data is not None:
+            return data
+        data, age = self._read_disk(name)
+        if data is None or age > self.max_age:
+            self._schedule_fetch(name)
+        if data is None:
+            # Served from the fallback until the background fetch lands
+            return self._read_fallback(name)
+        with self._lock:
+            self._memory[name] = data
+        return data
+
+    def get_json(self, name):
+        """Return an asset parsed as JSON, or None"""
+        with self._lock:
+            if name in self._json:
+                return self._json[name]
+        data = self.get_bytes(name)
+        try:
+            value = json.loads(data) if data is not None else None
+        except ValueError:
+            value = None
+        if value is None:
+            fallback = self._read_fallback(name)
+            value = json.loads(fallback) if fallback else None
+        with self._lock:
+            self._json[name] = value
+        return value
+
+    def prefetch(self):
+        """Warm the caches of every asset in the background"""
+        for name in self.assets:
+            self.get_bytes(name)
+
+
+# Initialize the shared asset store; runs once per process, not once per rerun
+asset_store = AssetStore()
+asset_store.prefetch()
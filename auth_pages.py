@@ -1,16 +1,6 @@
 import streamlit as st
 import auth
-from PIL import Image
-import requests
-from io import BytesIO
-
-def load_image_from_url(url):
-    """Load image from URL"""
-    try:
-        response = requests.get(url)
-        return Image.open(BytesIO(response.content))
-    except:
-        return None
+from assets import asset_store
 
 def show_home_page():
     """Display the home page"""
@@ -98,8 +88,7 @@ def show_home_page():
     st.markdown('<div class="subtitle">Your Personal AI Learning Assistant</div>', unsafe_allow_html=True)
 
     # Banner image
-    banner_url = "https://sl.bing.net/gLOis0wPOYS"
-    banner_image = load_image_from_url(banner_url)
+    banner_image = asset_store.get_bytes("home_banner")
     if banner_image:
         st.image(banner_image, use_column_width=True)
 
@@ -230,6 +219,7 @@ def show_login_page():
                     st.session_state.user_email = email
                     user_info = auth.get_user_info(email)
                     st.session_state.user_name = user_info["full_name"]
+                    st.session_state.user_role = user_info.get("role") or "student"
                     st.success(message)
                     # Redirect to the main app's home page
                     st.session_state.page = "home"
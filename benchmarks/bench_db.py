@@ -0,0 +1,101 @@
+"""Per-call overhead of database.py before and after connection reuse.
+
+"before" opens a fresh connection in the default rollback-journal mode for
+every call, as database.py used to; "after" goes through the per-thread,
+WAL-mode connection from get_db_connection() and, for writes, the
+write-behind buffer (timed until the buffer is flushed).
+
+    python benchmarks/bench_db.py [--calls N]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def legacy_connection(path):
+    """Connection as database.py used to open one for each call"""
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def legacy_insert(path, user_id):
+    conn = legacy_connection(path)
+    c = conn.cursor()
+    c.execute('''INSERT INTO quiz_results (user_id, quiz_topic, score, total_questions)
+                 VALUES (?, ?, ?, ?)''', (user_id, "Algebra", 80.0, 10))
+    conn.commit()
+    conn.close()
+
+
+def legacy_read(path, user_id):
+    conn = legacy_connection(path)
+    c = conn.cursor()
+    c.execute('''SELECT topic, AVG(score) as avg_score, SUM(time_spent) as total_time
+                 FROM learning_progress
+                 WHERE user_id = ?
+                 GROUP BY topic''', (user_id,))
+    rows = [dict(row) for row in c.fetchall()]
+    conn.close()
+    return rows
+
+
+def per_call_us(fn, calls, finish=None):
+    start = time.perf_counter()
+    for i in range(calls):
+        fn(i % 50)
+    if finish is not None:
+        finish()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before_path = os.path.join(tmp, "before.db")
+        after_path = os.path.join(tmp, "after.db")
+        os.environ["EDUTUTOR_DB_PATH"] = after_path
+        import database as db
+
+        # Same schema and seed data for both databases
+        db.DB_PATH = before_path
+        db.init_db()
+        db.close_db_connection()
+        with sqlite3.connect(before_path) as conn:
+            conn.execute("PRAGMA journal_mode=DELETE")
+        db.DB_PATH = after_path
+        db.init_db()
+        for path in (before_path, after_path):
+            with sqlite3.connect(path) as conn:
+                conn.executemany(
+                    '''INSERT INTO learning_progress (user_id, topic, score, time_spent)
+                       VALUES (?, ?, ?, ?)''',
+                    [(i % 50, f"topic-{i % 7}", 70.0, 60) for i in range(5000)]
+                )
+
+        results = [
+            ("read  get_user_progress", per_call_us(lambda u: legacy_read(before_path, u), args.calls),
+             per_call_us(db.get_user_progress, args.calls)),
+            ("write record_quiz_result", per_call_us(lambda u: legacy_insert(before_path, u), args.calls),
+             per_call_us(lambda u: db.record_quiz_result(u, "Algebra", 80.0, 10), args.calls, db.flush_writes)),
+            ("write start_study_session", per_call_us(lambda u: legacy_insert(before_path, u), args.calls),
+             per_call_us(lambda u: db.start_study_session(u, "Algebra", "quiz"), args.calls)),
+        ]
+        db.close_db_connection()
+
+    print(f"{'operation':<28}{'before (us)':>14}{'after (us)':>14}{'speedup':>10}")
+    for name, before, after in results:
+        print(f"{name:<28}{before:>14.1f}{after:>14.1f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
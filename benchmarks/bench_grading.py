@@ -0,0 +1,48 @@
+"""Latency and token use of grading a short-answer submission, per grading mode.
+
+"sequential" is the single-answer path (one grade_answer call after
+another); "concurrent" and "packed" are the batch modes of grade_answers.
+Calls go to the configured LLM endpoint (OPENAI_API_KEY / OPENAI_API_BASE).
+
+    python benchmarks/bench_grading.py [--questions N] [--concurrency N] [--pack-size N]
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SAMPLE = [
+    ("What does photosynthesis produce?", "Sugar and oxygen", "Glucose and oxygen"),
+    ("Why do seasons change on Earth?", "Because the Earth gets closer to the sun in summer",
+     "The tilt of Earth's axis changes how directly sunlight hits each hemisphere"),
+    ("What is the role of mitochondria?", "They make energy for the cell",
+     "They produce ATP through cellular respiration"),
+    ("State Newton's second law.", "Force equals mass times acceleration", "F = ma"),
+    ("What is a prime number?", "A number only divisible by itself",
+     "A natural number greater than 1 whose only divisors are 1 and itself"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--pack-size", type=int, default=5)
+    args = parser.parse_args()
+
+    from ai_teaching import ai_teaching
+    from grading import quiz_score
+
+    items = [SAMPLE[i % len(SAMPLE)] for i in range(args.questions)]
+    print(f"{'mode':<12}{'latency (s)':>13}{'calls':>7}{'prompt tok':>12}{'compl tok':>11}{'mean score':>12}")
+    for mode in ("sequential", "concurrent", "packed"):
+        report = ai_teaching.grade_answers(items, mode=mode, max_concurrency=args.concurrency, pack_size=args.pack_size)
+        mean = quiz_score(report.grades)
+        print(f"{mode:<12}{report.latency:>13.2f}{report.llm_calls:>7}{report.prompt_tokens:>12}"
+              f"{report.completion_tokens:>11}{mean:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
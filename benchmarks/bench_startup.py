@@ -0,0 +1,106 @@
+"""Import time per module and time-to-first-render per page of app.py.
+
+Every measurement runs in a fresh interpreter so nothing is already
+imported, and is repeated --repeat times; the median is reported. Pages are
+rendered headlessly with streamlit.testing's AppTest, opened directly
+through the ?page= query parameter. "first render" is the cold run in a new
+process, "rerun" the next run of the same page in that process.
+
+    python benchmarks/bench_startup.py [--repeat N] [--modules ...] [--pages ...]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    "database", "assets", "concurrency", "llm_cache", "ingestion", "retrieval",
+    "ai_teaching", "content_gen", "dashboard",
+]
+PAGES = ["Home", "Learn", "Quiz", "Practice", "Video Recommendations", "Dashboard", "Settings"]
+
+IMPORT_SNIPPET = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import {module}
+print(json.dumps({{"seconds": time.perf_counter() - start}}))
+"""
+
+RENDER_SNIPPET = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout=120)
+at.query_params["page"] = {page!r}
+start = time.perf_counter()
+at.run()
+first = time.perf_counter() - start
+start = time.perf_counter()
+at.run()
+rerun = time.perf_counter() - start
+print(json.dumps({{"first": first, "rerun": rerun, "errors": [str(e.value) for e in at.exception]}}))
+"""
+
+
+def run_snippet(code, env):
+    """Run code in a fresh interpreter and return the JSON it prints"""
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=env,
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def median_of(code, env, repeat, *fields):
+    """Median of each field over repeat fresh-process runs"""
+    runs = [run_snippet(code, env) for _ in range(repeat)]
+    return [statistics.median(run[f] for run in runs) for f in fields], runs[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--modules", nargs="*", default=MODULES)
+    parser.add_argument("--pages", nargs="*", default=PAGES)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env["EDUTUTOR_DB_PATH"] = os.path.join(tmp, "bench.db")
+        env["EDUTUTOR_CACHE_DIR"] = os.path.join(tmp, "cache")
+        # Clients are built at import time but no request is made
+        env.setdefault("OPENAI_API_KEY", "bench")
+
+        print(f"{'module':<16}{'import (ms)':>14}")
+        for module in args.modules:
+            try:
+                (seconds,), _ = median_of(IMPORT_SNIPPET.format(root=ROOT, module=module), env, args.repeat, "seconds")
+                print(f"{module:<16}{seconds * 1000:>14.1f}")
+            except RuntimeError as e:
+                print(f"{module:<16}{'failed':>14}  {e}")
+
+        print()
+        print(f"{'page':<24}{'first render (ms)':>20}{'rerun (ms)':>14}")
+        app = os.path.join(ROOT, "app.py")
+        for page in args.pages:
+            try:
+                (first, rerun), last = median_of(
+                    RENDER_SNIPPET.format(root=ROOT, app=app, page=page), env, args.repeat, "first", "rerun"
+                )
+            except RuntimeError as e:
+                print(f"{page:<24}{'failed':>20}  {e}")
+                continue
+            note = f"  ({last['errors'][0]})" if last["errors"] else ""
+            print(f"{page:<24}{first * 1000:>20.1f}{rerun * 1000:>14.1f}{note}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Default cap on simultaneous LLM requests from a single fan-out
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("EDUTUTOR_MAX_CONCURRENCY", "4"))
+
+
+async def gather_bounded(*coroutines, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+    """Await coroutines concurrently, at most max_concurrency at a time.
+
+    Results are returned in the order the coroutines were given.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*(run(c) for c in coroutines))
+
+
+def run_sync(coroutine):
+    """Run a coroutine to completion from synchronous code such as a Streamlit page"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    # Already inside an event loop: run on a private loop in a worker thread
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+
+def run_concurrently(*coroutines, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+    """Run coroutines with gather_bounded from synchronous code"""
+    return run_sync(gather_bounded(*coroutines, max_concurrency=max_concurrency))
@@ -1,32 +1,54 @@
-from langchain_community.chat_models import ChatOpenAI
 from langchain.prompts import PromptTemplate
 import os
 from dotenv import load_dotenv
+from concurrency import run_sync
+from llm_cache import LLMCache
+from llm_client import get_client
+from metrics import metrics
+from summarization import MapReduceSummarizer, needs_map_reduce
+from quiz import build_quiz, abuild_quiz, quiz_prompt
 
 # Load environment variables
 load_dotenv()
 
-# Initialize the LLMcan you make me like home and learing page 
-llm = ChatOpenAI(
-    model="mistralai/mixtral-8x7b-instruct",
-    temperature=0.7,
-    openai_api_key=os.getenv("OPENAI_API_KEY"),
-    openai_api_base=os.getenv("OPENAI_API_BASE")
+# Shared, pooled client for content generation
+llm = get_client("content")
+
+async def _acall(method, prompt):
+    """Invoke the LLM asynchronously, raising on failure"""
+    return await llm.ainvoke(prompt, method)
+
+# Map-reduce summarizer for documents too large for one prompt
+summarizer = MapReduceSummarizer(
+    _acall,
+    cache=LLMCache() if os.getenv("EDUTUTOR_LLM_CACHE", "1") != "0" else None,
+    model=llm.model_name,
+    temperature=llm.temperature,
+    reduce_method="content_summary"
 )
 
-def generate_lesson(topic, detail_level="Basic", difficulty="Intermediate", learning_style=["Visual"]):
-    """
-    Generate a personalized lesson on the given topic
-    
-    Args:
-        topic (str): The topic to generate a lesson about
-        detail_level (str): Level of detail ("Overview", "Basic", "Detailed", "Comprehensive")
-        difficulty (str): Difficulty level ("Beginner", "Intermediate", "Advanced")
-        learning_style (list): Preferred learning styles (e.g., ["Visual", "Auditory"])
-    
-    Returns:
-        str: Generated lesson content
-    """
+def _feature(what):
+    """Name under which calls generating what are budgeted and accounted"""
+    return "content_" + what.replace(" ", "_")
+
+def _invoke(prompt, what):
+    """Invoke the LLM, reporting failures in the returned text"""
+    try:
+        return llm.invoke(prompt, _feature(what))
+    except Exception as e:
+        metrics.record_error(_feature(what), e)
+        return f"Error generating {what}: {str(e)}"
+
+async def _ainvoke(prompt, what):
+    """Async counterpart of _invoke"""
+    try:
+        return await llm.ainvoke(prompt, _feature(what))
+    except Exception as e:
+        metrics.record_error(_feature(what), e)
+        return f"Error generating {what}: {str(e)}"
+
+def _lesson_prompt(topic, detail_level, difficulty, learning_style):
+    """Render the lesson prompt"""
     prompt_template = PromptTemplate(
         input_variables=["topic", "detail_level", "difficulty", "learning_style"],
         template="""Create a {detail_level} lesson about {topic} for a {difficulty} level student who prefers {learning_style} learning style. 
@@ -39,30 +61,15 @@ def generate_lesson(topic, detail_level="Basic", difficulty="Intermediate", lear
         Make it engaging and suitable for the specified level. Use markdown formatting for headings, lists, and emphasis."""
     )
     
-    prompt = prompt_template.format(
+    return prompt_template.format(
         topic=topic,
         detail_level=detail_level,
         difficulty=difficulty,
         learning_style=", ".join(learning_style)
     )
-    
-    try:
-        response = llm.invoke(prompt)
-        return response.content
-    except Exception as e:
-        return f"Error generating lesson: {str(e)}"
 
-def generate_quiz(topic, difficulty="Intermediate"):
-    """
-    Generate a quiz with questions about the given topic
-    
-    Args:
-        topic (str): The topic to generate a quiz about
-        difficulty (str): Difficulty level ("Beginner", "Intermediate", "Advanced")
-    
-    Returns:
-        str: Generated quiz content
-    """
+def _quiz_prompt(topic, difficulty):
+    """Render the quiz prompt"""
     prompt_template = PromptTemplate(
         input_variables=["topic", "difficulty"],
         template="""Create a 5-question multiple choice quiz about {topic} suitable for {difficulty} level students. 
@@ -75,28 +82,13 @@ def generate_quiz(topic, difficulty="Intermediate"):
         Use markdown formatting for clear presentation."""
     )
     
-    prompt = prompt_template.format(
+    return prompt_template.format(
         topic=topic,
         difficulty=difficulty
     )
-    
-    try:
-        response = llm.invoke(prompt)
-        return response.content
-    except Exception as e:
-        return f"Error generating quiz: {str(e)}"
 
-def generate_flashcards(topic, count=5):
-    """
-    Generate flashcards for the given topic
-    
-    Args:
-        topic (str): The topic to generate flashcards about
-        count (int): Number of flashcards to generate
-    
-    Returns:
-        str: Generated flashcards content
-    """
+def _flashcards_prompt(topic, count):
+    """Render the flashcards prompt"""
     prompt_template = PromptTemplate(
         input_variables=["topic", "count"],
         template="""Create {count} flashcards about {topic}. For each flashcard:
@@ -107,28 +99,13 @@ def generate_flashcards(topic, count=5):
         Ensure the flashcards cover key concepts and important details about the topic."""
     )
     
-    prompt = prompt_template.format(
+    return prompt_template.format(
         topic=topic,
         count=count
     )
-    
-    try:
-        response = llm.invoke(prompt)
-        return response.content
-    except Exception as e:
-        return f"Error generating flashcards: {str(e)}"
 
-def generate_practice_exercises(topic, difficulty="Intermediate"):
-    """
-    Generate practice exercises for the given topic
-    
-    Args:
-        topic (str): The topic to generate exercises about
-        difficulty (str): Difficulty level ("Beginner", "Intermediate", "Advanced")
-    
-    Returns:
-        str: Generated exercises with solutions
-    """
+def _exercises_prompt(topic, difficulty):
+    """Render the practice exercises prompt"""
     prompt_template = PromptTemplate(
         input_variables=["topic", "difficulty"],
         template="""Create 3 practice exercises about {topic} suitable for {difficulty} level students.
@@ -140,28 +117,13 @@ def generate_practice_exercises(topic, difficulty="Intermediate"):
         Make the exercises progressively more challenging. Use markdown formatting for clear presentation."""
     )
     
-    prompt = prompt_template.format(
+    return prompt_template.format(
         topic=topic,
         difficulty=difficulty
     )
-    
-    try:
-        response = llm.invoke(prompt)
-        return response.content
-    except Exception as e:
-        return f"Error generating practice exercises: {str(e)}"
 
-def summarize_content(content, length="short"):
-    """
-    Summarize the given content to the specified length
-    
-    Args:
-        content (str): Content to summarize
-        length (str): Desired length ("short", "medium", "long")
-    
-    Returns:
-        str: Generated summary
-    """
+def _summary_prompt(content, length):
+    """Render the summary prompt"""
     prompt_template = PromptTemplate(
         input_variables=["content", "length"],
         template="""Create a {length} summary of the following content:
@@ -170,13 +132,136 @@ def summarize_content(content, length="short"):
         The summary should capture the key points and main ideas while being concise."""
     )
     
-    prompt = prompt_template.format(
+    return prompt_template.format(
         content=content,
         length=length
     )
+
+def generate_lesson(topic, detail_level="Basic", difficulty="Intermediate", learning_style=["Visual"]):
+    """
+    Generate a personalized lesson on the given topic
+    
+    Args:
+        topic (str): The topic to generate a lesson about
+        detail_level (str): Level of detail ("Overview", "Basic", "Detailed", "Comprehensive")
+        difficulty (str): Difficulty level ("Beginner", "Intermediate", "Advanced")
+        learning_style (list): Preferred learning styles (e.g., ["Visual", "Auditory"])
+    
+    Returns:
+        str: Generated lesson content
+    """
+    return _invoke(_lesson_prompt(topic, detail_level, difficulty, learning_style), "lesson")
+
+async def agenerate_lesson(topic, detail_level="Basic", difficulty="Intermediate", learning_style=["Visual"]):
+    """Async version of generate_lesson"""
+    return await _ainvoke(_lesson_prompt(topic, detail_level, difficulty, learning_style), "lesson")
+
+def generate_quiz(topic, difficulty="Intermediate"):
+    """
+    Generate a quiz with questions about the given topic
+    
+    Args:
+        topic (str): The topic to generate a quiz about
+        difficulty (str): Difficulty level ("Beginner", "Intermediate", "Advanced")
+    
+    Returns:
+        str: Generated quiz content
+    """
+    return _invoke(_quiz_prompt(topic, difficulty), "quiz")
+
+async def agenerate_quiz(topic, difficulty="Intermediate"):
+    """Async version of generate_quiz"""
+    return await _ainvoke(_quiz_prompt(topic, difficulty), "quiz")
+
+def generate_structured_quiz(topic, difficulty="Intermediate", num_questions=5):
+    """
+    Generate a validated multiple choice quiz about the given topic
+    
+    Args:
+        topic (str): The topic to generate a quiz about
+        difficulty (str): Difficulty level ("Beginner", "Intermediate", "Advanced")
+        num_questions (int): Number of questions
     
+    Returns:
+        Quiz: Parsed quiz; its retries field counts the re-asks it took
+    """
     try:
-        response = llm.invoke(prompt)
-        return response.content
+        quiz, _ = build_quiz(
+            lambda prompt, attempt: llm.invoke(prompt, _feature("quiz" if attempt == 0 else "quiz reask")),
+            quiz_prompt(topic, num_questions, "multiple_choice", difficulty)
+        )
+        return quiz
     except Exception as e:
-        return f"Error generating summary: {str(e)}"
\ No newline at end of file
+        metrics.record_error(_feature("quiz"), e)
+        return f"Error generating quiz: {str(e)}"
+
+async def agenerate_structured_quiz(topic, difficulty="Intermediate", num_questions=5):
+    """Async version of generate_structured_quiz"""
+    try:
+        quiz, _ = await abuild_quiz(
+            lambda prompt, attempt: llm.ainvoke(prompt, _feature("quiz" if attempt == 0 else "quiz reask")),
+            quiz_prompt(topic, num_questions, "multiple_choice", difficulty)
+        )
+        return quiz
+    except Exception as e:
+        metrics.record_error(_feature("quiz"), e)
+        return f"Error generating quiz: {str(e)}"
+
+def generate_flashcards(topic, count=5):
+    """
+    Generate flashcards for the given topic
+    
+    Args:
+        topic (str): The topic to generate flashcards about
+        count (int): Number of flashcards to generate
+    
+    Returns:
+        str: Generated flashcards content
+    """
+    return _invoke(_flashcards_prompt(topic, count), "flashcards")
+
+async def agenerate_flashcards(topic, count=5):
+    """Async version of generate_flashcards"""
+    return await _ainvoke(_flashcards_prompt(topic, count), "flashcards")
+
+def generate_practice_exercises(topic, difficulty="Intermediate"):
+    """
+    Generate practice exercises for the given topic
+    
+    Args:
+        topic (str): The topic to generate exercises about
+        difficulty (str): Difficulty level ("Beginner", "Intermediate", "Advanced")
+    
+    Returns:
+        str: Generated exercises with solutions
+    """
+    return _invoke(_exercises_prompt(topic, difficulty), "practice exercises")
+
+async def agenerate_practice_exercises(topic, difficulty="Intermediate"):
+    """Async version of generate_practice_exercises"""
+    return await _ainvoke(_exercises_prompt(topic, difficulty), "practice exercises")
+
+def summarize_content(content, length="short"):
+    """
+    Summarize the given content to the specified length
+    
+    Args:
+        content (str): Content to summarize
+        length (str): Desired length ("short", "medium", "long")
+    
+    Returns:
+        str: Generated summary
+    """
+    if needs_map_reduce(content):
+        return run_sync(asummarize_content(content, length))
+    return _invoke(_summary_prompt(content, length), "summary")
+
+async def asummarize_content(content, length="short"):
+    """Async version of summarize_content"""
+    if needs_map_reduce(content):
+        try:
+            return await summarizer.asummarize(content, length)
+        except Exception as e:
+            metrics.record_error(_feature("summary"), e)
+            return f"Error generating summary: {str(e)}"
+    return await _ainvoke(_summary_prompt(content, length), "summary")
\ No newline at end of file
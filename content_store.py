@@ -0,0 +1,113 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from llm_cache import CACHE_DIR
+
+CONTENT_STORE_PATH = os.path.join(CACHE_DIR, "content.db")
+
+
+def normalize_topic(topic):
+    """Case- and whitespace-insensitive form of a topic used in keys"""
+    return " ".join(str(topic).lower().split())
+
+
+def content_key(kind, topic, **params):
+    """Key of a piece of content: its kind, normalized topic and generation parameters"""
+    normalized = {}
+    for name, value in params.items():
+        if isinstance(value, (list, tuple)):
+            value = sorted(value)
+        normalized[name] = value
+    return json.dumps([kind, normalize_topic(topic), normalized], sort_keys=True)
+
+
+class ContentStore:
+    """Persistent store of pre-generated lessons, quizzes, exercises and flashcards.
+
+    Filled offline by pregenerate.py; pages look content up here before
+    generating it, so pre-generated combinations are served instantly.
+    """
+
+    def __init__(self, path=CONTENT_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute('''CREATE TABLE IF NOT EXISTS content (
+            key TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            topic TEXT NOT NULL,
+            params TEXT NOT NULL,
+            value TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS content_failures (
+            key TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            topic TEXT NOT NULL,
+            params TEXT NOT NULL,
+            error TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 1,
+            last_attempt REAL NOT NULL
+        )''')
+        conn.commit()
+
+    def _connect(self):
+        """Get this thread's connection to the content store"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, kind, topic, **params):
+        """Return stored content, or None if it hasn't been generated"""
+        row = self._connect().execute('SELECT value FROM content WHERE key = ?',
+                                      (content_key(kind, topic, **params),)).fetchone()
+        return row[0] if row else None
+
+    def has(self, key):
+        return self._connect().execute('SELECT 1 FROM content WHERE key = ?', (key,)).fetchone() is not None
+
+    def put(self, kind, topic, value, **params):
+        """Store content, clearing any failure recorded for it"""
+        key = content_key(kind, topic, **params)
+        conn = self._connect()
+        with conn:
+            conn.execute('''INSERT OR REPLACE INTO content (key, kind, topic, params, value, created_at)
+                            VALUES (?, ?, ?, ?, ?, ?)''',
+                         (key, kind, normalize_topic(topic), json.dumps(params, sort_keys=True), value, time.time()))
+            conn.execute('DELETE FROM content_failures WHERE key = ?', (key,))
+
+    def record_failure(self, kind, topic, error, **params):
+        """Remember that generating a piece of content failed"""
+        conn = self._connect()
+        with conn:
+            conn.execute('''INSERT INTO content_failures (key, kind, topic, params, error, last_attempt)
+                            VALUES (?, ?, ?, ?, ?, ?)
+                            ON CONFLICT(key) DO UPDATE SET error = excluded.error,
+                                attempts = attempts + 1, last_attempt = excluded.last_attempt''',
+                         (content_key(kind, topic, **params), kind, normalize_topic(topic),
+                          json.dumps(params, sort_keys=True), error, time.time()))
+
+    def failures(self):
+        """Return recorded failures, most recent first"""
+        rows = self._connect().execute('''SELECT kind, topic, params, error, attempts FROM content_failures
+                                          ORDER BY last_attempt DESC''').fetchall()
+        return [{"kind": r[0], "topic": r[1], "params": json.loads(r[2]), "error": r[3], "attempts": r[4]}
+                for r in rows]
+
+    def counts(self):
+        """Return the number of stored items per kind"""
+        return dict(self._connect().execute('SELECT kind, COUNT(*) FROM content GROUP BY kind').fetchall())
+
+
+# Initialize the shared content store
+content_store = ContentStore()
@@ -5,9 +5,12 @@ import pandas as pd
 from datetime import datetime, timedelta
 import database as db
 import altair as alt
+from timeseries import downsample_frame, MAX_CHART_POINTS
 
 class Dashboard:
-    def __init__(self):
+    def __init__(self, max_chart_points=MAX_CHART_POINTS):
+        # Long time series are downsampled to this many points per chart
+        self.max_chart_points = max_chart_points
         self.colors = {
             'primary': '#4B8BBE',
             'secondary': '#FF4B4B',
@@ -15,9 +18,10 @@ class Dashboard:
             'text': '#333333'
         }
 
-    def show_learning_progress(self, user_id):
+    def show_learning_progress(self, user_id, progress=None):
         """Display learning progress charts"""
-        progress = db.get_user_progress(user_id)
+        if progress is None:
+            progress = db.get_user_progress(user_id)
         if not progress:
             st.info("No learning progress data available yet.")
             return
@@ -57,9 +61,10 @@ class Dashboard:
         )
         st.plotly_chart(fig, use_container_width=True)
 
-    def show_quiz_performance(self, user_id):
+    def show_quiz_performance(self, user_id, quiz_history=None):
         """Display quiz performance metrics"""
-        quiz_history = db.get_quiz_history(user_id)
+        if quiz_history is None:
+            quiz_history = db.get_quiz_history(user_id)
         if not quiz_history:
             st.info("No quiz history available yet.")
             return
@@ -68,9 +73,9 @@ class Dashboard:
         df = pd.DataFrame(quiz_history)
         df['completed_at'] = pd.to_datetime(df['completed_at'])
         
-        # Quiz scores over time
+        # Quiz scores over time, downsampled so the figure payload stays bounded
         fig = px.line(
-            df,
+            downsample_frame(df, 'completed_at', 'score', self.max_chart_points),
             x='completed_at',
             y='score',
             title='Quiz Performance Over Time',
@@ -110,9 +115,10 @@ class Dashboard:
         )
         st.plotly_chart(fig, use_container_width=True)
 
-    def show_study_analytics(self, user_id):
+    def show_study_analytics(self, user_id, stats=None, daily_activity=None):
         """Display study analytics"""
-        stats = db.get_study_stats(user_id)
+        if stats is None:
+            stats = db.get_study_stats(user_id)
         if not stats:
             st.info("No study statistics available yet.")
             return
@@ -143,21 +149,19 @@ class Dashboard:
                 delta=None
             )
 
-        # Study streak calendar
-        study_sessions = db.get_study_sessions(user_id)
-        if study_sessions:
-            df = pd.DataFrame(study_sessions)
-            df['date'] = pd.to_datetime(df['start_time']).dt.date
+        # Study streak calendar, from sessions already aggregated per day
+        if daily_activity is None:
+            daily_activity = db.get_daily_study_activity(user_id)
+        if daily_activity:
+            calendar_data = pd.DataFrame(daily_activity)
+            calendar_data['date'] = pd.to_datetime(calendar_data['day'])
             
             # Create calendar heatmap
-            calendar_data = df.groupby('date').size().reset_index(name='count')
-            calendar_data['date'] = pd.to_datetime(calendar_data['date'])
-            
             fig = px.density_heatmap(
                 calendar_data,
                 x=calendar_data['date'].dt.day_name(),
                 y=calendar_data['date'].dt.isocalendar().week,
-                z='count',
+                z='sessions',
                 title='Study Activity Calendar',
                 color_continuous_scale=['#f0f4f8', '#4B8BBE']
             )
@@ -168,9 +172,10 @@ class Dashboard:
             )
             st.plotly_chart(fig, use_container_width=True)
 
-    def show_achievements(self, user_id):
+    def show_achievements(self, user_id, achievements=None):
         """Display user achievements"""
-        achievements = db.get_user_achievements(user_id)
+        if achievements is None:
+            achievements = db.get_user_achievements(user_id)
         if not achievements:
             st.info("No achievements earned yet.")
             return
@@ -192,9 +197,10 @@ class Dashboard:
                     </div>
                 """, unsafe_allow_html=True)
 
-    def show_learning_path(self, user_id):
+    def show_learning_path(self, user_id, progress=None):
         """Display recommended learning path"""
-        progress = db.get_user_progress(user_id)
+        if progress is None:
+            progress = db.get_user_progress(user_id)
         if not progress:
             st.info("Complete some lessons to get personalized recommendations.")
             return
@@ -231,5 +237,144 @@ class Dashboard:
         
         st.plotly_chart(fig, use_container_width=True)
 
+    def show_llm_usage(self, by_feature=None, daily=None):
+        """Display LLM token usage and latency per feature"""
+        if by_feature is None:
+            by_feature = db.get_llm_usage_by_feature()
+        if not by_feature:
+            st.info("No AI usage recorded yet.")
+            return
+
+        df = pd.DataFrame(by_feature)
+        df['total_tokens'] = df['prompt_tokens'] + df['completion_tokens']
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("LLM Calls", int(df['calls'].sum()))
+        with col2:
+            st.metric("Tokens", f"{int(df['total_tokens'].sum()):,}")
+        with col3:
+            st.metric("Truncated Prompts", int(df['truncated_calls'].sum()))
+
+        # Prompt and completion tokens per feature
+        per_feature = df.groupby('feature')[['prompt_tokens', 'completion_tokens']].sum().reset_index()
+        fig = px.bar(
+            per_feature.melt(id_vars='feature', var_name='kind', value_name='tokens'),
+            x='feature',
+            y='tokens',
+            color='kind',
+            title='Tokens by Feature',
+            labels={'feature': 'Feature', 'tokens': 'Tokens', 'kind': ''}
+        )
+        fig.update_layout(
+            plot_bgcolor=self.colors['background'],
+            paper_bgcolor=self.colors['background'],
+            font={'color': self.colors['text']}
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+        if daily is None:
+            daily = db.get_llm_usage_daily()
+        if daily:
+            daily_df = pd.DataFrame(daily)
+            daily_df['day'] = pd.to_datetime(daily_df['day'])
+            fig = px.line(
+                daily_df,
+                x='day',
+                y=['prompt_tokens', 'completion_tokens'],
+                title='Daily Token Usage',
+                labels={'day': 'Date', 'value': 'Tokens', 'variable': ''},
+                markers=True
+            )
+            fig.update_layout(
+                plot_bgcolor=self.colors['background'],
+                paper_bgcolor=self.colors['background'],
+                font={'color': self.colors['text']}
+            )
+            st.plotly_chart(fig, use_container_width=True)
+
+        df['avg_latency'] = df['avg_latency'].round(2)
+        df['max_latency'] = df['max_latency'].round(2)
+        st.dataframe(
+            df[['feature', 'model', 'calls', 'prompt_tokens', 'completion_tokens',
+                'avg_latency', 'max_latency', 'truncated_calls']],
+            use_container_width=True,
+            hide_index=True
+        )
+
+    def show_llm_metrics(self, snapshot):
+        """Display LLM latency, error, retry and cache metrics"""
+        latency = snapshot["latency"]
+        calls = sum(row["calls"] for row in latency)
+        errors = sum(row["count"] for row in snapshot["errors"])
+        retries = sum(row["count"] for row in snapshot["retries"])
+        hits = sum(row["hits"] for row in snapshot["cache"])
+        lookups = hits + sum(row["misses"] for row in snapshot["cache"])
+
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("LLM Calls", calls)
+        with col2:
+            st.metric("Errors", errors)
+        with col3:
+            st.metric("Retries", retries)
+        with col4:
+            st.metric("Cache Hit Ratio", f"{hits / lookups:.0%}" if lookups else "n/a")
+
+        st.markdown("#### Latency")
+        if latency:
+            df = pd.DataFrame(latency)
+            for column in ('mean', 'p50', 'p95'):
+                df[column] = df[column].round(2)
+            st.dataframe(df[['method', 'streamed', 'calls', 'mean', 'p50', 'p95']],
+                         use_container_width=True, hide_index=True)
+
+            # Calls per latency bucket, from the cumulative bucket counts
+            rows = []
+            for row in latency:
+                previous = 0
+                for bound, cumulative in row["buckets"].items():
+                    rows.append({'method': row['method'], 'bucket': f"≤ {bound:g}s", 'calls': cumulative - previous})
+                    previous = cumulative
+                rows.append({'method': row['method'], 'bucket': "more", 'calls': row['calls'] - previous})
+            fig = px.bar(
+                pd.DataFrame(rows).groupby(['bucket', 'method'], sort=False)['calls'].sum().reset_index(),
+                x='bucket',
+                y='calls',
+                color='method',
+                title='Latency Distribution',
+                labels={'bucket': 'Latency', 'calls': 'Calls', 'method': 'Method'}
+            )
+            fig.update_layout(
+                plot_bgcolor=self.colors['background'],
+                paper_bgcolor=self.colors['background'],
+                font={'color': self.colors['text']}
+            )
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.info("No LLM calls completed yet.")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown("#### Errors")
+            if snapshot["errors"]:
+                st.dataframe(pd.DataFrame(snapshot["errors"]), use_container_width=True, hide_index=True)
+            else:
+                st.info("No errors recorded.")
+        with col2:
+            st.markdown("#### Retries")
+            if snapshot["retries"]:
+                st.dataframe(pd.DataFrame(snapshot["retries"]), use_container_width=True, hide_index=True)
+            else:
+                st.info("No retries recorded.")
+
+        st.markdown("#### Response Cache")
+        if snapshot["cache"]:
+            df = pd.DataFrame(snapshot["cache"])
+            df['hit_ratio'] = df['hit_ratio'].round(3)
+            st.dataframe(df, use_container_width=True, hide_index=True)
+        else:
+            st.info("No cache lookups recorded.")
+
 # Initialize dashboard
 dashboard = Dashboard() 
\ No newline at end of file
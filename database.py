@@ -1,212 +1,786 @@
 import sqlite3
 import json
-from datetime import datetime
+from datetime import datetime, date, timezone
 import os
+import threading
+import queue
+import time
+import atexit
+import logging
+from concurrent.futures import Future
+from collections import OrderedDict
 
-DB_PATH = "edututor.db"
+DB_PATH = os.getenv("EDUTUTOR_DB_PATH", "edututor.db")
+
+logger = logging.getLogger(__name__)
+
+# Per-user rollups maintained by triggers in the same transaction as the raw
+# rows, so dashboard reads cost O(topics) or O(days) rather than O(history)
+_SESSION_SECONDS = "CASE WHEN {r}.end_time IS NOT NULL THEN strftime('%s', {r}.end_time) - strftime('%s', {r}.start_time) END"
+
+def _add_session_rollups(r):
+    """Trigger statements adding the study session row aliased r to the rollups"""
+    seconds = _SESSION_SECONDS.format(r=r)
+    return f'''
+        INSERT INTO user_daily_study (user_id, day, sessions, completed_sessions, total_time)
+        VALUES ({r}.user_id, DATE({r}.start_time), 1, {r}.end_time IS NOT NULL, COALESCE({seconds}, 0))
+        ON CONFLICT (user_id, day) DO UPDATE SET
+            sessions = sessions + 1,
+            completed_sessions = completed_sessions + excluded.completed_sessions,
+            total_time = total_time + excluded.total_time;
+        INSERT INTO user_study_topics (user_id, topic, completed_sessions)
+        SELECT {r}.user_id, {r}.topic, 1 WHERE {r}.end_time IS NOT NULL AND {r}.topic IS NOT NULL
+        ON CONFLICT (user_id, topic) DO UPDATE SET completed_sessions = completed_sessions + 1;'''
+
+def _remove_session_rollups(r):
+    """Trigger statements removing the study session row aliased r from the rollups"""
+    seconds = _SESSION_SECONDS.format(r=r)
+    return f'''
+        UPDATE user_daily_study SET
+            sessions = sessions - 1,
+            completed_sessions = completed_sessions - ({r}.end_time IS NOT NULL),
+            total_time = total_time - COALESCE({seconds}, 0)
+        WHERE user_id = {r}.user_id AND day = DATE({r}.start_time);
+        UPDATE user_study_topics SET completed_sessions = completed_sessions - 1
+        WHERE {r}.end_time IS NOT NULL AND user_id = {r}.user_id AND topic = {r}.topic;'''
+
+def _add_progress_rollups(r):
+    """Trigger statement adding the learning progress row aliased r to its topic rollup"""
+    return f'''
+            INSERT INTO user_topic_progress (user_id, topic, score_sum, score_count, total_time, entries)
+            VALUES ({r}.user_id, {r}.topic, COALESCE({r}.score, 0), {r}.score IS NOT NULL, {r}.time_spent, 1)
+            ON CONFLICT (user_id, topic) DO UPDATE SET
+                score_sum = score_sum + excluded.score_sum,
+                score_count = score_count + excluded.score_count,
+                total_time = CASE WHEN excluded.total_time IS NULL THEN total_time
+                                  ELSE COALESCE(total_time, 0) + excluded.total_time END,
+                entries = entries + 1;'''
+
+def _remove_progress_rollups(r):
+    """Trigger statement removing the learning progress row aliased r from its topic rollup.
+
+    Like SUM(time_spent), total_time goes back to NULL once no row of the
+    topic has a time left.
+    """
+    return f'''
+            UPDATE user_topic_progress SET
+                score_sum = score_sum - COALESCE({r}.score, 0),
+                score_count = score_count - ({r}.score IS NOT NULL),
+                total_time = CASE WHEN EXISTS (SELECT 1 FROM learning_progress
+                                               WHERE user_id = {r}.user_id AND topic = {r}.topic
+                                                 AND time_spent IS NOT NULL)
+                                  THEN total_time - COALESCE({r}.time_spent, 0) END,
+                entries = entries - 1
+            WHERE user_id = {r}.user_id AND topic = {r}.topic;'''
+
+_PRUNE_PROGRESS_ROLLUPS = '''
+            DELETE FROM user_topic_progress WHERE user_id = OLD.user_id AND topic = OLD.topic AND entries <= 0;'''
+
+_PRUNE_SESSION_ROLLUPS = '''
+        DELETE FROM user_daily_study WHERE user_id = OLD.user_id AND day = DATE(OLD.start_time) AND sessions <= 0;
+        DELETE FROM user_study_topics WHERE user_id = OLD.user_id AND topic = OLD.topic AND completed_sessions <= 0;'''
+
+ROLLUP_REBUILD_STATEMENTS = [
+    'DELETE FROM user_topic_progress',
+    '''INSERT INTO user_topic_progress (user_id, topic, score_sum, score_count, total_time, entries)
+       SELECT user_id, topic, COALESCE(SUM(score), 0), COUNT(score), SUM(time_spent), COUNT(*)
+       FROM learning_progress
+       GROUP BY user_id, topic''',
+    'DELETE FROM user_daily_study',
+    '''INSERT INTO user_daily_study (user_id, day, sessions, completed_sessions, total_time)
+       SELECT user_id, DATE(start_time), COUNT(*), COUNT(end_time),
+              COALESCE(SUM(''' + _SESSION_SECONDS.format(r="study_sessions") + '''), 0)
+       FROM study_sessions
+       GROUP BY user_id, DATE(start_time)''',
+    'DELETE FROM user_study_topics',
+    '''INSERT INTO user_study_topics (user_id, topic, completed_sessions)
+       SELECT user_id, topic, COUNT(*)
+       FROM study_sessions
+       WHERE end_time IS NOT NULL AND topic IS NOT NULL
+       GROUP BY user_id, topic''',
+]
+
+# Tables whose writes change what a user's dashboard shows
+ACTIVITY_TABLES = ("learning_progress", "quiz_results", "study_sessions", "achievements")
+
+def _bump_activity_version(r):
+    """Trigger statement bumping the activity version of row alias r's user"""
+    return f'''
+            INSERT INTO user_activity_version (user_id, version)
+            SELECT {r}.user_id, 1 WHERE {r}.user_id IS NOT NULL
+            ON CONFLICT (user_id) DO UPDATE SET version = version + 1;'''
+
+def _activity_version_triggers():
+    """Triggers bumping a user's activity version on every write to their rows"""
+    triggers = []
+    for table in ACTIVITY_TABLES:
+        for event, body in (("INSERT", _bump_activity_version("NEW")),
+                            ("UPDATE", _bump_activity_version("OLD") + _bump_activity_version("NEW")),
+                            ("DELETE", _bump_activity_version("OLD"))):
+            triggers.append(f'''CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_version AFTER {event} ON {table}
+        BEGIN{body}
+        END''')
+    return triggers
+
+# Schema migrations as (version, description, statements), applied in order.
+# PRAGMA user_version records the last version applied to a database.
+MIGRATIONS = [
+    (1, "Initial schema", [
+        '''CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            full_name TEXT NOT NULL,
+            password_hash TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_login TIMESTAMP,
+            preferred_language TEXT DEFAULT 'en',
+            role TEXT DEFAULT 'student'
+        )''',
+        '''CREATE TABLE IF NOT EXISTS learning_progress (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            topic TEXT NOT NULL,
+            score REAL,
+            time_spent INTEGER,
+            completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )''',
+        '''CREATE TABLE IF NOT EXISTS quiz_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            quiz_topic TEXT NOT NULL,
+            score REAL,
+            total_questions INTEGER,
+            completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )''',
+        '''CREATE TABLE IF NOT EXISTS study_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            start_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            end_time TIMESTAMP,
+            topic TEXT,
+            session_type TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )''',
+        '''CREATE TABLE IF NOT EXISTS achievements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            achievement_type TEXT NOT NULL,
+            earned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )''',
+    ]),
+    (2, "Per-user indexes for history and progress queries", [
+        'CREATE INDEX IF NOT EXISTS idx_learning_progress_user_topic ON learning_progress (user_id, topic)',
+        'CREATE INDEX IF NOT EXISTS idx_learning_progress_user_completed ON learning_progress (user_id, completed_at)',
+        'CREATE INDEX IF NOT EXISTS idx_quiz_results_user_completed ON quiz_results (user_id, completed_at)',
+        'CREATE INDEX IF NOT EXISTS idx_study_sessions_user_start ON study_sessions (user_id, start_time)',
+        'CREATE INDEX IF NOT EXISTS idx_achievements_user_earned ON achievements (user_id, earned_at)',
+    ]),
+    (3, "Per-user rollups for progress and study statistics", [
+        '''CREATE TABLE IF NOT EXISTS user_topic_progress (
+            user_id INTEGER,
+            topic TEXT NOT NULL,
+            score_sum REAL NOT NULL DEFAULT 0,
+            score_count INTEGER NOT NULL DEFAULT 0,
+            total_time INTEGER,
+            entries INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, topic)
+        )''',
+        '''CREATE TABLE IF NOT EXISTS user_daily_study (
+            user_id INTEGER,
+            day TEXT,
+            sessions INTEGER NOT NULL DEFAULT 0,
+            completed_sessions INTEGER NOT NULL DEFAULT 0,
+            total_time INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, day)
+        )''',
+        '''CREATE TABLE IF NOT EXISTS user_study_topics (
+            user_id INTEGER,
+            topic TEXT NOT NULL,
+            completed_sessions INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, topic)
+        )''',
+        'CREATE TRIGGER IF NOT EXISTS trg_learning_progress_insert AFTER INSERT ON learning_progress\n        BEGIN'
+        + _add_progress_rollups("NEW") + '\n        END',
+        'CREATE TRIGGER IF NOT EXISTS trg_learning_progress_delete AFTER DELETE ON learning_progress\n        BEGIN'
+        + _remove_progress_rollups("OLD") + _PRUNE_PROGRESS_ROLLUPS + '\n        END',
+        'CREATE TRIGGER IF NOT EXISTS trg_study_sessions_insert AFTER INSERT ON study_sessions\n        BEGIN'
+        + _add_session_rollups("NEW") + '\n        END',
+        'CREATE TRIGGER IF NOT EXISTS trg_study_sessions_update AFTER UPDATE ON study_sessions\n        BEGIN'
+        + _remove_session_rollups("OLD") + _add_session_rollups("NEW") + _PRUNE_SESSION_ROLLUPS + '\n        END',
+        'CREATE TRIGGER IF NOT EXISTS trg_study_sessions_delete AFTER DELETE ON study_sessions\n        BEGIN'
+        + _remove_session_rollups("OLD") + _PRUNE_SESSION_ROLLUPS + '\n        END',
+    ] + ROLLUP_REBUILD_STATEMENTS),
+    (4, "Per-user activity versions for dashboard cache invalidation", [
+        '''CREATE TABLE IF NOT EXISTS user_activity_version (
+            user_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )''',
+    ] + _activity_version_triggers()),
+    (5, "LLM token usage per call", [
+        '''CREATE TABLE IF NOT EXISTS llm_usage (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            feature TEXT NOT NULL,
+            model TEXT NOT NULL,
+            prompt_tokens INTEGER NOT NULL,
+            completion_tokens INTEGER NOT NULL,
+            latency REAL NOT NULL,
+            truncated BOOLEAN NOT NULL DEFAULT 0,
+            streamed BOOLEAN NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_llm_usage_created ON llm_usage (created_at)',
+    ]),
+    # Migration 3 missed updates to learning_progress and left total_time at
+    # 0 instead of NULL once a topic's timed rows were gone; the rebuild
+    # repairs any drift either caused
+    (6, "Keep topic progress rollups in step with updated progress rows", [
+        'DROP TRIGGER IF EXISTS trg_learning_progress_delete',
+        'CREATE TRIGGER IF NOT EXISTS trg_learning_progress_delete AFTER DELETE ON learning_progress\n        BEGIN'
+        + _remove_progress_rollups("OLD") + _PRUNE_PROGRESS_ROLLUPS + '\n        END',
+        'CREATE TRIGGER IF NOT EXISTS trg_learning_progress_update AFTER UPDATE ON learning_progress\n        BEGIN'
+        + _remove_progress_rollups("OLD") + _add_progress_rollups("NEW") + _PRUNE_PROGRESS_ROLLUPS + '\n        END',
+    ] + ROLLUP_REBUILD_STATEMENTS),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def migrate(conn):
+    """Apply pending migrations to conn and return the resulting schema version"""
+    current = conn.execute('PRAGMA user_version').fetchone()[0]
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        # Take the write lock, then re-check in case another process migrated first
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            current = conn.execute('PRAGMA user_version').fetchone()[0]
+            if version > current:
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(f'PRAGMA user_version = {int(version)}')
+                current = version
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return current
 
 def init_db():
-    """Initialize the database with required tables"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
-    # Users table
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        email TEXT UNIQUE NOT NULL,
-        full_name TEXT NOT NULL,
-        password_hash TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        last_login TIMESTAMP,
-        preferred_language TEXT DEFAULT 'en',
-        role TEXT DEFAULT 'student'
-    )''')
-    
-    # Learning progress table
-    c.execute('''CREATE TABLE IF NOT EXISTS learning_progress (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER,
-        topic TEXT NOT NULL,
-        score REAL,
-        time_spent INTEGER,
-        completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    )''')
-    
-    # Quiz results table
-    c.execute('''CREATE TABLE IF NOT EXISTS quiz_results (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER,
-        quiz_topic TEXT NOT NULL,
-        score REAL,
-        total_questions INTEGER,
-        completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    )''')
-    
-    # Study sessions table
-    c.execute('''CREATE TABLE IF NOT EXISTS study_sessions (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER,
-        start_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        end_time TIMESTAMP,
-        topic TEXT,
-        session_type TEXT,
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    )''')
-    
-    # Achievements table
-    c.execute('''CREATE TABLE IF NOT EXISTS achievements (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER,
-        achievement_type TEXT NOT NULL,
-        earned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    )''')
-    
-    conn.commit()
-    conn.close()
+    """Bring the database schema up to date"""
+    return migrate(get_db_connection())
+
+def rebuild_rollups():
+    """Recompute every rollup table from the raw activity rows"""
+    flush_writes()
+    conn = get_db_connection()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        for statement in ROLLUP_REBUILD_STATEMENTS:
+            conn.execute(statement)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+# Connections are opened once per thread and reused for every call
+_local = threading.local()
+_migrated_paths = set()
+_migrate_lock = threading.Lock()
+
+# Pragmas applied to every new connection
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=268435456",
+)
 
 def get_db_connection():
-    """Get a database connection"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    """Get this thread's database connection, opening and tuning it on first use"""
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(DB_PATH)
+    if conn is None:
+        # The statement cache keeps prepared statements for repeated queries
+        conn = sqlite3.connect(DB_PATH, timeout=30, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        connections[DB_PATH] = conn
+        # Schema checks run once per process and database, not on every import
+        with _migrate_lock:
+            if DB_PATH not in _migrated_paths:
+                migrate(conn)
+                _migrated_paths.add(DB_PATH)
     return conn
 
+def close_db_connection():
+    """Close this thread's database connections"""
+    connections = getattr(_local, "connections", None) or {}
+    for conn in connections.values():
+        conn.close()
+    connections.clear()
+
+# Activity inserts are buffered and written in group commits, flushed when a
+# batch fills up, when the oldest write has waited the flush interval, or when
+# a caller needs a result. EDUTUTOR_WRITE_BUFFER=0 writes synchronously.
+WRITE_BATCH_SIZE = int(os.getenv("EDUTUTOR_WRITE_BATCH_SIZE", "200"))
+WRITE_FLUSH_INTERVAL = float(os.getenv("EDUTUTOR_WRITE_FLUSH_INTERVAL", "0.05"))
+WRITE_BUFFER_ENABLED = os.getenv("EDUTUTOR_WRITE_BUFFER", "1") != "0"
+
+class WriteBuffer:
+    """Write-behind queue that batches statements into group commits"""
+
+    def __init__(self, max_batch=WRITE_BATCH_SIZE, flush_interval=WRITE_FLUSH_INTERVAL, enabled=WRITE_BUFFER_ENABLED):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.enabled = enabled
+        self._queue = queue.Queue()
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, sql, params=(), urgent=False, detached=False):
+        """Queue a statement; the returned future resolves to its lastrowid.
+
+        Urgent statements close the current batch without waiting for the
+        flush interval, for callers that block on the result. Detached
+        statements are fire-and-forget: nobody reads their future, so a
+        failure is logged instead of being left on it.
+        """
+        future = Future()
+        if detached:
+            future.add_done_callback(lambda f: _log_failed_write(f, sql, params))
+        if not self.enabled:
+            return self._execute_now(sql, params, future)
+        with self._pending_lock:
+            self._pending += 1
+        self._ensure_started()
+        self._queue.put((sql, params, future, urgent))
+        return future
+
+    def _execute_now(self, sql, params, future):
+        """Execute a statement synchronously and return its completed future"""
+        try:
+            conn = get_db_connection()
+            with conn:
+                future.set_result(conn.execute(sql, params).lastrowid)
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _ensure_started(self):
+        """Start the writer thread on first use"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="db-write-buffer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        """Collect queued statements into batches and commit each batch once"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + (0 if item[3] else self.flush_interval)
+            stopping = False
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                if item[3]:
+                    deadline = 0
+            self._commit(batch)
+            if stopping:
+                return
+
+    def _commit(self, batch):
+        """Write a batch in one transaction, falling back to row by row on error"""
+        conn = None
+        try:
+            conn = get_db_connection()
+            with conn:
+                row_ids = [conn.execute(sql, params).lastrowid if sql else None
+                           for sql, params, _, _ in batch]
+        except Exception as e:
+            if conn is None:
+                # Without a connection (e.g. a lock timeout while migrating)
+                # nothing in the batch can be written
+                for _, _, future, _ in batch:
+                    future.set_exception(e)
+                return
+            # Retry individually so one bad statement does not fail the batch
+            for sql, params, future, _ in batch:
+                try:
+                    with conn:
+                        future.set_result(conn.execute(sql, params).lastrowid if sql else None)
+                except Exception as e:
+                    future.set_exception(e)
+        else:
+            for (_, _, future, _), row_id in zip(batch, row_ids):
+                future.set_result(row_id)
+        finally:
+            with self._pending_lock:
+                self._pending -= len(batch)
+
+    def flush(self, timeout=None):
+        """Block until every statement submitted so far has been committed"""
+        with self._pending_lock:
+            if self._pending == 0:
+                return
+        # A no-op barrier is committed after everything queued before it
+        self.submit(None, urgent=True).result(timeout)
+
+    def close(self):
+        """Flush pending writes and stop the writer thread"""
+        if self._thread is not None and self._thread.is_alive():
+            self.flush()
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+        self.enabled = False
+
+def _log_failed_write(future, sql, params):
+    """Log the error of a detached write, which would otherwise be lost"""
+    error = future.exception()
+    if error is not None:
+        logger.error("Buffered write failed: %s %r", " ".join(sql.split()), params,
+                     exc_info=(type(error), error, error.__traceback__))
+
+_write_buffer = WriteBuffer()
+atexit.register(_write_buffer.close)
+
+def flush_writes(timeout=None):
+    """Wait until all buffered activity writes are committed"""
+    _write_buffer.flush(timeout)
+
 def create_user(email, full_name, password_hash, role="student"):
     """Create a new user"""
     conn = get_db_connection()
-    c = conn.cursor()
     try:
-        c.execute('''INSERT INTO users (email, full_name, password_hash, role)
-                    VALUES (?, ?, ?, ?)''',
-                 (email, full_name, password_hash, role))
-        conn.commit()
+        with conn:
+            conn.execute('''INSERT INTO users (email, full_name, password_hash, role)
+                            VALUES (?, ?, ?, ?)''',
+                         (email, full_name, password_hash, role))
         return True, "User created successfully"
     except sqlite3.IntegrityError:
         return False, "Email already exists"
-    finally:
-        conn.close()
 
 def get_user(email):
     """Get user by email"""
     conn = get_db_connection()
-    c = conn.cursor()
-    c.execute('SELECT * FROM users WHERE email = ?', (email,))
-    user = c.fetchone()
-    conn.close()
+    user = conn.execute('SELECT * FROM users WHERE email = ?', (email,)).fetchone()
     return dict(user) if user else None
 
+def set_user_role(email, role):
+    """Change a user's role; returns whether the user exists"""
+    conn = get_db_connection()
+    with conn:
+        cursor = conn.execute('UPDATE users SET role = ? WHERE email = ?', (role, email))
+    return cursor.rowcount > 0
+
 def update_user_progress(user_id, topic, score, time_spent):
     """Update user's learning progress"""
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute('''INSERT INTO learning_progress (user_id, topic, score, time_spent)
-                 VALUES (?, ?, ?, ?)''',
-              (user_id, topic, score, time_spent))
-    conn.commit()
-    conn.close()
+    _write_buffer.submit('''INSERT INTO learning_progress (user_id, topic, score, time_spent)
+                            VALUES (?, ?, ?, ?)''',
+                         (user_id, topic, score, time_spent), detached=True)
+
+def _query_user_progress(conn, user_id):
+    rows = conn.execute('''SELECT topic,
+                                  CASE WHEN score_count > 0 THEN score_sum / score_count END as avg_score,
+                                  total_time
+                           FROM user_topic_progress
+                           WHERE user_id = ?
+                           ORDER BY topic''', (user_id,)).fetchall()
+    return [dict(row) for row in rows]
 
 def get_user_progress(user_id):
     """Get user's learning progress"""
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute('''SELECT topic, AVG(score) as avg_score, SUM(time_spent) as total_time
-                 FROM learning_progress
-                 WHERE user_id = ?
-                 GROUP BY topic''', (user_id,))
-    progress = [dict(row) for row in c.fetchall()]
-    conn.close()
-    return progress
+    flush_writes()
+    return _query_user_progress(get_db_connection(), user_id)
 
 def record_quiz_result(user_id, quiz_topic, score, total_questions):
     """Record quiz results"""
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute('''INSERT INTO quiz_results (user_id, quiz_topic, score, total_questions)
-                 VALUES (?, ?, ?, ?)''',
-              (user_id, quiz_topic, score, total_questions))
-    conn.commit()
-    conn.close()
+    _write_buffer.submit('''INSERT INTO quiz_results (user_id, quiz_topic, score, total_questions)
+                            VALUES (?, ?, ?, ?)''',
+                         (user_id, quiz_topic, score, total_questions), detached=True)
+
+def _timestamp(value):
+    """Format a date, datetime or string bound like SQLite's CURRENT_TIMESTAMP.
+
+    Stored timestamps are UTC: aware datetimes are converted, while naive
+    datetimes and dates are taken to be UTC already.
+    """
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d 00:00:00')
+    return value
+
+def _keyset_query(sql, column, user_id, start, end, cursor, descending, limit):
+    """Add time-window, keyset and limit clauses to a per-user query on column"""
+    params = [user_id]
+    if start is not None:
+        sql += f' AND {column} >= ?'
+        params.append(_timestamp(start))
+    if end is not None:
+        sql += f' AND {column} < ?'
+        params.append(_timestamp(end))
+    if cursor is not None:
+        sql += f' AND ({column}, id) {"<" if descending else ">"} (?, ?)'
+        params.extend(cursor)
+    order = 'DESC' if descending else 'ASC'
+    sql += f' ORDER BY {column} {order}, id {order}'
+    if limit is not None:
+        sql += ' LIMIT ?'
+        params.append(limit)
+    return sql, params
+
+def _query_quiz_history(conn, user_id, start=None, end=None, before=None, limit=None):
+    sql, params = _keyset_query('''SELECT id, quiz_topic, score, total_questions, completed_at
+                                   FROM quiz_results
+                                   WHERE user_id = ?''',
+                                'completed_at', user_id, start, end, before, True, limit)
+    return [dict(row) for row in conn.execute(sql, params).fetchall()]
 
 def get_quiz_history(user_id):
     """Get user's quiz history"""
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute('''SELECT quiz_topic, score, total_questions, completed_at
-                 FROM quiz_results
-                 WHERE user_id = ?
-                 ORDER BY completed_at DESC''', (user_id,))
-    history = [dict(row) for row in c.fetchall()]
-    conn.close()
-    return history
+    flush_writes()
+    return _query_quiz_history(get_db_connection(), user_id)
+
+def get_quiz_history_page(user_id, limit=50, before=None, start=None, end=None):
+    """Get one page of a user's quiz history, newest first.
+
+    Pages are keyed on (completed_at, id): pass the returned cursor as
+    before to fetch the next page. start and end bound completed_at
+    (start inclusive, end exclusive). Returns (rows, next_cursor), with
+    next_cursor None on the last page.
+    """
+    flush_writes()
+    rows = _query_quiz_history(get_db_connection(), user_id, start, end, before, limit + 1)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, (rows[-1]['completed_at'], rows[-1]['id'])
 
 def start_study_session(user_id, topic, session_type):
     """Start a new study session"""
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute('''INSERT INTO study_sessions (user_id, topic, session_type)
-                 VALUES (?, ?, ?)''',
-              (user_id, topic, session_type))
-    session_id = c.lastrowid
-    conn.commit()
-    conn.close()
-    return session_id
+    # The caller needs the row id, so wait for the batch holding this insert
+    return _write_buffer.submit('''INSERT INTO study_sessions (user_id, topic, session_type)
+                                   VALUES (?, ?, ?)''',
+                                (user_id, topic, session_type), urgent=True).result()
 
 def end_study_session(session_id):
     """End a study session"""
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute('''UPDATE study_sessions
-                 SET end_time = CURRENT_TIMESTAMP
-                 WHERE id = ?''', (session_id,))
-    conn.commit()
-    conn.close()
+    _write_buffer.submit('''UPDATE study_sessions
+                            SET end_time = CURRENT_TIMESTAMP
+                            WHERE id = ?''', (session_id,), detached=True)
+
+def _query_study_stats(conn, user_id):
+    row = conn.execute('''SELECT 
+                              (SELECT COUNT(*) FROM user_study_topics
+                               WHERE user_id = ? AND completed_sessions > 0) as topics_studied,
+                              SUM(total_time) as total_time,
+                              COUNT(*) as days_studied
+                           FROM user_daily_study
+                           WHERE user_id = ? AND completed_sessions > 0''', (user_id, user_id)).fetchone()
+    return dict(row)
 
 def get_study_stats(user_id):
     """Get user's study statistics"""
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute('''SELECT 
-                    COUNT(DISTINCT topic) as topics_studied,
-                    SUM(strftime('%s', end_time) - strftime('%s', start_time)) as total_time,
-                    COUNT(DISTINCT DATE(start_time)) as days_studied
-                 FROM study_sessions
-                 WHERE user_id = ? AND end_time IS NOT NULL''', (user_id,))
-    stats = dict(c.fetchone())
-    conn.close()
-    return stats
+    flush_writes()
+    return _query_study_stats(get_db_connection(), user_id)
 
 def award_achievement(user_id, achievement_type):
     """Award an achievement to a user"""
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute('''INSERT INTO achievements (user_id, achievement_type)
-                 VALUES (?, ?)''',
-              (user_id, achievement_type))
-    conn.commit()
-    conn.close()
+    _write_buffer.submit('''INSERT INTO achievements (user_id, achievement_type)
+                            VALUES (?, ?)''',
+                         (user_id, achievement_type), detached=True)
+
+def _query_user_achievements(conn, user_id):
+    rows = conn.execute('''SELECT achievement_type, earned_at
+                           FROM achievements
+                           WHERE user_id = ?
+                           ORDER BY earned_at DESC''', (user_id,)).fetchall()
+    return [dict(row) for row in rows]
 
 def get_user_achievements(user_id):
     """Get user's achievements"""
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute('''SELECT achievement_type, earned_at
-                 FROM achievements
-                 WHERE user_id = ?
-                 ORDER BY earned_at DESC''', (user_id,))
-    achievements = [dict(row) for row in c.fetchall()]
-    conn.close()
-    return achievements
+    flush_writes()
+    return _query_user_achievements(get_db_connection(), user_id)
+
+def _query_study_sessions(conn, user_id, start=None, end=None, after=None, limit=None):
+    sql, params = _keyset_query('''SELECT * FROM study_sessions WHERE user_id = ?''',
+                                'start_time', user_id, start, end, after, False, limit)
+    return [dict(row) for row in conn.execute(sql, params).fetchall()]
 
 def get_study_sessions(user_id):
     """Get all study sessions for a user"""
+    flush_writes()
+    return _query_study_sessions(get_db_connection(), user_id)
+
+def get_study_sessions_page(user_id, limit=50, after=None, start=None, end=None):
+    """Get one page of a user's study sessions, oldest first.
+
+    Pages are keyed on (start_time, id): pass the returned cursor as after
+    to fetch the next page. start and end bound start_time (start
+    inclusive, end exclusive). Returns (rows, next_cursor), with
+    next_cursor None on the last page.
+    """
+    flush_writes()
+    rows = _query_study_sessions(get_db_connection(), user_id, start, end, after, limit + 1)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, (rows[-1]['start_time'], rows[-1]['id'])
+
+def _query_daily_study_activity(conn, user_id, start=None, end=None):
+    sql = '''SELECT day, sessions, completed_sessions, total_time
+             FROM user_daily_study
+             WHERE user_id = ? AND day IS NOT NULL'''
+    params = [user_id]
+    if start is not None:
+        sql += ' AND day >= DATE(?)'
+        params.append(_timestamp(start))
+    if end is not None:
+        sql += ' AND day < DATE(?)'
+        params.append(_timestamp(end))
+    sql += ' ORDER BY day'
+    return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+def get_daily_study_activity(user_id, start=None, end=None):
+    """Get per-day session counts and study seconds for a user.
+
+    Served from the user_daily_study rollup, so the cost depends on the
+    number of days in the [start, end) window rather than on sessions.
+    """
+    flush_writes()
+    return _query_daily_study_activity(get_db_connection(), user_id, start, end)
+
+# Dashboard snapshots cached per user and date window, valid while the
+# user's activity version is unchanged
+SNAPSHOT_CACHE_SIZE = 256
+# Cap on quiz history rows a dashboard window loads
+SNAPSHOT_HISTORY_LIMIT = 5000
+_snapshot_cache = OrderedDict()
+_snapshot_lock = threading.Lock()
+
+def _activity_version(conn, user_id):
+    row = conn.execute('SELECT version FROM user_activity_version WHERE user_id = ?', (user_id,)).fetchone()
+    return row[0] if row else 0
+
+def get_dashboard_snapshot(user_id, start=None, end=None):
+    """Get everything the dashboard shows for a user from one read transaction.
+
+    Quiz history and daily study activity are limited to the [start, end) window;
+    progress, statistics and achievements cover all time. The snapshot is
+    cached per user and window and reused until a write to one of that
+    user's activity rows bumps their activity version, from any process.
+    """
+    flush_writes()
     conn = get_db_connection()
-    c = conn.cursor()
-    c.execute('''SELECT * FROM study_sessions WHERE user_id = ? ORDER BY start_time ASC''', (user_id,))
-    sessions = [dict(row) for row in c.fetchall()]
-    conn.close()
-    return sessions
-
-# Initialize database when module is imported
-init_db() 
\ No newline at end of file
+    cache_key = (user_id, _timestamp(start), _timestamp(end))
+    with _snapshot_lock:
+        cached = _snapshot_cache.get(cache_key)
+    if cached is not None and cached[0] == _activity_version(conn, user_id):
+        with _snapshot_lock:
+            if cache_key in _snapshot_cache:
+                _snapshot_cache.move_to_end(cache_key)
+        return cached[1]
+
+    conn.execute('BEGIN')
+    try:
+        version = _activity_version(conn, user_id)
+        snapshot = {
+            "progress": _query_user_progress(conn, user_id),
+            "quiz_history": _query_quiz_history(conn, user_id, start, end, limit=SNAPSHOT_HISTORY_LIMIT),
+            "study_stats": _query_study_stats(conn, user_id),
+            "daily_activity": _query_daily_study_activity(conn, user_id, start, end),
+            "achievements": _query_user_achievements(conn, user_id),
+        }
+    finally:
+        conn.commit()
+    with _snapshot_lock:
+        _snapshot_cache[cache_key] = (version, snapshot)
+        _snapshot_cache.move_to_end(cache_key)
+        while len(_snapshot_cache) > SNAPSHOT_CACHE_SIZE:
+            _snapshot_cache.popitem(last=False)
+    return snapshot
+
+def record_llm_usage(feature, model, prompt_tokens, completion_tokens, latency, truncated=False, streamed=False):
+    """Record the tokens and latency of one LLM call"""
+    _write_buffer.submit('''INSERT INTO llm_usage (feature, model, prompt_tokens, completion_tokens,
+                                                   latency, truncated, streamed)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                         (feature, model, prompt_tokens, completion_tokens, latency, truncated, streamed), detached=True)
+
+def _usage_window(sql, start, end):
+    params = []
+    if start is not None:
+        sql += ' AND created_at >= ?'
+        params.append(_timestamp(start))
+    if end is not None:
+        sql += ' AND created_at < ?'
+        params.append(_timestamp(end))
+    return sql, params
+
+def get_llm_usage_by_feature(start=None, end=None):
+    """Get call counts, tokens and latency per feature and model in [start, end)"""
+    flush_writes()
+    sql, params = _usage_window('''SELECT feature, model, COUNT(*) as calls,
+                                          SUM(prompt_tokens) as prompt_tokens,
+                                          SUM(completion_tokens) as completion_tokens,
+                                          AVG(latency) as avg_latency, MAX(latency) as max_latency,
+                                          SUM(truncated) as truncated_calls
+                                   FROM llm_usage WHERE 1 = 1''', start, end)
+    sql += ' GROUP BY feature, model ORDER BY SUM(prompt_tokens) + SUM(completion_tokens) DESC'
+    return [dict(row) for row in get_db_connection().execute(sql, params).fetchall()]
+
+def get_llm_usage_daily(start=None, end=None):
+    """Get per-day calls and tokens in [start, end)"""
+    flush_writes()
+    sql, params = _usage_window('''SELECT DATE(created_at) as day, COUNT(*) as calls,
+                                          SUM(prompt_tokens) as prompt_tokens,
+                                          SUM(completion_tokens) as completion_tokens
+                                   FROM llm_usage WHERE 1 = 1''', start, end)
+    sql += ' GROUP BY DATE(created_at) ORDER BY day'
+    return [dict(row) for row in get_db_connection().execute(sql, params).fetchall()]
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="EduTutor database maintenance")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("migrate", help="apply pending schema migrations")
+    subcommands.add_parser("rebuild-rollups", help="recompute rollup tables from raw activity rows")
+    set_role = subcommands.add_parser("set-role", help="change a user's role, e.g. to admin")
+    set_role.add_argument("email")
+    set_role.add_argument("role")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        print(f"Schema at version {init_db()} (latest {SCHEMA_VERSION})")
+    elif args.command == "rebuild-rollups":
+        rebuild_rollups()
+        print("Rollup tables rebuilt")
+    elif args.command == "set-role":
+        if set_user_role(args.email, args.role):
+            print(f"{args.email} is now {args.role}")
+        else:
+            parser.exit(1, f"No user with email {args.email}\n")
@@ -0,0 +1,226 @@
+import os
+import re
+import unicodedata
+from fractions import Fraction
+from typing import List, Literal, Optional
+
+from langchain.prompts import PromptTemplate
+from pydantic import BaseModel
+
+from concurrency import DEFAULT_MAX_CONCURRENCY
+from quiz import OPTION_LETTERS, extract_json, loads_tolerant
+
+# A fill-in-the-blank answer may misspell each word of the key by one edit
+# (a wrong, missing, extra or swapped letter); words shorter than this and
+# words with digits must match exactly
+FUZZY_MIN_WORD_LENGTH = int(os.getenv("EDUTUTOR_GRADING_FUZZY_MIN_WORD_LENGTH", "5"))
+# Relative tolerance for numeric answers when the question doesn't set one
+NUMERIC_REL_TOLERANCE = float(os.getenv("EDUTUTOR_GRADING_NUMERIC_TOLERANCE", "0.01"))
+
+# How LLM-graded answers of one submission are sent: "sequential" (one call
+# at a time), "concurrent" (one call each, in parallel) or "packed" (several per call)
+GRADING_MODE = os.getenv("EDUTUTOR_GRADING_MODE", "concurrent")
+GRADING_CONCURRENCY = int(os.getenv("EDUTUTOR_GRADING_CONCURRENCY", str(DEFAULT_MAX_CONCURRENCY)))
+GRADING_PACK_SIZE = int(os.getenv("EDUTUTOR_GRADING_PACK_SIZE", "5"))
+
+PACKED_GRADING_TEMPLATE = PromptTemplate(
+    input_variables=["answers"],
+    template="""Grade each of the following student answers against its correct answer.\n\n{answers}\n\nRespond with JSON only, no markdown, in exactly this shape:\n{{"grades": [{{"id": 1, "score": 0, "feedback": "..."}}]}}\n\nGive one entry per answer with its id, a score from 0 to 100, and feedback of one to three sentences that includes a suggestion for improvement."""
+)
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_ARTICLES = re.compile(r"^(?:a|an|the)\s+")
+_NUMBER = re.compile(r"[-+]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?(?:\s*/\s*\d+)?")
+
+
+class Grade(BaseModel):
+    # None when the answer could not be graded
+    score: Optional[float]
+    correct: bool
+    feedback: str = ""
+    # "local" for deterministic checks, "llm" for model-graded answers,
+    # "error" when the grading call failed
+    method: Literal["local", "llm", "error"] = "local"
+
+
+class GradingReport(BaseModel):
+    grades: List[Grade]
+    mode: str
+    # Wall-clock seconds for the whole submission
+    latency: float
+    llm_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+def normalize_answer(text):
+    """Lowercase, strip accents, punctuation and leading articles, collapse whitespace"""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = " ".join(_PUNCTUATION.sub(" ", text).split())
+    return _ARTICLES.sub("", text)
+
+
+def parse_number(text):
+    """Parse "1,234", "3.5e2", "-1/2" or "45%" into a float, or None"""
+    match = _NUMBER.search(str(text).replace(",", ""))
+    if match is None:
+        return None
+    value = match.group(0).replace(" ", "")
+    try:
+        return float(Fraction(value)) if "/" in value else float(value)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def grade_multiple_choice(question, student_answer):
+    """Accept the option letter, "B) text" or the option text itself"""
+    answer = str(student_answer).strip()
+    letter = None
+    match = re.fullmatch(r"\(?([A-Fa-f])\)?(?:\s*[).:\-]\s+.*)?", answer, re.S)
+    if match and match.group(1).upper() in OPTION_LETTERS[:len(question.options)]:
+        letter = match.group(1).upper()
+    else:
+        normalized = normalize_answer(answer)
+        for candidate, option in zip(OPTION_LETTERS, question.options):
+            if normalize_answer(option) == normalized:
+                letter = candidate
+                break
+    correct_text = question.options[OPTION_LETTERS.index(question.answer)]
+    if letter == question.answer:
+        return Grade(score=100.0, correct=True, feedback="Correct.")
+    return Grade(score=0.0, correct=False, feedback=f"The correct answer is {question.answer}) {correct_text}.")
+
+
+def edit_distance(a, b):
+    """Edits (insert, delete, substitute or swap adjacent letters) turning a into b"""
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def is_typo(given, expected, min_word_length=FUZZY_MIN_WORD_LENGTH):
+    """Whether given is expected with at most one typo per word.
+
+    Distractors such as "meiosis" for "mitosis" or "hypothyroidism" for
+    "hyperthyroidism" are two or more edits away and are not typos.
+    """
+    given_words, expected_words = given.split(), expected.split()
+    if len(given_words) != len(expected_words):
+        return False
+    for word, key in zip(given_words, expected_words):
+        if word == key:
+            continue
+        if len(key) < min_word_length or any(ch.isdigit() for ch in key + word):
+            return False
+        if edit_distance(word, key) > 1:
+            return False
+    return True
+
+
+def grade_fill_in_the_blank(question, student_answer):
+    """Exact match after normalisation, else a typo of any accepted answer"""
+    given = normalize_answer(student_answer)
+    accepted = [normalize_answer(a) for a in [question.answer, *question.alternatives]]
+    if not given:
+        return Grade(score=0.0, correct=False, feedback=f"The answer is \"{question.answer}\".")
+    if given in accepted:
+        return Grade(score=100.0, correct=True, feedback="Correct.")
+    if any(is_typo(given, a) for a in accepted):
+        return Grade(score=100.0, correct=True, feedback=f"Correct (check the spelling: \"{question.answer}\").")
+    return Grade(score=0.0, correct=False, feedback=f"The answer is \"{question.answer}\".")
+
+
+def grade_numeric(question, student_answer, rel_tolerance=NUMERIC_REL_TOLERANCE):
+    """Within the question's absolute tolerance, else a relative tolerance of the key"""
+    expected = parse_number(question.answer)
+    given = parse_number(student_answer)
+    if given is None:
+        return Grade(score=0.0, correct=False, feedback=f"Expected a number; the answer is {question.answer}.")
+    tolerance = question.tolerance if question.tolerance is not None else abs(expected) * rel_tolerance
+    if abs(given - expected) <= tolerance:
+        return Grade(score=100.0, correct=True, feedback="Correct.")
+    return Grade(score=0.0, correct=False, feedback=f"The answer is {question.answer}.")
+
+
+LOCAL_GRADERS = {
+    "multiple_choice": grade_multiple_choice,
+    "fill_in_the_blank": grade_fill_in_the_blank,
+    "numeric": grade_numeric,
+}
+
+
+def grade_locally(question, student_answer) -> Optional[Grade]:
+    """Grade a QuizQuestion without the LLM, or return None if it needs one (short answers)"""
+    grader = LOCAL_GRADERS.get(question.type)
+    return grader(question, student_answer) if grader is not None else None
+
+
+_SCORE = re.compile(r"score[^0-9]{0,20}(\d{1,3}(?:\.\d+)?)(?:\s*/\s*(\d{1,3}(?:\.\d+)?))?", re.I)
+_RATIO = re.compile(r"\b(\d{1,3}(?:\.\d+)?)\s*(?:/\s*(\d{1,3}(?:\.\d+)?)|%)")
+
+
+def ungraded(reason):
+    """Grade for an answer that could not be graded; it counts toward no score"""
+    return Grade(score=None, correct=False, feedback=f"This answer could not be graded: {reason}", method="error")
+
+
+def parse_llm_grade(text):
+    """Read the score out of a free-text grading reply, scaling "7/10" to 0-100.
+
+    Error replies and replies without a score are ungraded.
+    """
+    if text.startswith("Error"):
+        return ungraded(text)
+    cleaned = re.sub(r"\(\s*0\s*-\s*100\s*\)", "", text)
+    match = _SCORE.search(cleaned) or _RATIO.search(cleaned)
+    if match is None:
+        return ungraded("the grader's reply had no score")
+    score = float(match.group(1))
+    if match.group(2) and float(match.group(2)) > 0:
+        score = score * 100 / float(match.group(2))
+    score = min(100.0, score)
+    return Grade(score=score, correct=score >= 50, feedback=text, method="llm")
+
+
+def quiz_score(grades):
+    """Percentage score over the graded answers of a quiz"""
+    graded = [g.score for g in grades if g.score is not None]
+    return sum(graded) / len(graded) if graded else 0.0
+
+
+def packed_grading_prompt(items):
+    """Render one prompt grading several (question, student_answer, correct_answer) items"""
+    blocks = [
+        f"Answer {i + 1}:\nQuestion: {question}\nStudent's Answer: {student_answer}\nCorrect Answer: {correct_answer}"
+        for i, (question, student_answer, correct_answer) in enumerate(items)
+    ]
+    return PACKED_GRADING_TEMPLATE.format(answers="\n\n".join(blocks))
+
+
+def parse_packed_grades(text, count):
+    """Read a packed grading reply into count grades; None where an answer is missing"""
+    grades = [None] * count
+    candidate = extract_json(text or "")
+    data = loads_tolerant(candidate) if candidate is not None else None
+    if isinstance(data, dict):
+        data = data.get("grades")
+    if not isinstance(data, list):
+        return grades
+    for position, entry in enumerate(data):
+        if not isinstance(entry, dict):
+            continue
+        try:
+            index = int(entry.get("id", position + 1)) - 1
+            score = max(0.0, min(100.0, float(entry["score"])))
+        except (KeyError, TypeError, ValueError):
+            continue
+        if 0 <= index < count and grades[index] is None:
+            grades[index] = Grade(score=score, correct=score >= 50, feedback=str(entry.get("feedback", "")), method="llm")
+    return grades
@@ -0,0 +1,190 @@
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from llm_cache import CACHE_DIR
+
+DOCUMENT_STORE_PATH = os.path.join(CACHE_DIR, "documents.db")
+
+PDF_TYPES = {"application/pdf"}
+DOCX_TYPES = {
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/msword",
+}
+
+
+def content_hash(data):
+    """Content address of an uploaded file"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def extract_pdf_pages(data):
+    """Extract the text of each page of a PDF"""
+    import fitz  # PyMuPDF for PDF reading
+    with fitz.open(stream=data, filetype="pdf") as pdf:
+        return [page.get_text() for page in pdf]
+
+
+def extract_docx_pages(data):
+    """Extract the paragraphs of a DOCX, split into pages at explicit page breaks"""
+    import docx  # python-docx for DOCX reading
+    from docx.oxml.ns import qn
+    doc = docx.Document(io.BytesIO(data))
+    pages = [[]]
+    for para in doc.paragraphs:
+        pages[-1].append(para.text)
+        if any(br.get(qn("w:type")) == "page" for br in para._p.iter(qn("w:br"))):
+            pages.append([])
+    if len(pages) > 1 and not pages[-1]:
+        pages.pop()
+    return ["\n".join(paras) for paras in pages]
+
+
+class DocumentStore:
+    """Persistent store of extracted document text keyed by content hash.
+
+    Extraction runs once per distinct file; later uploads of the same bytes,
+    from any session or user, are served from the store. Derived artifacts
+    such as summaries are stored alongside the document.
+    """
+
+    def __init__(self, path=DOCUMENT_STORE_PATH, memory_items=16):
+        self.path = path
+        self.memory_items = memory_items
+        self._memory = OrderedDict()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute('''CREATE TABLE IF NOT EXISTS documents (
+            doc_id TEXT PRIMARY KEY,
+            filename TEXT,
+            mime_type TEXT,
+            num_pages INTEGER,
+            num_chars INTEGER,
+            created_at REAL NOT NULL
+        )''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS document_pages (
+            doc_id TEXT NOT NULL,
+            page_no INTEGER NOT NULL,
+            start_offset INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            PRIMARY KEY (doc_id, page_no)
+        )''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS document_artifacts (
+            doc_id TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (doc_id, kind, key)
+        )''')
+        conn.commit()
+
+    def _connect(self):
+        """Get this thread's connection to the document store"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def ingest(self, data, filename=None, mime_type=None):
+        """Return the extracted document for data, extracting it only if unseen"""
+        doc_id = content_hash(data)
+        document = self.get(doc_id)
+        if document is not None:
+            return document
+        if mime_type in PDF_TYPES or (filename or "").lower().endswith(".pdf"):
+            pages = extract_pdf_pages(data)
+        elif mime_type in DOCX_TYPES or (filename or "").lower().endswith(".docx"):
+            pages = extract_docx_pages(data)
+        else:
+            raise ValueError(f"Unsupported file type: {mime_type or filename}")
+
+        offsets = []
+        position = 0
+        for page in pages:
+            offsets.append(position)
+            position += len(page) + 1
+        text = "\n".join(pages)
+
+        conn = self._connect()
+        with conn:
+            conn.execute('''INSERT OR IGNORE INTO documents
+                            (doc_id, filename, mime_type, num_pages, num_chars, created_at)
+                            VALUES (?, ?, ?, ?, ?, ?)''',
+                         (doc_id, filename, mime_type, len(pages), len(text), time.time()))
+            conn.executemany('''INSERT OR IGNORE INTO document_pages (doc_id, page_no, start_offset, text)
+                                VALUES (?, ?, ?, ?)''',
+                             [(doc_id, i, offsets[i], page) for i, page in enumerate(pages)])
+        document = {
+            "doc_id": doc_id,
+            "filename": filename,
+            "mime_type": mime_type,
+            "pages": pages,
+            "page_offsets": offsets,
+            "text": text,
+        }
+        self._remember(document)
+        return document
+
+    def get(self, doc_id):
+        """Return a stored document by content hash, or None"""
+        with self._lock:
+            document = self._memory.get(doc_id)
+            if document is not None:
+                self._memory.move_to_end(doc_id)
+                return document
+        conn = self._connect()
+        meta = conn.execute('SELECT filename, mime_type FROM documents WHERE doc_id = ?', (doc_id,)).fetchone()
+        if meta is None:
+            return None
+        rows = conn.execute('''SELECT start_offset, text FROM document_pages
+                               WHERE doc_id = ? ORDER BY page_no''', (doc_id,)).fetchall()
+        pages = [row[1] for row in rows]
+        document = {
+            "doc_id": doc_id,
+            "filename": meta[0],
+            "mime_type": meta[1],
+            "pages": pages,
+            "page_offsets": [row[0] for row in rows],
+            "text": "\n".join(pages),
+        }
+        self._remember(document)
+        return document
+
+    def _remember(self, document):
+        """Keep a recently used document in memory"""
+        with self._lock:
+            self._memory[document["doc_id"]] = document
+            self._memory.move_to_end(document["doc_id"])
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def get_artifact(self, doc_id, kind, key=""):
+        """Return a derived artifact (e.g. a summary) for a document, or None"""
+        row = self._connect().execute('''SELECT value FROM document_artifacts
+                                         WHERE doc_id = ? AND kind = ? AND key = ?''',
+                                      (doc_id, kind, key)).fetchone()
+        return row[0] if row else None
+
+    def put_artifact(self, doc_id, kind, value, key=""):
+        """Store a derived artifact for a document"""
+        conn = self._connect()
+        with conn:
+            conn.execute('''INSERT OR REPLACE INTO document_artifacts (doc_id, kind, key, value, created_at)
+                            VALUES (?, ?, ?, ?, ?)''',
+                         (doc_id, kind, key, value, time.time()))
+
+
+# Initialize the shared document store
+document_store = DocumentStore()
@@ -0,0 +1,138 @@
+import sqlite3
+import hashlib
+import os
+import threading
+import time
+from collections import defaultdict
+
+from metrics import metrics
+
+CACHE_DIR = os.getenv("EDUTUTOR_CACHE_DIR", ".edututor_cache")
+LLM_CACHE_PATH = os.path.join(CACHE_DIR, "llm_cache.db")
+
+# Eviction limits, overridable through the environment
+DEFAULT_MAX_ENTRIES = int(os.getenv("EDUTUTOR_LLM_CACHE_MAX_ENTRIES", "5000"))
+DEFAULT_MAX_BYTES = int(os.getenv("EDUTUTOR_LLM_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+DEFAULT_TTL_SECONDS = int(os.getenv("EDUTUTOR_LLM_CACHE_TTL", str(7 * 24 * 3600)))
+
+
+class LLMCache:
+    """Disk-backed LLM response cache shared across reruns and processes.
+
+    Entries are keyed on the rendered prompt, model name and temperature and
+    evicted least-recently-used first once the entry count or total size goes
+    over its limit. Entries older than the TTL are never served.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES,
+                 max_bytes=DEFAULT_MAX_BYTES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute('''CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            method TEXT,
+            response TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            last_accessed REAL NOT NULL,
+            hit_count INTEGER DEFAULT 0
+        )''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_last_accessed ON llm_cache (last_accessed)')
+        conn.commit()
+
+    def _connect(self):
+        """Get this thread's connection to the cache database"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(prompt, model, temperature):
+        """Build the cache key for a prompt/model/temperature combination"""
+        raw = f"{model}\x00{float(temperature):.4f}\x00{prompt}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key, method=None, recheck=False):
+        """Return the cached response for key, or None on a miss.
+
+        A recheck repeats a lookup whose miss was already counted, so only a hit is counted.
+        """
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute('SELECT response, created_at FROM llm_cache WHERE key = ?', (key,)).fetchone()
+        if row is None or now - row[1] > self.ttl_seconds:
+            if not recheck:
+                with self._lock:
+                    self.misses[method] += 1
+                metrics.record_cache(method, hit=False)
+            return None
+        conn.execute('''UPDATE llm_cache SET last_accessed = ?, hit_count = hit_count + 1
+                        WHERE key = ?''', (now, key))
+        conn.commit()
+        with self._lock:
+            self.hits[method] += 1
+        metrics.record_cache(method, hit=True)
+        return row[0]
+
+    def set(self, key, response, method=None):
+        """Store a response and evict old entries if over the limits"""
+        now = time.time()
+        conn = self._connect()
+        conn.execute('''INSERT OR REPLACE INTO llm_cache
+                        (key, method, response, size, created_at, last_accessed)
+                        VALUES (?, ?, ?, ?, ?, ?)''',
+                     (key, method, response, len(response.encode("utf-8")), now, now))
+        conn.commit()
+        self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least-recently-used ones over the limits"""
+        conn = self._connect()
+        conn.execute('DELETE FROM llm_cache WHERE created_at < ?', (time.time() - self.ttl_seconds,))
+        count, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache').fetchone()
+        if count > self.max_entries or total > self.max_bytes:
+            excess_bytes = total - self.max_bytes
+            freed = 0
+            doomed = []
+            for key, size in conn.execute('SELECT key, size FROM llm_cache ORDER BY last_accessed ASC'):
+                if count - len(doomed) <= self.max_entries and freed >= excess_bytes:
+                    break
+                doomed.append((key,))
+                freed += size
+            conn.executemany('DELETE FROM llm_cache WHERE key = ?', doomed)
+        conn.commit()
+
+    def clear(self):
+        """Remove every cached response"""
+        conn = self._connect()
+        conn.execute('DELETE FROM llm_cache')
+        conn.commit()
+
+    def stats(self):
+        """Return hit/miss counters per method and the current cache size"""
+        conn = self._connect()
+        entries, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache').fetchone()
+        with self._lock:
+            methods = sorted(set(self.hits) | set(self.misses), key=str)
+            per_method = {m: {"hits": self.hits[m], "misses": self.misses[m]} for m in methods}
+        return {
+            "entries": entries,
+            "bytes": total,
+            "hits": sum(v["hits"] for v in per_method.values()),
+            "misses": sum(v["misses"] for v in per_method.values()),
+            "methods": per_method,
+        }
@@ -0,0 +1,227 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+
+import httpx
+import openai
+from dotenv import load_dotenv
+from langchain_openai import ChatOpenAI
+
+import database as db
+from metrics import metrics
+from prompt_budget import count_tokens, fit_prompt
+
+# Load environment variables
+load_dotenv()
+
+# Per-request timeout in seconds, applied to every chat client
+REQUEST_TIMEOUT = float(os.getenv("EDUTUTOR_LLM_TIMEOUT", "60"))
+# Retries after the first attempt, with exponential backoff between them
+MAX_RETRIES = int(os.getenv("EDUTUTOR_LLM_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("EDUTUTOR_LLM_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("EDUTUTOR_LLM_BACKOFF_MAX", "8"))
+# Keep-alive connection pool shared by all clients in the process
+POOL_SIZE = int(os.getenv("EDUTUTOR_LLM_POOL_SIZE", "16"))
+KEEPALIVE_EXPIRY = float(os.getenv("EDUTUTOR_LLM_KEEPALIVE", "60"))
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+# Record tokens and latency of every call in the llm_usage table;
+# EDUTUTOR_LLM_USAGE_LOG=0 turns it off
+USAGE_LOG_ENABLED = os.getenv("EDUTUTOR_LLM_USAGE_LOG", "1") != "0"
+
+# Model and temperature per task; EDUTUTOR_LLM_MODEL_<TASK> and
+# EDUTUTOR_LLM_TEMPERATURE_<TASK> override them
+TASKS = {
+    "teaching": {"model": "gpt-3.5-turbo", "temperature": 0.7},
+    "grading": {"model": "gpt-3.5-turbo", "temperature": 0.7},
+    "summarization": {"model": "gpt-3.5-turbo", "temperature": 0.7},
+    "content": {"model": "mistralai/mixtral-8x7b-instruct", "temperature": 0.7},
+}
+
+_http_client = None
+_clients = {}
+_lock = threading.RLock()
+
+
+def get_http_client():
+    """Return the process-wide keep-alive HTTP connection pool"""
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                timeout=REQUEST_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=POOL_SIZE,
+                    max_keepalive_connections=POOL_SIZE,
+                    keepalive_expiry=KEEPALIVE_EXPIRY,
+                ),
+            )
+        return _http_client
+
+
+def task_settings(task):
+    """Return the model and temperature configured for a task"""
+    settings = dict(TASKS.get(task, TASKS["teaching"]))
+    suffix = task.upper()
+    settings["model"] = os.getenv(f"EDUTUTOR_LLM_MODEL_{suffix}", settings["model"])
+    settings["temperature"] = float(os.getenv(f"EDUTUTOR_LLM_TEMPERATURE_{suffix}", settings["temperature"]))
+    return settings
+
+
+def is_retryable(error):
+    """Whether a failed request is worth retrying"""
+    if isinstance(error, (openai.APIConnectionError, httpx.TransportError)):
+        return True
+    return getattr(error, "status_code", None) in RETRYABLE_STATUS
+
+
+def backoff_delay(attempt, error=None):
+    """Seconds to wait before retry number attempt (0-based), with jitter.
+
+    A Retry-After header on the error's response takes precedence.
+    """
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(BACKOFF_MAX, float(retry_after))
+        except ValueError:
+            pass
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+class LLMClient:
+    """Chat model for one task with shared pooling, timeouts and retries.
+
+    Blocking calls go through the process-wide keep-alive connection pool.
+    Async calls run the blocking call in the default executor, so every
+    request reuses the same pool whichever event loop awaits it.
+
+    Prompts over their method's token budget are truncated before sending,
+    and each call's tokens and latency are recorded per method.
+    """
+
+    def __init__(self, task, model, temperature, timeout=REQUEST_TIMEOUT, max_retries=MAX_RETRIES):
+        self.task = task
+        self.model_name = model
+        self.temperature = temperature
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retries = defaultdict(int)
+        self.chat = ChatOpenAI(
+            model=model,
+            temperature=temperature,
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=os.getenv("OPENAI_API_BASE"),
+            timeout=timeout,
+            # Retries are handled here so every client backs off the same way
+            max_retries=0,
+            http_client=get_http_client(),
+            # Ask for token counts on the final chunk of streamed responses
+            stream_usage=True,
+        )
+
+    def _with_retries(self, fn, method):
+        """Call fn, retrying retryable failures with exponential backoff"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return fn()
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                self.retries[method] += 1
+                metrics.record_retry(method, e)
+                time.sleep(backoff_delay(attempt, e))
+
+    def _usage(self, reported, prompt_tokens, completion):
+        """Token counts reported by the API, estimated locally where it reports none"""
+        reported = reported or {}
+        return {
+            "prompt_tokens": reported.get("input_tokens") or prompt_tokens,
+            "completion_tokens": reported.get("output_tokens") or count_tokens(completion, self.model_name),
+        }
+
+    def _record_call(self, method, usage, latency, truncated, streamed):
+        """Record a completed call's latency and log its usage; accounting never fails a call"""
+        metrics.observe_latency(method, latency, streamed)
+        if not USAGE_LOG_ENABLED:
+            return
+        try:
+            db.record_llm_usage(method, self.model_name, usage["prompt_tokens"], usage["completion_tokens"],
+                                latency, truncated, streamed)
+        except Exception:
+            pass
+
+    def invoke_with_usage(self, prompt, method=None):
+        """Return the completion text for prompt and the tokens the call used"""
+        method = method or self.task
+        prompt, prompt_tokens, truncated = fit_prompt(prompt, method, self.model_name)
+        start = time.perf_counter()
+        message = self._with_retries(lambda: self.chat.invoke(prompt), method)
+        usage = self._usage(message.usage_metadata, prompt_tokens, message.content)
+        self._record_call(method, usage, time.perf_counter() - start, truncated, streamed=False)
+        return message.content, usage
+
+    def invoke(self, prompt, method=None):
+        """Return the completion text for prompt"""
+        return self.invoke_with_usage(prompt, method)[0]
+
+    async def ainvoke_with_usage(self, prompt, method=None):
+        """Async counterpart of invoke_with_usage"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.invoke_with_usage, prompt, method)
+
+    async def ainvoke(self, prompt, method=None):
+        """Async counterpart of invoke"""
+        return (await self.ainvoke_with_usage(prompt, method))[0]
+
+    def stream(self, prompt, method=None):
+        """Yield the completion text chunk by chunk.
+
+        Failures before the first chunk are retried like invoke; once text
+        has been yielded the error is raised to the caller.
+        """
+        method = method or self.task
+        prompt, prompt_tokens, truncated = fit_prompt(prompt, method, self.model_name)
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            started = False
+            parts = []
+            reported = None
+            try:
+                for chunk in self.chat.stream(prompt):
+                    if chunk.usage_metadata:
+                        reported = chunk.usage_metadata
+                    if chunk.content:
+                        started = True
+                        parts.append(chunk.content)
+                        yield chunk.content
+                self._record_call(method, self._usage(reported, prompt_tokens, "".join(parts)),
+                                   time.perf_counter() - start, truncated, streamed=True)
+                return
+            except GeneratorExit:
+                # The reader stopped early; the tokens streamed so far were still spent
+                self._record_call(method, self._usage(reported, prompt_tokens, "".join(parts)),
+                                   time.perf_counter() - start, truncated, streamed=True)
+                raise
+            except Exception as e:
+                if started or attempt == self.max_retries or not is_retryable(e):
+                    raise
+                self.retries[method] += 1
+                metrics.record_retry(method, e)
+                time.sleep(backoff_delay(attempt, e))
+
+
+def get_client(task):
+    """Return the shared client for a task, creating it on first use"""
+    with _lock:
+        client = _clients.get(task)
+        if client is None:
+            settings = task_settings(task)
+            client = LLMClient(task, settings["model"], settings["temperature"])
+            _clients[task] = client
+        return client
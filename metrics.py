@@ -0,0 +1,239 @@
+import atexit
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (seconds) of the LLM latency histogram buckets
+LATENCY_BUCKETS = tuple(float(b) for b in os.getenv(
+    "EDUTUTOR_METRICS_BUCKETS", "0.25,0.5,1,2,5,10,20,30,60,120").split(","))
+# Write the metrics in Prometheus text format to this file (e.g. for the
+# node_exporter textfile collector) every METRICS_FILE_INTERVAL seconds
+METRICS_FILE = os.getenv("EDUTUTOR_METRICS_FILE")
+METRICS_FILE_INTERVAL = float(os.getenv("EDUTUTOR_METRICS_FILE_INTERVAL", "15"))
+# Serve /metrics on this local port; unset disables the endpoint
+METRICS_PORT = int(os.getenv("EDUTUTOR_METRICS_PORT", "0"))
+METRICS_ADDR = os.getenv("EDUTUTOR_METRICS_ADDR", "127.0.0.1")
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the shape Prometheus expects"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating within its bucket, like histogram_quantile()"""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        lower, below = 0.0, 0
+        for bound, cumulative in zip(self.buckets, self.counts):
+            if cumulative >= rank:
+                in_bucket = cumulative - below
+                return lower + (bound - lower) * ((rank - below) / in_bucket if in_bucket else 1)
+            lower, below = bound, cumulative
+        # Above the largest bucket; its bound is the best estimate available
+        return self.buckets[-1]
+
+
+def _exception_class(error):
+    return getattr(error, "exception_class", None) or type(error).__name__
+
+
+def _labels(**labels):
+    escaped = (str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+def _number(value):
+    return "+Inf" if value == float("inf") else repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """Process-wide counters for LLM calls: latency, errors, retries and cache use.
+
+    Generation methods report failures in their return value, so errors are
+    counted here at the point they are caught. render() returns everything in
+    the Prometheus text exposition format.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.latency = {}
+        self.errors = defaultdict(int)
+        self.retries = defaultdict(int)
+        self.cache = defaultdict(lambda: {"hits": 0, "misses": 0})
+        self._lock = threading.Lock()
+
+    def observe_latency(self, method, seconds, streamed=False):
+        """Record the duration of a completed LLM call"""
+        key = (method or "unknown", bool(streamed))
+        with self._lock:
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def record_error(self, method, error):
+        """Count a failure by method and exception class.
+
+        Errors relayed from another process (FlightError) count under the
+        class of the original exception.
+        """
+        with self._lock:
+            self.errors[(method or "unknown", _exception_class(error))] += 1
+
+    def record_retry(self, method, error):
+        """Count a retried request by method and the exception that caused it"""
+        with self._lock:
+            self.retries[(method or "unknown", _exception_class(error))] += 1
+
+    def record_cache(self, method, hit):
+        """Count a response cache lookup"""
+        with self._lock:
+            self.cache[method or "unknown"]["hits" if hit else "misses"] += 1
+
+    def snapshot(self):
+        """Return a copy of every metric for display"""
+        with self._lock:
+            latency = []
+            for (method, streamed), h in sorted(self.latency.items()):
+                latency.append({
+                    "method": method,
+                    "streamed": streamed,
+                    "calls": h.count,
+                    "mean": h.sum / h.count if h.count else None,
+                    "p50": h.quantile(0.5),
+                    "p95": h.quantile(0.95),
+                    "buckets": dict(zip(h.buckets, h.counts)),
+                })
+            errors = [{"method": m, "exception": e, "count": c} for (m, e), c in sorted(self.errors.items())]
+            retries = [{"method": m, "exception": e, "count": c} for (m, e), c in sorted(self.retries.items())]
+            cache = []
+            for method, counts in sorted(self.cache.items()):
+                total = counts["hits"] + counts["misses"]
+                cache.append({"method": method, **counts, "hit_ratio": counts["hits"] / total if total else None})
+        return {"latency": latency, "errors": errors, "retries": retries, "cache": cache}
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            lines.append("# HELP edututor_llm_request_duration_seconds Latency of completed LLM calls.")
+            lines.append("# TYPE edututor_llm_request_duration_seconds histogram")
+            for (method, streamed), h in sorted(self.latency.items()):
+                streamed = str(streamed).lower()
+                for bound, count in zip(h.buckets, h.counts):
+                    labels = _labels(method=method, streamed=streamed, le=_number(bound))
+                    lines.append(f"edututor_llm_request_duration_seconds_bucket{labels} {count}")
+                labels = _labels(method=method, streamed=streamed, le="+Inf")
+                lines.append(f"edututor_llm_request_duration_seconds_bucket{labels} {h.count}")
+                labels = _labels(method=method, streamed=streamed)
+                lines.append(f"edututor_llm_request_duration_seconds_sum{labels} {_number(h.sum)}")
+                lines.append(f"edututor_llm_request_duration_seconds_count{labels} {h.count}")
+
+            lines.append("# HELP edututor_llm_errors_total Failed generations by method and exception class.")
+            lines.append("# TYPE edututor_llm_errors_total counter")
+            for (method, exception), count in sorted(self.errors.items()):
+                lines.append(f"edututor_llm_errors_total{_labels(method=method, exception=exception)} {count}")
+
+            lines.append("# HELP edututor_llm_retries_total Retried LLM requests by method and exception class.")
+            lines.append("# TYPE edututor_llm_retries_total counter")
+            for (method, exception), count in sorted(self.retries.items()):
+                lines.append(f"edututor_llm_retries_total{_labels(method=method, exception=exception)} {count}")
+
+            lines.append("# HELP edututor_llm_cache_requests_total Response cache lookups by method and result.")
+            lines.append("# TYPE edututor_llm_cache_requests_total counter")
+            for method, counts in sorted(self.cache.items()):
+                lines.append(f"edututor_llm_cache_requests_total{_labels(method=method, result='hit')} {counts['hits']}")
+                lines.append(f"edututor_llm_cache_requests_total{_labels(method=method, result='miss')} {counts['misses']}")
+
+            lines.append("# HELP edututor_llm_cache_hit_ratio Share of response cache lookups served from the cache.")
+            lines.append("# TYPE edututor_llm_cache_hit_ratio gauge")
+            for method, counts in sorted(self.cache.items()):
+                total = counts["hits"] + counts["misses"]
+                if total:
+                    lines.append(f"edututor_llm_cache_hit_ratio{_labels(method=method)} {_number(counts['hits'] / total)}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Atomically write the metrics to path"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self.render())
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Exporters run once per process; errors starting them are kept for the admin page
+exporters = {"file": None, "endpoint": None, "error": None}
+_exporters_lock = threading.Lock()
+
+
+def _write_periodically(path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            metrics.write(path)
+        except OSError as e:
+            exporters["error"] = f"Writing {path} failed: {e}"
+
+
+def start_exporters(path=METRICS_FILE, port=METRICS_PORT, addr=METRICS_ADDR, interval=METRICS_FILE_INTERVAL):
+    """Start the configured file writer and /metrics endpoint, if not already running"""
+    with _exporters_lock:
+        if path and exporters["file"] is None:
+            exporters["file"] = path
+            threading.Thread(target=_write_periodically, args=(path, interval), daemon=True).start()
+            atexit.register(lambda: metrics.write(path))
+        if port and exporters["endpoint"] is None:
+            try:
+                server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+            except OSError as e:
+                # Typically another process of the app already serves the port
+                exporters["error"] = f"Serving metrics on {addr}:{port} failed: {e}"
+            else:
+                server.daemon_threads = True
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+                exporters["endpoint"] = f"http://{addr}:{server.server_address[1]}/metrics"
+    return exporters
+
+
+# Initialize the shared metrics registry and its exporters
+metrics = Metrics()
+start_exporters()
@@ -0,0 +1,141 @@
+import gc
+import os
+import threading
+import time
+
+# Per-process budget for resident pipeline weights and idle unload delay
+DEFAULT_MEMORY_BUDGET_MB = float(os.getenv("EDUTUTOR_MODEL_MEMORY_BUDGET_MB", "2048"))
+DEFAULT_IDLE_TIMEOUT = float(os.getenv("EDUTUTOR_MODEL_IDLE_TIMEOUT", "600"))
+
+
+class ModelRegistry:
+    """Loads transformers pipelines on first use and unloads them when idle.
+
+    Loaded pipelines are tracked with their load time and resident size. When
+    loading a model pushes the total over the memory budget, the least recently
+    used other models are unloaded first.
+    """
+
+    def __init__(self, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.memory_budget_mb = memory_budget_mb
+        self.idle_timeout = idle_timeout
+        self._specs = {}
+        self._models = {}
+        self._lock = threading.RLock()
+        self._reaper = None
+
+    def register(self, name, task, model, **kwargs):
+        """Register a pipeline to be loaded lazily under name"""
+        with self._lock:
+            self._specs[name] = {"task": task, "model": model, "kwargs": kwargs}
+
+    def get(self, name):
+        """Return the pipeline for name, loading it if needed"""
+        with self._lock:
+            entry = self._models.get(name)
+            if entry is None:
+                entry = self._load(name)
+            entry["last_used"] = time.time()
+            return entry["pipeline"]
+
+    def _load(self, name):
+        """Load a registered pipeline and enforce the memory budget"""
+        import torch
+        from transformers import pipeline
+
+        spec = self._specs[name]
+        kwargs = dict(spec["kwargs"])
+        kwargs.setdefault("device", 0 if torch.cuda.is_available() else -1)
+        start = time.perf_counter()
+        pipe = pipeline(spec["task"], model=spec["model"], **kwargs)
+        entry = {
+            "pipeline": pipe,
+            "load_time": time.perf_counter() - start,
+            "size_mb": _model_size_mb(pipe.model),
+            "last_used": time.time(),
+        }
+        self._models[name] = entry
+        self._enforce_budget(keep=name)
+        self._start_reaper()
+        return entry
+
+    def _enforce_budget(self, keep=None):
+        """Unload least recently used models until within the memory budget"""
+        candidates = sorted(
+            (n for n in self._models if n != keep),
+            key=lambda n: self._models[n]["last_used"]
+        )
+        for candidate in candidates:
+            if self.resident_mb() <= self.memory_budget_mb:
+                break
+            self.unload(candidate)
+
+    def unload(self, name):
+        """Drop a loaded pipeline and release its memory"""
+        with self._lock:
+            entry = self._models.pop(name, None)
+        if entry is None:
+            return
+        del entry
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
+    def unload_idle(self):
+        """Unload every model unused for longer than the idle timeout"""
+        cutoff = time.time() - self.idle_timeout
+        with self._lock:
+            idle = [n for n, e in self._models.items() if e["last_used"] < cutoff]
+        for name in idle:
+            self.unload(name)
+        return idle
+
+    def _start_reaper(self):
+        """Start the background thread that unloads idle models"""
+        if self._reaper is not None and self._reaper.is_alive():
+            return
+
+        def reap():
+            while True:
+                time.sleep(max(self.idle_timeout / 4, 1))
+                self.unload_idle()
+                with self._lock:
+                    if not self._models:
+                        self._reaper = None
+                        return
+
+        self._reaper = threading.Thread(target=reap, name="model-registry-reaper", daemon=True)
+        self._reaper.start()
+
+    def resident_mb(self):
+        """Total size of the currently loaded models in MB"""
+        with self._lock:
+            return sum(e["size_mb"] for e in self._models.values())
+
+    def report(self):
+        """Return load time and resident size for every registered model"""
+        with self._lock:
+            rows = []
+            for name, spec in self._specs.items():
+                entry = self._models.get(name)
+                rows.append({
+                    "name": name,
+                    "model": spec["model"],
+                    "loaded": entry is not None,
+                    "load_time": entry["load_time"] if entry else None,
+                    "size_mb": entry["size_mb"] if entry else 0.0,
+                    "idle_seconds": time.time() - entry["last_used"] if entry else None,
+                })
+            return rows
+
+
+def _model_size_mb(model):
+    """Resident size of a torch model's parameters and buffers in MB"""
+    total = 0
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        total += tensor.numel() * tensor.element_size()
+    return total / (1024 * 1024)
@@ -0,0 +1,171 @@
+"""Pre-generate lessons, quizzes, exercises and flashcards for a topic catalogue.
+
+Results go to the content store, which the Learn, Quiz and Practice pages
+check before generating anything. Content already in the store is skipped,
+so an interrupted run picks up where it stopped; failed items are recorded
+and retried on the next run.
+
+    python pregenerate.py topics.txt [--kinds lesson quiz exercises flashcards]
+        [--detail-levels ...] [--difficulties ...] [--learning-styles Visual Visual+Auditory ...]
+        [--workers 4]
+
+The catalogue is a text file with one topic per line (# starts a comment)
+or a JSON list of topics.
+"""
+import argparse
+import itertools
+import json
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import content_gen as cg
+from ai_teaching import ai_teaching
+from content_store import content_store, content_key
+from quiz import normalize_question_type
+
+KINDS = ["lesson", "quiz", "exercises", "flashcards"]
+DETAIL_LEVELS = ["Overview", "Basic", "Detailed", "Comprehensive"]
+DIFFICULTIES = ["Beginner", "Intermediate", "Advanced"]
+LEARNING_STYLES = ["Visual", "Auditory", "Reading/Writing", "Kinesthetic"]
+QUESTION_TYPES = ["Multiple Choice", "Fill in the Blank", "Numeric", "Short Answer"]
+
+
+def load_catalogue(path):
+    """Read topics from a text file (one per line) or a JSON list"""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if path.endswith(".json"):
+        data = json.loads(text)
+        topics = data.get("topics", []) if isinstance(data, dict) else data
+    else:
+        topics = [line.split("#", 1)[0] for line in text.splitlines()]
+    seen = set()
+    result = []
+    for topic in (t.strip() for t in topics):
+        if topic and topic.lower() not in seen:
+            seen.add(topic.lower())
+            result.append(topic)
+    return result
+
+
+def plan_jobs(topics, args):
+    """Return (kind, topic, params) for every item to generate.
+
+    Lessons cover detail level x difficulty x learning style; quizzes,
+    exercises and flashcards take the parameters their pages use.
+    """
+    styles = [s.split("+") for s in args.learning_styles]
+    jobs = []
+    for topic in topics:
+        if "lesson" in args.kinds:
+            for detail_level, difficulty, style in itertools.product(args.detail_levels, args.difficulties, styles):
+                jobs.append(("lesson", topic, {"detail_level": detail_level, "difficulty": difficulty,
+                                               "learning_style": style}))
+        if "quiz" in args.kinds:
+            for question_type in args.question_types:
+                jobs.append(("quiz", topic, {"num_questions": args.quiz_questions,
+                                             "question_type": normalize_question_type(question_type)}))
+        if "exercises" in args.kinds:
+            jobs.append(("exercises", topic, {"num_exercises": args.exercises}))
+        if "flashcards" in args.kinds:
+            jobs.append(("flashcards", topic, {"count": args.flashcards}))
+    return jobs
+
+
+def generate(kind, topic, params):
+    """Generate one item, returning its stored text or raising on failure"""
+    if kind == "lesson":
+        value = ai_teaching.generate_lesson(topic, params["detail_level"], params["difficulty"], params["learning_style"])
+    elif kind == "quiz":
+        value = ai_teaching.generate_structured_quiz(topic, params["num_questions"], params["question_type"])
+        if not isinstance(value, str):
+            value = value.model_dump_json(exclude={"retries"})
+    elif kind == "exercises":
+        value = ai_teaching.generate_practice_exercises(topic, params["num_exercises"])
+    else:
+        value = cg.generate_flashcards(topic, params["count"])
+    if value.startswith("Error"):
+        raise RuntimeError(value)
+    return value
+
+
+def run_job(job):
+    """Generate and store one job; return (job, seconds, error)"""
+    kind, topic, params = job
+    start = time.perf_counter()
+    try:
+        content_store.put(kind, topic, generate(kind, topic, params), **params)
+        return job, time.perf_counter() - start, None
+    except Exception as e:
+        content_store.record_failure(kind, topic, str(e), **params)
+        return job, time.perf_counter() - start, str(e)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("catalogue", help="Topic catalogue (.txt or .json)")
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=KINDS)
+    parser.add_argument("--detail-levels", nargs="+", default=DETAIL_LEVELS)
+    parser.add_argument("--difficulties", nargs="+", default=DIFFICULTIES)
+    parser.add_argument("--learning-styles", nargs="+", default=["Visual"],
+                        help="Styles to combine; join several with + for a multi-style lesson")
+    parser.add_argument("--question-types", nargs="+", default=["Multiple Choice"])
+    parser.add_argument("--quiz-questions", type=int, default=5)
+    parser.add_argument("--exercises", type=int, default=3)
+    parser.add_argument("--flashcards", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4, help="Generations in flight at once")
+    parser.add_argument("--skip-failed", action="store_true", help="Don't retry items that failed before")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be generated")
+    args = parser.parse_args(argv)
+
+    jobs = plan_jobs(load_catalogue(args.catalogue), args)
+    failed_before = {content_key(f["kind"], f["topic"], **f["params"]) for f in content_store.failures()}
+    pending = []
+    for job in jobs:
+        key = content_key(job[0], job[1], **job[2])
+        if content_store.has(key) or (args.skip_failed and key in failed_before):
+            continue
+        pending.append(job)
+    print(f"{len(jobs)} items planned, {len(jobs) - len(pending)} already done or skipped, {len(pending)} to generate")
+    if args.dry_run or not pending:
+        return 0
+
+    start = time.perf_counter()
+    done = defaultdict(int)
+    seconds = defaultdict(float)
+    failures = []
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = [executor.submit(run_job, job) for job in pending]
+        try:
+            for i, future in enumerate(as_completed(futures), 1):
+                (kind, topic, params), elapsed, error = future.result()
+                if error is None:
+                    done[kind] += 1
+                    seconds[kind] += elapsed
+                else:
+                    failures.append((kind, topic, params, error))
+                rate = i / (time.perf_counter() - start)
+                status = "ok" if error is None else f"FAILED: {error[:80]}"
+                print(f"[{i}/{len(pending)}] {kind:<10} {topic} ({elapsed:.1f}s, {rate:.2f} items/s) {status}", flush=True)
+        except KeyboardInterrupt:
+            print("Interrupted; finished items are kept and the rest will run next time")
+            for future in futures:
+                future.cancel()
+            raise
+
+    total = time.perf_counter() - start
+    completed = sum(done.values())
+    print()
+    print(f"Generated {completed} items in {total:.1f}s ({completed / total:.2f} items/s), {len(failures)} failed")
+    for kind in KINDS:
+        if done[kind]:
+            print(f"  {kind:<10} {done[kind]:>5} items, {seconds[kind] / done[kind]:.1f}s mean")
+    for kind, topic, params, error in failures:
+        print(f"  FAILED {kind} {topic} {json.dumps(params)}: {error}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
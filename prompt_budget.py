@@ -0,0 +1,93 @@
+import os
+import threading
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Prompt token budget per method, leaving room in the context window for the
+# completion; EDUTUTOR_PROMPT_BUDGET sets the default and
+# EDUTUTOR_PROMPT_BUDGET_<METHOD> overrides one method
+DEFAULT_PROMPT_BUDGET = int(os.getenv("EDUTUTOR_PROMPT_BUDGET", "12000"))
+PROMPT_BUDGETS = {
+    "grade_answer": 2000,
+    "grade_answers": 6000,
+    "summarize_chunk": 4000,
+    "collapse_summaries": 6500,
+    "reask_quiz": 6000,
+}
+
+TRUNCATION_MARKER = "\n\n[... {omitted} tokens omitted to fit the prompt budget ...]\n\n"
+
+_encodings = {}
+_lock = threading.Lock()
+
+
+def _encoding(model):
+    """Return the tiktoken encoding for a model, or None if it can't be loaded"""
+    if tiktoken is None:
+        return None
+    with _lock:
+        if model not in _encodings:
+            try:
+                try:
+                    _encodings[model] = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    # Models tiktoken doesn't know (e.g. Mixtral) are estimated with cl100k
+                    _encodings[model] = tiktoken.get_encoding("cl100k_base")
+            except Exception:
+                # The encoding files are downloaded on first use; offline, fall back to estimates
+                _encodings[model] = None
+        return _encodings[model]
+
+
+def count_tokens(text, model="gpt-3.5-turbo"):
+    """Number of tokens in text for model, estimated when no tokenizer is available"""
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def prompt_budget(method):
+    """Return the prompt token budget for a method"""
+    default = PROMPT_BUDGETS.get(method, DEFAULT_PROMPT_BUDGET)
+    return int(os.getenv(f"EDUTUTOR_PROMPT_BUDGET_{str(method).upper()}", default))
+
+
+def truncate_middle(text, max_tokens, model="gpt-3.5-turbo"):
+    """Fit text into max_tokens by cutting from the middle.
+
+    Prompts put instructions first and the output format last, with the
+    content in between, so the head and tail are kept and the cut is snapped
+    to line boundaries. Returns (text, tokens, truncated).
+    """
+    tokens = count_tokens(text, model)
+    if tokens <= max_tokens:
+        return text, tokens, False
+    keep = len(text) * max_tokens // tokens
+    while keep > 0:
+        head = text[:keep // 2]
+        tail = text[len(text) - keep // 2:]
+        # Snap to line boundaries when that doesn't throw away much
+        newline = head.rfind("\n")
+        if newline > len(head) * 0.8:
+            head = head[:newline]
+        newline = tail.find("\n")
+        if 0 <= newline < len(tail) * 0.2:
+            tail = tail[newline + 1:]
+        omitted = tokens - count_tokens(head, model) - count_tokens(tail, model)
+        result = head + TRUNCATION_MARKER.format(omitted=max(omitted, 0)) + tail
+        result_tokens = count_tokens(result, model)
+        if result_tokens <= max_tokens:
+            return result, result_tokens, True
+        keep = keep * 9 // 10
+    return "", 0, True
+
+
+def fit_prompt(prompt, method, model="gpt-3.5-turbo"):
+    """Apply a method's prompt budget; returns (prompt, tokens, truncated)"""
+    return truncate_middle(prompt, prompt_budget(method), model)
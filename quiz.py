@@ -0,0 +1,352 @@
+import json
+import os
+import re
+from typing import List, Literal, Optional
+
+from langchain.prompts import PromptTemplate
+from pydantic import BaseModel, Field, ValidationError, field_validator, model_validator
+
+# How many times a malformed quiz is sent back to the model for correction
+MAX_REASKS = int(os.getenv("EDUTUTOR_QUIZ_MAX_REASKS", "2"))
+
+QUESTION_TYPES = ("multiple_choice", "fill_in_the_blank", "short_answer", "numeric")
+OPTION_LETTERS = "ABCDEF"
+
+QUIZ_TEMPLATE = PromptTemplate(
+    input_variables=["content", "num_questions", "question_type", "difficulty"],
+    template="""Based on the following content, generate {num_questions} {question_type} questions{difficulty}:\n\n{content}\n\nRespond with JSON only, no markdown, in exactly this shape:\n{{"questions": [{{"question": "...", "type": "{question_type}", "options": ["...", "..."], "answer": "...", "alternatives": [], "explanation": "..."}}]}}\n\nRules:\n- multiple_choice: 4 options without letter prefixes; answer is the letter (A-D) of the correct option.\n- fill_in_the_blank: mark the blank with ____; answer is the missing word or phrase; list other accepted spellings in alternatives.\n- numeric: answer is a number; add "tolerance" with the allowed absolute error.\n- short_answer: answer is a model answer of one or two sentences.\n- options is an empty list for every type except multiple_choice."""
+)
+
+REASK_TEMPLATE = PromptTemplate(
+    input_variables=["error", "output"],
+    template="""Your previous quiz could not be used: {error}\n\nPrevious output:\n{output}\n\nReturn the corrected quiz as JSON only, in the shape that was requested."""
+)
+
+
+class QuizParseError(ValueError):
+    """Raised when model output cannot be turned into a valid quiz"""
+
+
+def normalize_question_type(question_type):
+    """Map a UI label such as "Fill in the Blank" to a question type"""
+    value = re.sub(r"[\s\-]+", "_", str(question_type).strip().lower())
+    aliases = {"mcq": "multiple_choice", "fill_in_the_blanks": "fill_in_the_blank", "numerical": "numeric"}
+    value = aliases.get(value, value)
+    return value if value in QUESTION_TYPES else "multiple_choice"
+
+
+_OPTION_PREFIX = re.compile(r"^\s*\(?([A-Fa-f])\s*[).:\-]\s+")
+
+
+class QuizQuestion(BaseModel):
+    question: str = Field(min_length=1)
+    type: Literal["multiple_choice", "fill_in_the_blank", "short_answer", "numeric"] = "multiple_choice"
+    options: List[str] = Field(default_factory=list)
+    answer: str = Field(min_length=1)
+    alternatives: List[str] = Field(default_factory=list)
+    explanation: str = ""
+    tolerance: Optional[float] = None
+
+    @field_validator("type", mode="before")
+    @classmethod
+    def _normalize_type(cls, value):
+        return normalize_question_type(value)
+
+    @field_validator("answer", mode="before")
+    @classmethod
+    def _answer_to_text(cls, value):
+        if isinstance(value, list):
+            value = value[0] if value else ""
+        return str(value).strip() if value is not None else ""
+
+    @field_validator("options", mode="before")
+    @classmethod
+    def _strip_option_letters(cls, value):
+        if isinstance(value, dict):
+            value = [value[k] for k in sorted(value)]
+        return [_OPTION_PREFIX.sub("", str(o)).strip() for o in value or [] if str(o).strip()]
+
+    @model_validator(mode="after")
+    def _check_answer(self):
+        if self.type == "multiple_choice":
+            if not 2 <= len(self.options) <= len(OPTION_LETTERS):
+                raise ValueError(f"multiple_choice needs 2-{len(OPTION_LETTERS)} options, got {len(self.options)}")
+            self.answer = self._answer_letter()
+        elif self.type == "numeric":
+            try:
+                float(self.answer.replace(",", ""))
+            except ValueError:
+                raise ValueError(f"numeric answer is not a number: {self.answer!r}")
+        return self
+
+    def _answer_letter(self):
+        """Resolve an MCQ answer given as a letter, "B) text" or option text to its letter"""
+        letters = OPTION_LETTERS[:len(self.options)]
+        answer = self.answer.strip()
+        bare = re.fullmatch(r"\(?([A-Fa-f])\)?", answer)
+        if bare and bare.group(1).upper() in letters:
+            return bare.group(1).upper()
+        for text in (answer.lower(), _OPTION_PREFIX.sub("", answer).strip().lower()):
+            for letter, option in zip(letters, self.options):
+                if option.lower() == text:
+                    return letter
+        prefixed = _OPTION_PREFIX.match(answer)
+        if prefixed and prefixed.group(1).upper() in letters:
+            return prefixed.group(1).upper()
+        raise ValueError(f"answer {self.answer!r} does not match any option")
+
+    def to_markdown(self, number):
+        """Render the question the way the markdown quizzes were laid out"""
+        lines = [f"**Question {number}:** {self.question}", ""]
+        for letter, option in zip(OPTION_LETTERS, self.options):
+            lines.append(f"- {letter}) {option}")
+        return "\n".join(lines).rstrip()
+
+
+class Quiz(BaseModel):
+    questions: List[QuizQuestion] = Field(min_length=1)
+    # Re-asks it took to get valid output; 0 when the first reply parsed
+    retries: int = 0
+
+    def answer_key(self):
+        """Render the correct answers and explanations as a markdown list"""
+        lines = []
+        for i, q in enumerate(self.questions):
+            answer = q.answer
+            if q.type == "multiple_choice":
+                answer = f"{q.answer}) {q.options[OPTION_LETTERS.index(q.answer)]}"
+            line = f"{i + 1}. **{answer}**"
+            if q.explanation:
+                line += f" — {q.explanation}"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def to_markdown(self, answers=True):
+        """Render the quiz as markdown, optionally followed by the answer key"""
+        parts = [q.to_markdown(i + 1) for i, q in enumerate(self.questions)]
+        if answers:
+            parts += ["### Answers", self.answer_key()]
+        return "\n\n".join(parts)
+
+
+# Keys models commonly use instead of the schema's
+KEY_ALIASES = {
+    "question_text": "question", "prompt": "question", "stem": "question", "q": "question",
+    "choices": "options", "answers": "options",
+    "correct_answer": "answer", "correct": "answer", "correct_option": "answer", "solution": "answer",
+    "accepted_answers": "alternatives", "acceptable_answers": "alternatives",
+    "rationale": "explanation", "reason": "explanation",
+    "question_type": "type",
+}
+
+_FENCE = re.compile(r"```(?:json|JSON)?\s*(.*?)```", re.S)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_UNQUOTED_KEY = re.compile(r"([{,]\s*)([A-Za-z_][A-Za-z0-9_]*)\s*:")
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+
+def extract_json(text):
+    """Return the JSON-looking part of a reply: fenced block, else first bracket to last"""
+    fenced = _FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        return None
+    return text[min(starts):].strip()
+
+
+def _close_brackets(text):
+    """Close a string and brackets left open by a truncated reply"""
+    stack = []
+    in_string = escaped = False
+    for ch in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    text = text.rstrip().rstrip(",:")
+    return text + "".join(reversed(stack))
+
+
+def loads_tolerant(text):
+    """json.loads, then again after progressively more invasive repairs"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    repaired = text.translate(_SMART_QUOTES)
+    if '"' not in repaired:
+        repaired = repaired.replace("'", '"')
+    candidates = [
+        lambda t: _TRAILING_COMMA.sub(r"\1", t),
+        lambda t: _TRAILING_COMMA.sub(r"\1", _UNQUOTED_KEY.sub(r'\1"\2":', t)),
+        # Prose after the last closing bracket, such as a trailing note
+        lambda t: _TRAILING_COMMA.sub(r"\1", t[:max(t.rfind("}"), t.rfind("]")) + 1]),
+        # Truncated reply
+        lambda t: _TRAILING_COMMA.sub(r"\1", _close_brackets(t)),
+    ]
+    for repair in candidates:
+        try:
+            return json.loads(repair(repaired))
+        except ValueError:
+            continue
+    # Truncated mid-item: keep everything up to one of the last complete objects
+    ends = [i for i, ch in enumerate(repaired) if ch == "}"]
+    for end in reversed(ends[-20:]):
+        try:
+            return json.loads(_TRAILING_COMMA.sub(r"\1", _close_brackets(repaired[:end + 1])))
+        except ValueError:
+            continue
+    return None
+
+
+def _normalize_keys(item):
+    if not isinstance(item, dict):
+        return item
+    return {KEY_ALIASES.get(str(k).strip().lower(), str(k).strip().lower()): v for k, v in item.items()}
+
+
+_MD_LABEL = re.compile(r"^(question(?:\s*\d+)?|q\d+|options?|choices|correct answer|answer|explanation)\s*[:.)]\s*(.*)$", re.I)
+_MD_OPTION = re.compile(r"^\(?([A-Fa-f])\s*[).:]\s+(.*)$")
+
+
+def _parse_markdown(text):
+    """Read the "Question: / Options: / Correct Answer: / Explanation:" layout"""
+    questions = []
+    current = None
+    field = None
+    for raw in text.splitlines():
+        line = re.sub(r"[*_#`]+", "", raw).strip().lstrip("-• ").strip()
+        if not line:
+            continue
+        label = _MD_LABEL.match(line)
+        option = _MD_OPTION.match(line)
+        if label:
+            name = label.group(1).lower()
+            value = label.group(2).strip()
+            if name.startswith("q"):
+                current = {"question": value, "options": [], "answer": "", "explanation": ""}
+                questions.append(current)
+                field = "question"
+                continue
+            if current is None:
+                continue
+            if name.startswith(("option", "choice")):
+                field = "options"
+                inline = re.split(r"\s+(?=\(?[A-Fa-f]\s*[).:]\s)", value) if value else []
+                current["options"].extend(o for o in inline if o)
+            elif name in ("correct answer", "answer"):
+                current["answer"] = value
+                field = "answer"
+            else:
+                current["explanation"] = value
+                field = "explanation"
+        elif current is not None and option and field in ("question", "options"):
+            current["options"].append(option.group(2))
+            field = "options"
+        elif current is not None and field in ("question", "explanation"):
+            current[field] = f"{current[field]} {line}".strip()
+    return questions
+
+
+def parse_quiz(text, question_type="multiple_choice"):
+    """Turn a model reply into a validated Quiz, repairing near-miss output.
+
+    Accepts JSON with or without fences, stray prose, trailing commas,
+    unquoted keys, smart quotes, aliased keys and truncation, and falls back
+    to the markdown layout of the original prompts. Questions that still
+    fail validation are dropped; QuizParseError is raised if none survive.
+    """
+    default_type = normalize_question_type(question_type)
+    data = None
+    candidate = extract_json(text or "")
+    if candidate is not None:
+        data = loads_tolerant(candidate)
+    if isinstance(data, dict):
+        data = _normalize_keys(data)
+        items = data.get("questions") or data.get("quiz") or ([data] if "question" in data else None)
+    elif isinstance(data, list):
+        items = data
+    else:
+        items = None
+    if not items:
+        items = _parse_markdown(text or "")
+    if not items:
+        raise QuizParseError("no questions found in the reply")
+
+    questions = []
+    errors = []
+    for i, item in enumerate(items):
+        item = _normalize_keys(item)
+        if not isinstance(item, dict):
+            errors.append(f"question {i + 1} is not an object")
+            continue
+        item.setdefault("type", default_type)
+        try:
+            questions.append(QuizQuestion.model_validate(item))
+        except ValidationError as e:
+            errors.append(f"question {i + 1}: {e.errors()[0]['msg']}")
+    if not questions:
+        raise QuizParseError("; ".join(errors) or "no valid questions")
+    return Quiz(questions=questions)
+
+
+def quiz_prompt(content, num_questions=5, question_type="multiple_choice", difficulty=None):
+    """Render the prompt asking for a quiz as JSON"""
+    return QUIZ_TEMPLATE.format(
+        content=content,
+        num_questions=num_questions,
+        question_type=normalize_question_type(question_type),
+        difficulty=f" suitable for {difficulty} level students" if difficulty else ""
+    )
+
+
+def reask_prompt(prompt, output, error):
+    """Render the follow-up prompt asking the model to fix its quiz"""
+    return prompt + "\n\n" + REASK_TEMPLATE.format(error=error, output=output)
+
+
+def build_quiz(call, prompt, question_type="multiple_choice", max_reasks=MAX_REASKS):
+    """Ask for a quiz with call(prompt) -> text, re-asking while the reply is unusable.
+
+    Returns (quiz, text), where text is the reply the quiz was parsed from and
+    quiz.retries the number of re-asks it took.
+    """
+    text = call(prompt, 0)
+    for attempt in range(max_reasks + 1):
+        try:
+            quiz = parse_quiz(text, question_type)
+        except QuizParseError as e:
+            if attempt == max_reasks:
+                raise
+            text = call(reask_prompt(prompt, text, e), attempt + 1)
+            continue
+        quiz.retries = attempt
+        return quiz, text
+
+
+async def abuild_quiz(acall, prompt, question_type="multiple_choice", max_reasks=MAX_REASKS):
+    """Async counterpart of build_quiz"""
+    text = await acall(prompt, 0)
+    for attempt in range(max_reasks + 1):
+        try:
+            quiz = parse_quiz(text, question_type)
+        except QuizParseError as e:
+            if attempt == max_reasks:
+                raise
+            text = await acall(reask_prompt(prompt, text, e), attempt + 1)
+            continue
+        quiz.retries = attempt
+        return quiz, text
@@ -0,0 +1,194 @@
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from llm_cache import CACHE_DIR
+from summarization import split_text
+
+INDEX_DIR = os.path.join(CACHE_DIR, "indexes")
+
+# Retrieval chunks are smaller than summarization chunks so top-k stays focused
+RETRIEVAL_CHUNK_SIZE = 1500
+RETRIEVAL_CHUNK_OVERLAP = 150
+# Upper bound on the source material sent with a lesson prompt
+MAX_CONTEXT_CHARS = int(os.getenv("EDUTUTOR_RETRIEVAL_MAX_CHARS", "12000"))
+DEFAULT_TOP_K = 8
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "in",
+    "is", "it", "its", "of", "on", "or", "that", "the", "this", "to", "was",
+    "were", "will", "with",
+}
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Lowercase word tokens without stopwords"""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """BM25 index over the chunks of one document.
+
+    Postings are stored term-major in flat NumPy arrays (CSR layout), so a
+    query is scored with a handful of vectorised operations per query term.
+    """
+
+    def __init__(self, chunks, vocab, indptr, chunk_ids, term_freqs, chunk_lengths):
+        self.chunks = chunks
+        self.vocab = vocab
+        self.term_index = {term: i for i, term in enumerate(vocab)}
+        self.indptr = indptr
+        self.chunk_ids = chunk_ids
+        self.term_freqs = term_freqs
+        self.chunk_lengths = chunk_lengths
+        n = len(chunks)
+        doc_freqs = np.diff(indptr)
+        self.idf = np.log1p((n - doc_freqs + 0.5) / (doc_freqs + 0.5))
+        avg_length = chunk_lengths.mean() if n else 0.0
+        self.length_norm = K1 * (1 - B + B * chunk_lengths / avg_length) if n else chunk_lengths
+
+    @classmethod
+    def build(cls, text):
+        """Chunk text and index the chunks"""
+        chunks = split_text(text, RETRIEVAL_CHUNK_SIZE, RETRIEVAL_CHUNK_OVERLAP)
+        postings = {}
+        lengths = []
+        for chunk_id, chunk in enumerate(chunks):
+            tokens = tokenize(chunk)
+            lengths.append(len(tokens))
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                postings.setdefault(token, []).append((chunk_id, count))
+        vocab = sorted(postings)
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        chunk_ids = []
+        term_freqs = []
+        for i, term in enumerate(vocab):
+            entries = postings[term]
+            indptr[i + 1] = indptr[i] + len(entries)
+            chunk_ids.extend(e[0] for e in entries)
+            term_freqs.extend(e[1] for e in entries)
+        return cls(
+            chunks,
+            vocab,
+            indptr,
+            np.asarray(chunk_ids, dtype=np.int32),
+            np.asarray(term_freqs, dtype=np.float32),
+            np.asarray(lengths, dtype=np.float32),
+        )
+
+    def scores(self, query):
+        """BM25 score of every chunk for query"""
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for term in set(tokenize(query)):
+            i = self.term_index.get(term)
+            if i is None:
+                continue
+            start, end = self.indptr[i], self.indptr[i + 1]
+            ids = self.chunk_ids[start:end]
+            tf = self.term_freqs[start:end]
+            scores[ids] += self.idf[i] * tf * (K1 + 1) / (tf + self.length_norm[ids])
+        return scores
+
+    def top_k(self, query, k=DEFAULT_TOP_K):
+        """Indices of the k best-matching chunks, best first"""
+        scores = self.scores(query)
+        k = min(k, len(scores))
+        if k == 0 or not scores.any():
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [int(i) for i in best if scores[i] > 0]
+
+    def save(self, path):
+        """Persist the index to an .npz file"""
+        tmp_path = path + ".tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            chunks=np.array(json.dumps(self.chunks)),
+            vocab=np.array(json.dumps(self.vocab)),
+            indptr=self.indptr,
+            chunk_ids=self.chunk_ids,
+            term_freqs=self.term_freqs,
+            chunk_lengths=self.chunk_lengths,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Load an index saved with save()"""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                json.loads(str(data["chunks"])),
+                json.loads(str(data["vocab"])),
+                data["indptr"],
+                data["chunk_ids"],
+                data["term_freqs"],
+                data["chunk_lengths"],
+            )
+
+
+class RetrievalIndexStore:
+    """Builds, persists and caches one BM25 index per ingested document"""
+
+    def __init__(self, directory=INDEX_DIR, memory_items=8):
+        self.directory = directory
+        self.memory_items = memory_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, document):
+        """Return the index for an ingested document, building it on first use"""
+        doc_id = document["doc_id"]
+        with self._lock:
+            index = self._memory.get(doc_id)
+            if index is not None:
+                self._memory.move_to_end(doc_id)
+                return index
+        path = os.path.join(self.directory, f"{doc_id}.npz")
+        if os.path.exists(path):
+            index = BM25Index.load(path)
+        else:
+            index = BM25Index.build(document["text"])
+            index.save(path)
+        with self._lock:
+            self._memory[doc_id] = index
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+        return index
+
+    def relevant_context(self, document, query, k=DEFAULT_TOP_K, max_chars=MAX_CONTEXT_CHARS):
+        """Return the chunks most relevant to query, in document order, within max_chars.
+
+        Without a query, or when nothing matches, the opening chunks of the
+        document are used instead.
+        """
+        index = self.get(document)
+        ranked = index.top_k(query, k) if query else []
+        if not ranked:
+            ranked = list(range(min(k, len(index.chunks))))
+        selected = []
+        used = 0
+        for i in ranked:
+            if used + len(index.chunks[i]) > max_chars and selected:
+                break
+            selected.append(i)
+            used += len(index.chunks[i])
+        return "\n\n...\n\n".join(index.chunks[i][:max_chars] for i in sorted(selected))
+
+
+# Initialize the shared retrieval index store
+index_store = RetrievalIndexStore()
@@ -0,0 +1,284 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from llm_cache import CACHE_DIR
+
+LEASE_STORE_PATH = os.path.join(CACHE_DIR, "singleflight.db")
+
+# How long a process may hold a key before others assume it died
+LEASE_SECONDS = float(os.getenv("EDUTUTOR_SINGLEFLIGHT_LEASE", "300"))
+# How long a finished result stays readable by processes that were waiting for it
+RESULT_TTL = float(os.getenv("EDUTUTOR_SINGLEFLIGHT_RESULT_TTL", "5"))
+# How often a process waiting on another one checks the lease store
+POLL_INTERVAL = float(os.getenv("EDUTUTOR_SINGLEFLIGHT_POLL", "0.1"))
+
+
+class FlightError(RuntimeError):
+    """Raised to waiters when the call they were waiting on failed in another process.
+
+    exception_class names the exception the call raised there.
+    """
+
+    def __init__(self, message, exception_class=None):
+        super().__init__(message)
+        self.exception_class = exception_class or type(self).__name__
+
+
+class FlightAbandoned(RuntimeError):
+    """Raised to waiters when the leader gave up without an outcome; they should retry"""
+
+
+class LeaseStore:
+    """SQLite lease table that lets one process at a time run the call for a key.
+
+    The leader writes the result (or error) back to its row, where waiting
+    processes pick it up. Each lease has its own id and only processes that
+    saw that lease in flight take its outcome, so a finished call is never
+    replayed to later callers. Leases expire so a crashed leader can't block others.
+    """
+
+    def __init__(self, path=LEASE_STORE_PATH, lease_seconds=LEASE_SECONDS,
+                 result_ttl=RESULT_TTL, poll_interval=POLL_INTERVAL):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{id(self)}"
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(flights)')]
+        if columns and "lease_id" not in columns:
+            # Leases only live for the duration of a call, so an old table can go
+            conn.execute('DROP TABLE flights')
+        conn.execute('''CREATE TABLE IF NOT EXISTS flights (
+            key TEXT PRIMARY KEY,
+            lease_id TEXT NOT NULL,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            result TEXT,
+            error TEXT,
+            error_class TEXT,
+            finished_at REAL
+        )''')
+
+    def _connect(self):
+        """Get this thread's connection to the lease store"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _try_acquire(self, key, waiting_on=None):
+        """One attempt: ("lead", None), ("wait", lease_id), ("done", result) or ("failed", (class, message)).
+
+        A finished outcome is only returned for waiting_on, the lease this
+        process saw in flight; any other finished row is replaced by a new lease.
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute('''SELECT lease_id, expires_at, result, error, error_class, finished_at
+                                  FROM flights WHERE key = ?''', (key,)).fetchone()
+            if row is not None:
+                lease_id, expires_at, result, error, error_class, finished_at = row
+                if finished_at is not None and lease_id == waiting_on and now - finished_at <= self.result_ttl:
+                    return ("done", result) if error is None else ("failed", (error_class, error))
+                if finished_at is None and expires_at > now:
+                    return ("wait", lease_id)
+            conn.execute('''INSERT OR REPLACE INTO flights
+                            (key, lease_id, owner, expires_at, result, error, error_class, finished_at)
+                            VALUES (?, ?, ?, ?, NULL, NULL, NULL, NULL)''',
+                         (key, uuid.uuid4().hex, self.owner, now + self.lease_seconds))
+            return ("lead", None)
+        finally:
+            conn.execute("COMMIT")
+
+    def acquire(self, key):
+        """Take the lease for key, or wait for the process holding it to finish.
+
+        Returns ("lead", None) when this process should make the call, or
+        ("done", result) / ("failed", (exception class, message)) with the
+        outcome of the call this process waited on.
+        """
+        deadline = time.monotonic() + self.lease_seconds
+        waiting_on = None
+        while True:
+            state, value = self._try_acquire(key, waiting_on)
+            if state != "wait":
+                return state, value
+            if time.monotonic() > deadline:
+                return ("lead", None)
+            # The lease may change hands if its holder dies; follow the current one
+            waiting_on = value
+            time.sleep(self.poll_interval)
+
+    def release(self, key, result=None, error=None, error_class=None, abandon=False):
+        """Publish the outcome of a call this process led, or drop the lease without one"""
+        now = time.time()
+        conn = self._connect()
+        if abandon:
+            conn.execute('DELETE FROM flights WHERE key = ? AND owner = ?', (key, self.owner))
+        else:
+            conn.execute('''UPDATE flights SET result = ?, error = ?, error_class = ?, finished_at = ?
+                            WHERE key = ? AND owner = ?''', (result, error, error_class, now, key, self.owner))
+        conn.execute('''DELETE FROM flights
+                        WHERE (finished_at IS NOT NULL AND finished_at < ?)
+                           OR (finished_at IS NULL AND expires_at < ?)''', (now - self.result_ttl, now))
+
+
+class _Call:
+    """An in-flight call that threads of this process can wait on"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Flight:
+    """Handle for one caller's part in a coalesced call.
+
+    The leader makes the call and must end it with finish() or fail();
+    everyone else calls wait() for the leader's outcome. Only the first of
+    finish(), fail() and abandon() takes effect.
+    """
+
+    def __init__(self, group, key, call, leader):
+        self.group = group
+        self.key = key
+        self.call = call
+        self.leader = leader
+        self.done = False
+
+    def wait(self):
+        """Return the leader's result, or raise its error.
+
+        A leader that hasn't finished within the group's wait timeout is
+        taken to be stuck: FlightAbandoned is raised, and the next caller leads.
+        """
+        if not self.call.event.wait(self.group.wait_timeout):
+            self.group._expire(self.key, self.call)
+        if self.call.error is not None:
+            raise self.call.error
+        return self.call.result
+
+    def _end(self, **outcome):
+        if self.done:
+            return
+        self.done = True
+        self.group._complete(self.key, self.call, **outcome)
+
+    def finish(self, result):
+        self._end(result=result)
+
+    def fail(self, error):
+        self._end(error=error)
+
+    def abandon(self):
+        """Give up leading without an outcome, e.g. when a stream's reader went away"""
+        self._end(error=FlightAbandoned("the call was abandoned"))
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls so they share one upstream call.
+
+    Threads of one process coalesce through an in-memory table of in-flight
+    calls; with a LeaseStore, one thread per process takes part in a
+    cross-process lease so worker processes coalesce as well. Waiters give
+    up on a leader after wait_timeout seconds, the lease length by default.
+    """
+
+    def __init__(self, leases=None, wait_timeout=None):
+        self.leases = leases
+        if wait_timeout is None:
+            wait_timeout = leases.lease_seconds if leases is not None else LEASE_SECONDS
+        self.wait_timeout = wait_timeout
+        self.leaders = 0
+        self.followers = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def begin(self, key):
+        """Join the call for key, becoming its leader if nobody is making it"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.followers += 1
+                return Flight(self, key, call, leader=False)
+            call = _Call()
+            self._calls[key] = call
+        if self.leases is not None:
+            try:
+                state, value = self.leases.acquire(key)
+            except sqlite3.Error:
+                state, value = "lead", None
+            if state != "lead":
+                # Another process made the call; hand its outcome to local waiters
+                error = None
+                if state == "failed":
+                    exception_class, message = value
+                    error = FlightError(message, exception_class)
+                self._complete(key, call, result=value if state == "done" else None, error=error, publish=False)
+                with self._lock:
+                    self.followers += 1
+                return Flight(self, key, call, leader=False)
+        with self._lock:
+            self.leaders += 1
+        return Flight(self, key, call, leader=True)
+
+    def _complete(self, key, call, result=None, error=None, publish=True):
+        if publish and self.leases is not None:
+            try:
+                self.leases.release(key, result=result,
+                                    error=str(error) if error is not None else None,
+                                    error_class=getattr(error, "exception_class", type(error).__name__)
+                                    if error is not None else None,
+                                    abandon=isinstance(error, FlightAbandoned))
+            except sqlite3.Error:
+                pass
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.result = result
+        call.error = error
+        call.event.set()
+
+    def _expire(self, key, call):
+        """Stop waiting on a call whose leader never completed it"""
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+            if not call.event.is_set():
+                call.error = FlightAbandoned("the leader did not finish in time")
+                call.event.set()
+
+    def do(self, key, fn):
+        """Return fn(), sharing one execution among concurrent callers with the same key"""
+        flight = self.begin(key)
+        while not flight.leader:
+            try:
+                return flight.wait()
+            except FlightAbandoned:
+                flight = self.begin(key)
+        try:
+            result = fn()
+        except BaseException as e:
+            flight.fail(e)
+            raise
+        flight.finish(result)
+        return result
+
+    def stats(self):
+        """Return how many calls were made and how many were served by another caller's call"""
+        return {"leaders": self.leaders, "followers": self.followers}
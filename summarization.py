@@ -0,0 +1,130 @@
+import os
+
+from langchain.prompts import PromptTemplate
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from concurrency import gather_bounded, DEFAULT_MAX_CONCURRENCY
+from llm_cache import LLMCache
+from prompt_budget import count_tokens, prompt_budget
+
+# Documents estimated above this many tokens are summarized with map-reduce
+SINGLE_PASS_TOKENS = int(os.getenv("EDUTUTOR_SUMMARY_SINGLE_PASS_TOKENS", "6000"))
+# Cap on the tokens of source text sent to the map step for one document
+DEFAULT_TOKEN_BUDGET = int(os.getenv("EDUTUTOR_SUMMARY_TOKEN_BUDGET", "60000"))
+# Tokens of a collapse or reduce prompt taken by its instructions
+PROMPT_OVERHEAD_TOKENS = 500
+# Cap on the tokens of chunk summaries fed to a single collapse or reduce
+# prompt, kept within the collapse_summaries prompt budget so none is truncated
+REDUCE_TOKENS = min(int(os.getenv("EDUTUTOR_SUMMARY_REDUCE_TOKENS", "6000")),
+                    prompt_budget("collapse_summaries") - PROMPT_OVERHEAD_TOKENS)
+CHUNK_SIZE = 8000
+CHUNK_OVERLAP = 200
+
+MAP_TEMPLATE = PromptTemplate(
+    input_variables=["content"],
+    template="""Summarize the following section of a larger document in at most 150 words.\nKeep definitions, key facts and conclusions; drop examples and repetition.\n\n{content}"""
+)
+
+REDUCE_TEMPLATE = PromptTemplate(
+    input_variables=["summaries", "length"],
+    template="""The following are summaries of consecutive sections of one document:\n\n{summaries}\n\nCreate a {length} summary of the whole document from them.\nFocus on the main points and key takeaways.\nUse markdown formatting."""
+)
+
+
+def estimate_tokens(text):
+    """Token count of text, from the local tokenizer when it is available"""
+    return count_tokens(text)
+
+
+def needs_map_reduce(text):
+    """Whether text is too large to summarize in a single prompt"""
+    return estimate_tokens(text) > SINGLE_PASS_TOKENS
+
+
+def split_text(text, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """Split text into overlapping chunks on paragraph and sentence boundaries"""
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return splitter.split_text(text)
+
+
+def select_chunks(chunks, token_budget):
+    """Pick chunks spread evenly over the document so their total fits the budget"""
+    total = sum(estimate_tokens(c) for c in chunks)
+    if total <= token_budget or not chunks:
+        return chunks
+    keep = max(1, int(len(chunks) * token_budget / total))
+    step = len(chunks) / keep
+    return [chunks[int(i * step)] for i in range(keep)]
+
+
+class MapReduceSummarizer:
+    """Summarizes large documents by summarizing chunks in parallel and combining them.
+
+    acall is an async callable taking a method name and a prompt and
+    returning the completion text, raising on failure. Chunks are summarized
+    as "summarize_chunk", groups of summaries are collapsed as
+    "collapse_summaries" and the final summary is made as reduce_method, so
+    each step gets its own prompt budget. Map prompts do not depend on the
+    requested summary length, so their results are cached and reused when
+    the same document is summarized at another length.
+    """
+
+    def __init__(self, acall, cache=None, model=None, temperature=0.0,
+                 token_budget=DEFAULT_TOKEN_BUDGET, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 reduce_method="generate_summary"):
+        self.acall = acall
+        self.reduce_method = reduce_method
+        self.cache = cache
+        self.model = model
+        self.temperature = temperature
+        self.token_budget = token_budget
+        self.max_concurrency = max_concurrency
+
+    async def _summarize_chunk(self, chunk, method="summarize_chunk"):
+        """Summarize one chunk, serving repeats from the cache"""
+        prompt = MAP_TEMPLATE.format(content=chunk)
+        key = None
+        if self.cache is not None:
+            key = LLMCache.make_key(prompt, self.model, self.temperature)
+            cached = self.cache.get(key, method)
+            if cached is not None:
+                return cached
+        summary = await self.acall(method, prompt)
+        if key is not None:
+            self.cache.set(key, summary, method)
+        return summary
+
+    async def amap(self, text):
+        """Return chunk summaries of text that together fit one reduce prompt"""
+        chunks = select_chunks(split_text(text), self.token_budget)
+        summaries = await gather_bounded(
+            *(self._summarize_chunk(c) for c in chunks),
+            max_concurrency=self.max_concurrency
+        )
+        # Collapse groups of summaries until they fit in a single reduce prompt
+        while len(summaries) > 1 and estimate_tokens("\n\n".join(summaries)) > REDUCE_TOKENS:
+            groups = []
+            current = []
+            for summary in summaries:
+                if current and estimate_tokens("\n\n".join(current + [summary])) > REDUCE_TOKENS:
+                    groups.append(current)
+                    current = []
+                current.append(summary)
+            groups.append(current)
+            if len(groups) == len(summaries):
+                break
+            summaries = await gather_bounded(
+                *(self._summarize_chunk("\n\n".join(g), "collapse_summaries") for g in groups),
+                max_concurrency=self.max_concurrency
+            )
+        return summaries
+
+    @staticmethod
+    def reduce_prompt(summaries, length):
+        """Render the prompt that combines chunk summaries into the final summary"""
+        return REDUCE_TEMPLATE.format(summaries="\n\n".join(summaries), length=length)
+
+    async def asummarize(self, text, length="concise"):
+        """Summarize text of any size at the requested length"""
+        summaries = await self.amap(text)
+        return await self.acall(self.reduce_method, self.reduce_prompt(summaries, length))
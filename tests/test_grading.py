@@ -0,0 +1,123 @@
+"""Local graders, scores read from LLM grading replies, and how failed grades count."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grading import (Grade, edit_distance, grade_fill_in_the_blank, grade_multiple_choice, grade_numeric,
+                     parse_llm_grade, quiz_score)
+from quiz import QuizQuestion
+
+MCQ = QuizQuestion(question="Where does photosynthesis happen?", type="multiple_choice",
+                   options=["Mitochondria", "Chloroplast", "Nucleus", "Ribosome"], answer="B")
+
+
+@pytest.mark.parametrize("answer, correct", [
+    ("B", True),
+    ("b", True),
+    ("(B)", True),
+    ("B) Chloroplast", True),
+    ("chloroplast", True),
+    ("  The Chloroplast. ", True),
+    ("A", False),
+    ("Mitochondria", False),
+    ("E", False),
+    ("", False),
+])
+def test_multiple_choice(answer, correct):
+    assert grade_multiple_choice(MCQ, answer).correct is correct
+
+
+def _blank(answer, alternatives=()):
+    return QuizQuestion(question="The answer is ____.", type="fill_in_the_blank",
+                        answer=answer, alternatives=list(alternatives))
+
+
+@pytest.mark.parametrize("key, answer", [
+    ("mitosis", "Mitosis"),
+    ("mitosis", " mitosis. "),
+    ("Café", "cafe"),
+    ("the nucleus", "Nucleus"),
+    ("mitosis", "mitossi"),
+    ("mitosis", "mitosiss"),
+    ("hyperthyroidism", "hyperthyriodism"),
+    ("cell membrane", "cell membrne"),
+])
+def test_blank_accepts_normalised_answers_and_typos(key, answer):
+    assert grade_fill_in_the_blank(_blank(key), answer).correct
+
+
+@pytest.mark.parametrize("key, answer", [
+    ("mitosis", "meiosis"),
+    ("hyperthyroidism", "hypothyroidism"),
+    ("anode", "diode"),
+    ("cat", "car"),
+    ("ion", "ions"),
+    ("1945", "1946"),
+    ("World War 2", "World War 1"),
+    ("cell membrane", "cell"),
+    ("mitosis", ""),
+])
+def test_blank_rejects_distractors(key, answer):
+    assert not grade_fill_in_the_blank(_blank(key), answer).correct
+
+
+def test_blank_accepts_alternatives():
+    assert grade_fill_in_the_blank(_blank("colour", ["color"]), "color").correct
+
+
+@pytest.mark.parametrize("a, b, distance", [
+    ("mitosis", "mitosis", 0),
+    ("mitosis", "mitossi", 1),
+    ("mitosis", "meiosis", 2),
+    ("", "abc", 3),
+])
+def test_edit_distance(a, b, distance):
+    assert edit_distance(a, b) == distance
+
+
+def _numeric(answer, tolerance=None):
+    return QuizQuestion(question="How many?", type="numeric", answer=answer, tolerance=tolerance)
+
+
+@pytest.mark.parametrize("question, answer, correct", [
+    (_numeric("1234"), "1,234", True),
+    (_numeric("100"), "100.9", True),
+    (_numeric("100"), "102", False),
+    (_numeric("0.5"), "1/2", True),
+    (_numeric("350"), "3.5e2", True),
+    (_numeric("9.8", tolerance=0.1), "9.75", True),
+    (_numeric("9.8", tolerance=0.1), "10", False),
+    (_numeric("-3"), "-3", True),
+    (_numeric("42"), "forty-two", False),
+])
+def test_numeric(question, answer, correct):
+    assert grade_numeric(question, answer).correct is correct
+
+
+@pytest.mark.parametrize("reply, score", [
+    ("Score (0-100): 70\nFeedback: good", 70.0),
+    ("Score: 7/10. Mostly right.", 70.0),
+    ("I'd give this 3 / 4.", 75.0),
+    ("Score: 85%", 85.0),
+    ("Score: 120", 100.0),
+])
+def test_parse_llm_grade_scores(reply, score):
+    grade = parse_llm_grade(reply)
+    assert grade.method == "llm"
+    assert grade.score == pytest.approx(score)
+
+
+@pytest.mark.parametrize("reply", ["Error: Connection error.", "Looks fine to me."])
+def test_failed_grading_is_ungraded(reply):
+    grade = parse_llm_grade(reply)
+    assert grade.method == "error"
+    assert grade.score is None
+    assert not grade.correct
+
+
+def test_quiz_score_leaves_out_ungraded_answers():
+    grades = [Grade(score=100.0, correct=True), parse_llm_grade("Error: Connection error.")]
+    assert quiz_score(grades) == 100.0
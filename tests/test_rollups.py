@@ -0,0 +1,107 @@
+"""Rollup tables must match an aggregate over the raw rows after any mix of writes."""
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+
+TOPICS = ["algebra", "biology", "chemistry", "history"]
+
+EXPECTED_TOPIC_PROGRESS = '''
+    SELECT user_id, topic, COALESCE(SUM(score), 0), COUNT(score), SUM(time_spent), COUNT(*)
+    FROM learning_progress GROUP BY user_id, topic'''
+
+EXPECTED_DAILY_STUDY = '''
+    SELECT user_id, DATE(start_time), COUNT(*), COUNT(end_time),
+           COALESCE(SUM(CASE WHEN end_time IS NOT NULL
+                             THEN strftime('%s', end_time) - strftime('%s', start_time) END), 0)
+    FROM study_sessions GROUP BY user_id, DATE(start_time)'''
+
+EXPECTED_STUDY_TOPICS = '''
+    SELECT user_id, topic, COUNT(*) FROM study_sessions
+    WHERE end_time IS NOT NULL AND topic IS NOT NULL GROUP BY user_id, topic'''
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "test.db"))
+    monkeypatch.setattr(db._write_buffer, "enabled", False)
+    yield db.get_db_connection()
+    db.close_db_connection()
+
+
+def _rows(conn, sql):
+    return sorted(tuple(row) for row in conn.execute(sql).fetchall())
+
+
+def _assert_rollups_match(conn):
+    assert _rows(conn, 'SELECT user_id, topic, score_sum, score_count, total_time, entries FROM user_topic_progress') \
+        == _rows(conn, EXPECTED_TOPIC_PROGRESS)
+    assert _rows(conn, 'SELECT user_id, day, sessions, completed_sessions, total_time FROM user_daily_study') \
+        == _rows(conn, EXPECTED_DAILY_STUDY)
+    assert _rows(conn, 'SELECT user_id, topic, completed_sessions FROM user_study_topics') \
+        == _rows(conn, EXPECTED_STUDY_TOPICS)
+
+
+def _random_time(rng):
+    return f"2026-0{rng.randint(1, 3)}-{rng.randint(10, 28)} {rng.randint(10, 20)}:{rng.randint(10, 59)}:00"
+
+
+def _random_write(conn, rng):
+    user_id = rng.randint(1, 3)
+    table = rng.choice(["learning_progress", "study_sessions"])
+    ids = [row[0] for row in conn.execute(f'SELECT id FROM {table}')]
+    action = rng.choice(["insert", "insert", "update", "delete"]) if ids else "insert"
+    if table == "learning_progress":
+        score = rng.choice([None, rng.randint(0, 100)])
+        time_spent = rng.choice([None, rng.randint(0, 3600)])
+        if action == "insert":
+            conn.execute('INSERT INTO learning_progress (user_id, topic, score, time_spent) VALUES (?, ?, ?, ?)',
+                         (user_id, rng.choice(TOPICS), score, time_spent))
+        elif action == "update":
+            conn.execute('UPDATE learning_progress SET user_id = ?, topic = ?, score = ?, time_spent = ? WHERE id = ?',
+                         (user_id, rng.choice(TOPICS), score, time_spent, rng.choice(ids)))
+        else:
+            conn.execute('DELETE FROM learning_progress WHERE id = ?', (rng.choice(ids),))
+    else:
+        start = _random_time(rng)
+        end = rng.choice([None, f"{start[:11]}21:{rng.randint(10, 59)}:00"])
+        if action == "insert":
+            conn.execute('''INSERT INTO study_sessions (user_id, topic, session_type, start_time, end_time)
+                            VALUES (?, ?, 'lesson', ?, ?)''', (user_id, rng.choice(TOPICS + [None]), start, end))
+        elif action == "update":
+            conn.execute('UPDATE study_sessions SET topic = ?, start_time = ?, end_time = ? WHERE id = ?',
+                         (rng.choice(TOPICS + [None]), start, end, rng.choice(ids)))
+        else:
+            conn.execute('DELETE FROM study_sessions WHERE id = ?', (rng.choice(ids),))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_rollups_follow_random_writes(conn, seed):
+    rng = random.Random(seed)
+    for _ in range(300):
+        with conn:
+            _random_write(conn, rng)
+    _assert_rollups_match(conn)
+
+
+def test_progress_rollup_follows_score_update(conn):
+    db.update_user_progress(1, "algebra", 80, 60)
+    with conn:
+        conn.execute('UPDATE learning_progress SET score = 10')
+    assert db.get_user_progress(1) == [{"topic": "algebra", "avg_score": 10.0, "total_time": 60}]
+
+
+def test_rebuild_matches_triggers(conn):
+    rng = random.Random(42)
+    for _ in range(200):
+        with conn:
+            _random_write(conn, rng)
+    before = _rows(conn, 'SELECT * FROM user_topic_progress')
+    db.rebuild_rollups()
+    assert _rows(conn, 'SELECT * FROM user_topic_progress') == before
+    _assert_rollups_match(conn)
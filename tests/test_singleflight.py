@@ -0,0 +1,121 @@
+"""Cross-process coalescing only hands a call's outcome to callers that waited on it."""
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from singleflight import FlightAbandoned, FlightError, LeaseStore, SingleFlight
+
+
+@pytest.fixture
+def processes(tmp_path):
+    """Two SingleFlight groups sharing one lease table, as two worker processes would"""
+    path = str(tmp_path / "flights.db")
+    return SingleFlight(LeaseStore(path, poll_interval=0.01)), SingleFlight(LeaseStore(path, poll_interval=0.01))
+
+
+def test_finished_failure_is_not_replayed_to_new_callers(processes):
+    first, second = processes
+    with pytest.raises(ValueError):
+        first.do("lesson", lambda: (_ for _ in ()).throw(ValueError("upstream down")))
+    assert second.do("lesson", lambda: "fresh") == "fresh"
+    assert second.stats() == {"leaders": 1, "followers": 0}
+
+
+def test_finished_result_is_not_replayed_to_new_callers(processes):
+    first, second = processes
+    assert first.do("grade", lambda: "first reply") == "first reply"
+    assert second.do("grade", lambda: "second reply") == "second reply"
+
+
+def test_waiter_gets_failure_with_original_class(processes):
+    first, second = processes
+    leader = first.begin("quiz")
+    outcome = {}
+
+    def wait():
+        try:
+            second.do("quiz", lambda: "should not run")
+        except FlightError as e:
+            outcome["error"] = e
+
+    waiter = threading.Thread(target=wait)
+    waiter.start()
+    time.sleep(0.1)
+    leader.fail(TimeoutError("timed out"))
+    waiter.join(5)
+    assert outcome["error"].exception_class == "TimeoutError"
+    assert str(outcome["error"]) == "timed out"
+
+
+def test_waiter_gets_result(processes):
+    first, second = processes
+    leader = first.begin("summary")
+    outcome = {}
+    waiter = threading.Thread(target=lambda: outcome.update(result=second.do("summary", lambda: "own call")))
+    waiter.start()
+    time.sleep(0.1)
+    leader.finish("shared")
+    waiter.join(5)
+    assert outcome["result"] == "shared"
+    assert second.stats() == {"leaders": 0, "followers": 1}
+
+
+def test_waiters_give_up_on_a_stuck_leader():
+    group = SingleFlight(wait_timeout=0.1)
+    group.begin("lesson")
+    follower = group.begin("lesson")
+    assert not follower.leader
+    with pytest.raises(FlightAbandoned):
+        follower.wait()
+    # The stuck call no longer holds the key
+    assert group.do("lesson", lambda: "fresh") == "fresh"
+
+
+def test_only_the_first_outcome_counts():
+    group = SingleFlight()
+    leader = group.begin("quiz")
+    follower = group.begin("quiz")
+    leader.finish("done")
+    leader.fail(ValueError("late"))
+    assert follower.wait() == "done"
+
+
+class _LockedOnceCache:
+    """Response cache whose first write fails, like a locked database"""
+
+    def __init__(self):
+        self.writes = 0
+
+    def get(self, key, method=None, recheck=False):
+        return None
+
+    def set(self, key, value, method=None):
+        self.writes += 1
+        if self.writes == 1:
+            raise sqlite3.OperationalError("database is locked")
+
+
+def test_stream_leader_failing_after_the_response_releases_waiters(monkeypatch):
+    pytest.importorskip("streamlit")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    import ai_teaching
+    import llm_client
+
+    monkeypatch.setattr(llm_client.LLMClient, "stream", lambda self, prompt, method=None: iter(["a ", "lesson"]))
+    monkeypatch.setattr(llm_client.LLMClient, "invoke_with_usage",
+                        lambda self, prompt, method=None: ("a lesson", {}))
+    assistant = ai_teaching.AITeachingAssistant(cache=_LockedOnceCache(), flights=SingleFlight(wait_timeout=5))
+
+    with pytest.raises(sqlite3.OperationalError):
+        list(assistant.stream_lesson("Topic"))
+    assert assistant.flights._calls == {}
+
+    start = time.monotonic()
+    assert assistant.generate_lesson("Topic") == "a lesson"
+    assert time.monotonic() - start < 1
@@ -0,0 +1,46 @@
+"""Buffered writes always resolve, even when the database can't be opened."""
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+
+INSERT_USER = 'INSERT INTO users (email, full_name, password_hash) VALUES (?, ?, ?)'
+
+
+@pytest.fixture
+def buffer(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "test.db"))
+    write_buffer = db.WriteBuffer(flush_interval=0.01)
+    yield write_buffer
+    write_buffer.close()
+    db.close_db_connection()
+
+
+def _locked():
+    raise sqlite3.OperationalError("database is locked")
+
+
+def test_batch_fails_when_connection_fails(buffer, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(db, "get_db_connection", _locked)
+        waited = buffer.submit(INSERT_USER, ("a@example.com", "A", "hash"), urgent=True)
+        with pytest.raises(sqlite3.OperationalError):
+            waited.result(timeout=5)
+
+    # The writer thread survives and later writes go through
+    buffer.submit(INSERT_USER, ("b@example.com", "B", "hash"), urgent=True).result(timeout=5)
+    assert db.get_user("b@example.com")["full_name"] == "B"
+
+
+def test_detached_write_failure_is_logged(buffer, monkeypatch, caplog):
+    monkeypatch.setattr(db, "get_db_connection", _locked)
+    with caplog.at_level("ERROR", logger=db.logger.name):
+        buffer.submit(INSERT_USER, ("a@example.com", "A", "hash"), urgent=True, detached=True)
+        # Batches commit in order, so the detached write has been handled once this one has
+        buffer.submit(None, urgent=True).exception(timeout=5)
+    assert "Buffered write failed" in caplog.text
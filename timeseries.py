@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+
+# Default cap on the points sent to the browser for one chart series
+MAX_CHART_POINTS = int(os.getenv("EDUTUTOR_MAX_CHART_POINTS", "500"))
+
+
+def lttb_indices(x, y, n_out):
+    """Indices kept by Largest-Triangle-Three-Buckets downsampling.
+
+    x must be sorted ascending. The first and last points are always kept;
+    the rest are split into n_out - 2 buckets and from each the point
+    forming the largest triangle with the previously kept point and the
+    mean of the next bucket is kept, which preserves peaks and trend shape.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0] = 0
+    kept[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x = x[end:edges[i + 2]].mean()
+            next_y = y[end:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[n - 1], y[n - 1]
+        bucket_x = x[start:end]
+        bucket_y = y[start:end]
+        area = np.abs((x[a] - next_x) * (bucket_y - y[a]) - (x[a] - bucket_x) * (next_y - y[a]))
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+def downsample_frame(df, x, y, max_points=MAX_CHART_POINTS):
+    """Return at most max_points rows of df chosen by LTTB on columns x and y"""
+    df = df.dropna(subset=[y]).sort_values(x)
+    if len(df) <= max_points:
+        return df
+    x_values = df[x]
+    if np.issubdtype(x_values.dtype, np.datetime64):
+        x_values = x_values.astype("int64")
+    keep = lttb_indices(x_values.to_numpy(), df[y].to_numpy(), max_points)
+    return df.iloc[keep]